@@ -21,8 +21,8 @@ from __future__ import print_function
 from __future__ import absolute_import
 
 from panda3d.core import LPoint3d, LQuaternion, LColor, LVector3, LVector3d
-from panda3d.core import GeomVertexFormat, GeomVertexData, GeomVertexWriter, GeomVertexRewriter, InternalName
-from panda3d.core import Geom, GeomNode, GeomLines
+from panda3d.core import GeomVertexFormat, GeomVertexData, GeomVertexWriter
+from panda3d.core import Geom, GeomNode, GeomLines, GeomLinestrips
 from panda3d.core import NodePath
 
 from .foundation import VisibleObject, ObjectLabel, LabelledObject
@@ -36,6 +36,7 @@ from .utils import srgb_to_linear
 from . import settings
 
 from math import sin, cos, atan2, pi
+import numpy
 
 class AnnotationLabel(ObjectLabel):
     def update_instance(self, camera_pos, camera_rot):
@@ -72,6 +73,8 @@ class Orbit(VisibleObject):
         self.orbit = self.find_orbit(self.body)
         self.color = None
         self.fade = 0.0
+        self.path = None
+        self.in_frame = False
         if not self.orbit:
             print("No orbit for", self.get_name())
             self.visible = False
@@ -114,9 +117,12 @@ class Orbit(VisibleObject):
         if self.instance:
             self.instance.setColor(srgb_to_linear(self.color * self.fade))
 
-    def create_instance(self):
-        self.vertexData = GeomVertexData('vertexData', GeomVertexFormat.getV3(), Geom.UHStatic)
-        self.vertexWriter = GeomVertexWriter(self.vertexData, 'vertex')
+    def calc_path(self):
+        #Kepler orbits give their path in their own frame, it does not depend on the time
+        path = self.orbit.get_frame_path(self.nbOfPoints)
+        self.in_frame = path is not None
+        if path is not None:
+            return path
         delta = self.body.parent.get_local_position()
         if self.orbit.is_periodic():
             epoch = self.context.time.time_full - self.orbit.period / 2
@@ -125,17 +131,27 @@ class Orbit(VisibleObject):
             #TODO: Properly calculate orbit start and end time
             epoch = self.orbit.get_time_of_perihelion() - self.orbit.period * 5.0
             step = self.orbit.period * 10.0 / (self.nbOfPoints - 1)
+        path = numpy.empty((self.nbOfPoints, 3))
         for i in range(self.nbOfPoints):
             time = epoch + step * i
-            pos = self.orbit.get_position_at(time) - delta
-            self.vertexWriter.addData3f(*pos)
-        self.lines = GeomLines(Geom.UHStatic)
-        for i in range(self.nbOfPoints-1):
-            self.lines.addVertex(i)
-            self.lines.addVertex(i+1)
+            path[i] = tuple(self.orbit.get_position_at(time) - delta)
+        return path
+
+    def fill_geom(self, vertex_data, lines, path):
+        vertex_data.unclean_set_num_rows(len(path))
+        vertices = numpy.frombuffer(memoryview(vertex_data.modify_array(0)).cast('B'), numpy.float32)
+        vertices.reshape(-1, 3)[:] = path
+        lines.clear_vertices()
+        lines.add_consecutive_vertices(0, len(path))
         if self.orbit.is_periodic() and self.orbit.is_closed():
-            self.lines.addVertex(self.nbOfPoints-1)
-            self.lines.addVertex(0)
+            lines.add_vertex(0)
+        lines.close_primitive()
+        self.path = path
+
+    def create_instance(self):
+        self.vertexData = GeomVertexData('vertexData', GeomVertexFormat.getV3(), Geom.UHStatic)
+        self.lines = GeomLinestrips(Geom.UHStatic)
+        self.fill_geom(self.vertexData, self.lines, self.calc_path())
         self.geom = Geom(self.vertexData)
         self.geom.addPrimitive(self.lines)
         self.node = GeomNode(self.body.get_ascii_name() + '-orbit')
@@ -155,22 +171,12 @@ class Orbit(VisibleObject):
         self.shader.update(self, self.appearance)
 
     def update_geom(self):
+        path = self.calc_path()
+        if path is self.path:
+            #The elements did not change, the orbit orientation is applied on the instance
+            return
         geom = self.node.modify_geom(0)
-        vdata = geom.modify_vertex_data()
-        vwriter = GeomVertexRewriter(vdata, InternalName.get_vertex())
-        #TODO: refactor with above code !!!
-        delta = self.body.parent.get_local_position()
-        if self.orbit.is_periodic():
-            epoch = self.context.time.time_full - self.orbit.period
-            step = self.orbit.period / (self.nbOfPoints - 1)
-        else:
-            #TODO: Properly calculate orbit start and end time
-            epoch = self.orbit.get_time_of_perihelion() - self.orbit.period * 5.0
-            step = self.orbit.period * 10.0 / (self.nbOfPoints - 1)
-        for i in range(self.nbOfPoints):
-            time = epoch + step * i
-            pos = self.orbit.get_position_at(time) - delta
-            vwriter.setData3f(*pos)
+        self.fill_geom(geom.modify_vertex_data(), geom.modify_primitive(0), path)
 
     def check_visibility(self, pixel_size):
         if self.parent.parent.visible and self.parent.shown and self.orbit:
@@ -188,10 +194,19 @@ class Orbit(VisibleObject):
 
     def update_instance(self, camera_pos, camera_rot):
         if self.instance:
+            if self.in_frame:
+                self.update_geom()
+                #The path is relative to the center of the orbit frame, usually the parent body itself
+                offset = self.orbit.frame.get_center() - self.body.parent.get_local_position()
+                position = self.body.parent.scene_position + offset * self.body.parent.scene_scale_factor
+                orientation = self.orbit.get_rotation_at(self.context.time.time_full)
+            else:
+                position = self.body.parent.scene_position
+                orientation = LQuaternion()
             self.place_instance_params(self.instance,
-                                       self.body.parent.scene_position,
+                                       position,
                                        self.body.parent.scene_scale_factor,
-                                       LQuaternion())
+                                       orientation)
             self.shader.update(self, self.appearance)
 
     def update_user_parameters(self):
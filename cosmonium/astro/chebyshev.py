@@ -0,0 +1,143 @@
+#
+#This file is part of Cosmonium.
+#
+#Copyright (C) 2018-2019 Laurent Deru.
+#
+#Cosmonium is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+#
+#Cosmonium is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License
+#along with Cosmonium.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+from __future__ import print_function
+from __future__ import absolute_import
+
+from panda3d.core import LPoint3d
+
+from math import floor
+import numpy
+
+def chebyshev_nodes(degree):
+    k = numpy.arange(degree + 1)
+    return numpy.cos(numpy.pi * (k + 0.5) / (degree + 1))
+
+def chebyshev_fit(func, start, end, degree):
+    #Interpolate func, returning a 3D position, at the Chebyshev nodes of [start, end]
+    nodes = chebyshev_nodes(degree)
+    half = (end - start) / 2.0
+    middle = start + half
+    values = numpy.array([tuple(func(middle + node * half)) for node in nodes])
+    #Discrete orthogonality of the Chebyshev polynomials at their nodes
+    basis = numpy.cos(numpy.outer(numpy.arange(degree + 1), numpy.arccos(nodes)))
+    coefs = basis.dot(values) * (2.0 / (degree + 1))
+    coefs[0] /= 2.0
+    return coefs
+
+def chebyshev_eval(coefs, start, end, time):
+    x = (2.0 * time - start - end) / (end - start)
+    #Clenshaw recurrence on the three coordinates at once
+    b1 = numpy.zeros(3)
+    b2 = numpy.zeros(3)
+    x2 = 2.0 * x
+    for coef in coefs[:0:-1]:
+        b1, b2 = coef + x2 * b1 - b2, b1
+    return coefs[0] + x * b1 - b2
+
+def chebyshev_error(func, coefs, start, end):
+    #Check the error at the degree + 2 Chebyshev nodes, which interlace with the degree + 1 nodes used by the fit
+    error = 0.0
+    for x in chebyshev_nodes(len(coefs)):
+        check_time = start + (x + 1.0) * (end - start) / 2.0
+        delta = numpy.array(tuple(func(check_time))) - chebyshev_eval(coefs, start, end, check_time)
+        error = max(error, numpy.sqrt(delta.dot(delta)))
+    return error
+
+class ChebyshevSegment(object):
+    def __init__(self, start, end, coefs):
+        self.start = start
+        self.end = end
+        self.window = end - start
+        self.coefs = coefs
+
+    def contains(self, time):
+        return self.start <= time <= self.end
+
+    def get_position_at(self, time):
+        return LPoint3d(*chebyshev_eval(self.coefs, self.start, self.end, time))
+
+class ChebyshevPositionCache(object):
+    max_subdivisions = 16
+
+    def __init__(self, func, window, accuracy, degree=12, async_loader=None):
+        self.func = func
+        #Each fit starts from the base window, the current window is the one of the last fitted segment
+        self.base_window = window
+        self.window = window
+        self.accuracy = accuracy
+        self.degree = degree
+        self.async_loader = async_loader
+        self.segment = None
+        self.pending = None
+        self.last_miss = None
+
+    def fit(self, time):
+        #Reduce the size of the window until the fit is within the accuracy bound
+        #This can run on a worker thread, the window is only updated with the segment
+        window = self.base_window
+        for i in range(self.max_subdivisions):
+            start = floor(time / window) * window
+            end = start + window
+            coefs = chebyshev_fit(self.func, start, end, self.degree)
+            error = chebyshev_error(self.func, coefs, start, end)
+            if error <= self.accuracy:
+                break
+            window /= 2.0
+        else:
+            print("Could not reach accuracy", self.accuracy, "error is", error)
+        return ChebyshevSegment(start, end, coefs)
+
+    def set_segment(self, segment):
+        self.segment = segment
+        self.window = segment.window
+
+    async def refresh(self, time):
+        segment = await self.async_loader.add_job(self.fit, [time])
+        if segment is not None:
+            self.set_segment(segment)
+        self.pending = None
+
+    def clear(self):
+        self.segment = None
+        self.last_miss = None
+
+    def need_refresh(self, time):
+        #Only follow the time when it runs into the next window or stays in the same place,
+        #isolated requests, like the sampling of the orbit path, are served by the series
+        window_index = floor(time / self.window)
+        segment = self.segment
+        if segment is not None and segment.end <= time < segment.end + self.window:
+            return True
+        if window_index == self.last_miss:
+            return True
+        self.last_miss = window_index
+        return False
+
+    def get_position_at(self, time):
+        segment = self.segment
+        if segment is not None and segment.contains(time):
+            return segment.get_position_at(time)
+        if self.pending is None and self.need_refresh(time):
+            if self.async_loader is None:
+                self.set_segment(self.fit(time))
+                return self.segment.get_position_at(time)
+            #Use the series until the new window is ready
+            self.pending = taskMgr.add(self.refresh(time))
+        return self.func(time)
@@ -41,6 +41,15 @@ from copy import copy
 #      y    =    z
 #      z    =   -y
 
+class FramesCache(object):
+    #Incremented at each update of the universe, the cached values of the frames are valid as long as
+    #the epoch and the update id of their body do not change
+    epoch = 0
+
+    @classmethod
+    def invalidate(cls):
+        cls.epoch += 1
+
 class ReferenceFrame(object):
     def get_center(self):
         raise Exception
@@ -94,6 +103,8 @@ class J2000EclipticReferenceFrame(BodyReferenceFrame):
         return self.orientation
 
 class SolBarycenter():
+    update_id = 0
+
     def get_name(self):
         return "Solar System Barycenter"
 
@@ -139,6 +150,32 @@ class RelativeReferenceFrame(BodyReferenceFrame):
     def __str__(self):
         return BodyReferenceFrame.__str__(self) + ' ' + str(self.parent_frame)
 
+class CachedReferenceFrame(RelativeReferenceFrame):
+    cache_key = None
+    cached_center = None
+    cached_orientation = None
+
+    def update_cache(self):
+        key = (FramesCache.epoch, self.body.update_id)
+        if key != self.cache_key:
+            self.cached_center = self.calc_center()
+            self.cached_orientation = self.calc_orientation()
+            self.cache_key = key
+
+    def calc_center(self):
+        return None
+
+    def calc_orientation(self):
+        return None
+
+    def get_center(self):
+        self.update_cache()
+        return self.cached_center
+
+    def get_orientation(self):
+        self.update_cache()
+        return self.cached_orientation
+
 class CelestialReferenceFrame(RelativeReferenceFrame):
     """
     Reference frame build using the North pole axis (ra, decl) and the
@@ -183,16 +220,16 @@ class SynchroneReferenceFrame(RelativeReferenceFrame):
         rot = self.body.get_sync_rotation()
         return rot
 
-class SurfaceReferenceFrame(RelativeReferenceFrame):
+class SurfaceReferenceFrame(CachedReferenceFrame):
     def __init__(self, body, long, lat):
-        RelativeReferenceFrame.__init__(self, body)
+        CachedReferenceFrame.__init__(self, body)
         self.long = long
         self.lat = lat
 
-    def get_center(self):
+    def calc_center(self):
         return self.body.get_local_position() + self.body.get_sync_rotation().xform(self.get_center_parent_frame())
 
-    def get_orientation(self):
+    def calc_orientation(self):
         return self.get_orientation_parent_frame() * self.body.get_sync_rotation()
 
     #TODO: workaround until proper hierarchical frames are implemented
@@ -210,15 +247,15 @@ class SurfaceReferenceFrame(RelativeReferenceFrame):
         look_at(rotation, binormal, normal)
         return rotation
 
-class CartesianSurfaceReferenceFrame(RelativeReferenceFrame):
+class CartesianSurfaceReferenceFrame(CachedReferenceFrame):
     def __init__(self, body, position):
-        RelativeReferenceFrame.__init__(self, body)
+        CachedReferenceFrame.__init__(self, body)
         self.position = position
 
-    def get_center(self):
+    def calc_center(self):
         return self.body.get_local_position() + self.body.get_sync_rotation().xform(self.get_center_parent_frame())
 
-    def get_orientation(self):
+    def calc_orientation(self):
         return self.get_orientation_parent_frame() * self.body.get_sync_rotation()
 
     #TODO: workaround until proper hierarchical frames are implemented
@@ -25,3 +25,6 @@ except ImportError as e:
     print("WARNING: Could not load Kepler C implementation, fallback on python implementation")
     print("\t", e)
     from .pyastro.pykepler import kepler_pos
+
+#There is no C implementation of the batch solver and of the path sampling
+from .pyastro.pykepler import kepler_pos_array, kepler_path
@@ -23,13 +23,17 @@ from __future__ import absolute_import
 from panda3d.core import LPoint3d, LVector3d, LQuaterniond
 
 from ..parameters import ParametersGroup, UserParameter, AutoUserParameter
+from .. import settings
+from .. import workers
 
 from . import units
 from .frame import J2000EclipticReferenceFrame, J2000EquatorialReferenceFrame
-from .kepler import kepler_pos
+from .kepler import kepler_pos, kepler_pos_array, kepler_path
+from .chebyshev import ChebyshevPositionCache
 from .astro import calc_orientation
 
 from math import pi, asin, atan2
+import numpy
 
 class Orbit(object):
     dynamic = False
@@ -80,6 +84,10 @@ class Orbit(object):
     def get_rotation_at(self, time):
         return self.frame.get_abs_orientation(self.get_frame_rotation_at(time))
 
+    def get_frame_path(self, nb_points):
+        #Path of the orbit in its own frame, before the frame rotation, or None if it depends on the time
+        return None
+
     def project(self, time, center, radius):
         return None
 
@@ -226,6 +234,11 @@ class EllipticalOrbit(Orbit):
         self.arg_of_periapsis = arg_of_periapsis * pi / 180
         self.mean_anomaly = mean_anomaly * pi / 180
         self.epoch = epoch
+        #Position precalculated by update_elliptical_orbits()
+        self.batch_time = None
+        self.batch_position = None
+        self.path = None
+        self.path_key = None
         self.update_rotation()
 
     def set_period(self, period):
@@ -234,6 +247,7 @@ class EllipticalOrbit(Orbit):
             self.mean_motion = 2 * pi / period
         else:
             self.mean_motion = 0
+        self.batch_time = None
 
     def get_period(self):
         return self.period
@@ -262,6 +276,7 @@ class EllipticalOrbit(Orbit):
 
     def update_user_parameters(self):
         self.update_rotation()
+        self.batch_time = None
 
     def is_periodic(self):
         return self.eccentricity < 1.0
@@ -279,12 +294,22 @@ class EllipticalOrbit(Orbit):
         return abs(self.apocenter_distance)
 
     def get_frame_position_at(self, time):
+        if time == self.batch_time:
+            return self.batch_position
         mean_anomaly = (time - self.epoch) * self.mean_motion + self.mean_anomaly
         return kepler_pos(self.pericenter_distance, self.eccentricity, mean_anomaly)
 
     def get_frame_rotation_at(self, time):
         return self.rotation
 
+    def get_frame_path(self, nb_points):
+        #The shape only depends on the pericenter and the eccentricity, the rotation is applied by the caller
+        key = (self.pericenter_distance, self.eccentricity, nb_points)
+        if key != self.path_key:
+            self.path = kepler_path(self.pericenter_distance, self.eccentricity, nb_points)
+            self.path_key = key
+        return self.path
+
 class FuncOrbit(Orbit):
     dynamic = True
     def __init__(self, period, semi_major_axis, eccentricity, frame):
@@ -294,6 +319,7 @@ class FuncOrbit(Orbit):
         self.frame = frame
         self.origin = LPoint3d()
         self.body = None
+        self.cache = None
 
     def get_period(self):
         return self.period
@@ -304,6 +330,37 @@ class FuncOrbit(Orbit):
     def get_apparent_radius(self):
         return self.max_distance
 
+    def create_cache(self):
+        #The orbits are copied out of the elements db, the cache is created on first use to not be shared
+        self.cache = ChebyshevPositionCache(self.calc_frame_position_at,
+                                            self.period / 32,
+                                            settings.func_orbits_cache_accuracy,
+                                            async_loader=workers.asyncComputeLoader)
+
+    def get_frame_position_at(self, time):
+        if not settings.cache_func_orbits:
+            return self.calc_frame_position_at(time)
+        if self.cache is None:
+            self.create_cache()
+        return self.cache.get_position_at(time)
+
+    def calc_frame_position_at(self, time):
+        return None
+
+def update_elliptical_orbits(orbits, time):
+    #Solve Kepler's equation for all the orbits in one call, the result is used by get_frame_position_at()
+    count = len(orbits)
+    if count == 0: return
+    pericenters = numpy.fromiter((orbit.pericenter_distance for orbit in orbits), numpy.float64, count)
+    eccentricities = numpy.fromiter((orbit.eccentricity for orbit in orbits), numpy.float64, count)
+    epochs = numpy.fromiter((orbit.epoch for orbit in orbits), numpy.float64, count)
+    mean_motions = numpy.fromiter((orbit.mean_motion for orbit in orbits), numpy.float64, count)
+    mean_anomalies = numpy.fromiter((orbit.mean_anomaly for orbit in orbits), numpy.float64, count)
+    positions = kepler_pos_array(pericenters, eccentricities, (time - epochs) * mean_motions + mean_anomalies)
+    for (orbit, position) in zip(orbits, positions.tolist()):
+        orbit.batch_time = time
+        orbit.batch_position = LPoint3d(*position)
+
 def create_elliptical_orbit(semi_major_axis=None,
                             semi_major_axis_units=units.AU,
                             pericenter_distance=None,
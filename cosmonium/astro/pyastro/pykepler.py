@@ -22,7 +22,8 @@ from __future__ import absolute_import
 
 from panda3d.core import LPoint3d
 
-from math import sqrt, cos, sin, fabs, pi, atan2, exp, log, fmod, atan, sinh, cosh
+from math import sqrt, cos, sin, tan, fabs, pi, atan2, exp, log, fmod, atan, sinh, cosh
+import numpy
 
 THRESH = 1.0e-12
 MIN_THRESH = 1.0e-14
@@ -173,3 +174,171 @@ def kepler_pos(pericenter, ecc, mean_anom):
         x = a * (ecc - cosh(ecc_anom) )
         y = a * sqrt(ecc * ecc - 1) * sinh(ecc_anom)
         return LPoint3d(x, y, 0.0)
+
+#Vectorized versions of the solvers above, each element is solved independently
+
+def near_parabolic_array(ecc_anom, e):
+    anom2 = numpy.where(e > 1.0, ecc_anom * ecc_anom, -ecc_anom * ecc_anom)
+    term = e * anom2 * ecc_anom / 6.0
+    rval = (1.0 - e) * ecc_anom - term
+    n = 4
+    while numpy.any(numpy.fabs(term) > 1e-15):
+        term *= anom2 / (n * (n + 1))
+        rval -= term
+        n += 2
+    return rval
+
+def kepler_elliptic_array(ecc, mean_anom):
+    tmod = numpy.fmod(mean_anom, pi * 2.0)
+    tmod = numpy.where(tmod > pi, tmod - 2.0 * pi, tmod)
+    tmod = numpy.where(tmod < -pi, tmod + 2.0 * pi, tmod)
+    offset = mean_anom - tmod
+    mean_anom = tmod
+    result = numpy.zeros_like(mean_anom)
+    #Low eccentricities
+    low = ecc < 0.9
+    if numpy.any(low):
+        e = ecc[low]
+        m = mean_anom[low]
+        curr = numpy.arctan2(numpy.sin(m), numpy.cos(m) - e)
+        todo = numpy.ones(len(m), dtype=bool)
+        n_iter = 0
+        while numpy.any(todo) and n_iter < MAX_ITERATIONS:
+            err = (curr[todo] - e[todo] * numpy.sin(curr[todo]) - m[todo]) / (1.0 - e[todo] * numpy.cos(curr[todo]))
+            curr[todo] -= err
+            todo[todo] = numpy.fabs(err) > THRESH
+            n_iter += 1
+        result[low] = curr
+    #High eccentricities
+    high = ~low
+    if numpy.any(high):
+        e = ecc[high]
+        m = mean_anom[high]
+        is_negative = m < 0.0
+        m = numpy.fabs(m)
+        curr = m.copy()
+        thresh = numpy.maximum(THRESH * numpy.fabs(1.0 - e), MIN_THRESH)
+        start = (e > 0.8) & (m < pi / 3.0)
+        trial = m / numpy.fabs(1.0 - e)
+        trial = numpy.where(trial * trial > 6.0 * numpy.fabs(1.0 - e), numpy.cbrt(6.0 * m), trial)
+        curr = numpy.where(start, trial, curr)
+        thresh = numpy.where(start, numpy.minimum(thresh, THRESH), thresh)
+        todo = m != 0.0
+        n_iter = 0
+        while numpy.any(todo) and n_iter < MAX_ITERATIONS:
+            c = curr[todo]
+            et = e[todo]
+            if n_iter > MAX_DEFAULT_ITERATIONS:
+                err = near_parabolic_array(c, et) - m[todo]
+            else:
+                err = c - et * numpy.sin(c) - m[todo]
+            delta_curr = -err / (1.0 - et * numpy.cos(c))
+            curr[todo] = c + delta_curr
+            todo[todo] = numpy.fabs(delta_curr) > thresh[todo]
+            n_iter += 1
+        result[high] = numpy.where(is_negative, -curr, curr)
+    result = numpy.where(mean_anom == 0.0, 0.0, result)
+    return result + offset
+
+def kepler_parabolic_array(mean_anom):
+    a = 3.0 / (2 * sqrt(2)) * mean_anom
+    b = numpy.cbrt(a + numpy.sqrt(a * a + 1))
+    true_anom = 2 * numpy.arctan(b - 1 / b)
+    return true_anom
+
+def kepler_hyperbolic_array(ecc, mean_anom):
+    is_negative = mean_anom < 0.0
+    mean_anom = numpy.fabs(mean_anom)
+    thresh = numpy.maximum(THRESH * numpy.fabs(1.0 - ecc), MIN_THRESH)
+    far = mean_anom / ecc > 3.0
+    trial = mean_anom / numpy.fabs(1.0 - ecc)
+    trial = numpy.where(trial * trial > 6. * numpy.fabs(1.0 - ecc), numpy.cbrt(6. * mean_anom), trial)
+    with numpy.errstate(divide='ignore'):
+        curr = numpy.where(far, numpy.log(mean_anom / ecc) + 0.85, trial)
+    thresh = numpy.where(far, thresh, numpy.minimum(thresh, THRESH))
+    todo = mean_anom != 0.0
+    curr[~todo] = 0.0
+    n_iter = 0
+    while numpy.any(todo) and n_iter < MAX_ITERATIONS:
+        c = curr[todo]
+        et = ecc[todo]
+        err = et * numpy.sinh(c) - c - mean_anom[todo]
+        if n_iter > MAX_DEFAULT_ITERATIONS:
+            near = et < 1.01
+            if numpy.any(near):
+                err[near] = -near_parabolic_array(c[near], et[near]) - mean_anom[todo][near]
+        delta_curr = -err / (et * numpy.cosh(c) - 1.0)
+        curr[todo] = c + delta_curr
+        todo[todo] = numpy.fabs(delta_curr) > thresh[todo]
+        n_iter += 1
+    return numpy.where(is_negative, -curr, curr)
+
+def kepler_pos_array(pericenter, ecc, mean_anom):
+    pericenter = numpy.asarray(pericenter, dtype=numpy.float64)
+    ecc = numpy.asarray(ecc, dtype=numpy.float64)
+    mean_anom = numpy.asarray(mean_anom, dtype=numpy.float64)
+    positions = numpy.zeros((len(ecc), 3))
+    elliptic = ecc < 1.0
+    if numpy.any(elliptic):
+        e = ecc[elliptic]
+        ecc_anom = kepler_elliptic_array(e, mean_anom[elliptic])
+        a = pericenter[elliptic] / (1.0 - e)
+        positions[elliptic, 0] = a * (numpy.cos(ecc_anom) - e)
+        positions[elliptic, 1] = a * numpy.sqrt(1 - e * e) * numpy.sin(ecc_anom)
+    parabolic = ecc == 1.0
+    if numpy.any(parabolic):
+        true_anom = kepler_parabolic_array(mean_anom[parabolic])
+        r = 2 * pericenter[parabolic] / (1 + numpy.cos(true_anom))
+        positions[parabolic, 0] = r * numpy.cos(true_anom)
+        positions[parabolic, 1] = r * numpy.sin(true_anom)
+    hyperbolic = ecc > 1.0
+    if numpy.any(hyperbolic):
+        e = ecc[hyperbolic]
+        ecc_anom = kepler_hyperbolic_array(e, mean_anom[hyperbolic])
+        a = pericenter[hyperbolic] / (e - 1.0)
+        positions[hyperbolic, 0] = a * (e - numpy.cosh(ecc_anom))
+        positions[hyperbolic, 1] = a * numpy.sqrt(e * e - 1) * numpy.sinh(ecc_anom)
+    return positions
+
+def kepler_path(pericenter, ecc, nb_points, max_mean_anom=10 * pi, oversampling=16):
+    #Sample the conic with a density proportional to the square root of its curvature, this keeps
+    #the chord error constant along the path and concentrates the points around the pericenter.
+    #The path is parametrized by the eccentric anomaly (or D = tan(v/2) for the parabola), for such
+    #a parametrization sqrt(curvature) * ds is sqrt(cross / speed) * dt
+    closed = ecc < 1.0
+    if closed:
+        a = pericenter / (1.0 - ecc)
+        b = a * sqrt(1.0 - ecc * ecc)
+        end = pi
+    elif ecc == 1.0:
+        end = tan(kepler_parabolic(max_mean_anom) / 2)
+    else:
+        a = pericenter / (ecc - 1.0)
+        b = a * sqrt(ecc * ecc - 1.0)
+        end = kepler_hyperbolic(ecc, max_mean_anom)
+    params = numpy.linspace(-end, end, nb_points * oversampling + 1)
+    if closed:
+        speed = numpy.hypot(a * numpy.sin(params), b * numpy.cos(params))
+        cross = a * b
+    elif ecc == 1.0:
+        speed = 2 * pericenter * numpy.sqrt(1 + params * params)
+        cross = 4 * pericenter * pericenter
+    else:
+        speed = numpy.hypot(a * numpy.sinh(params), b * numpy.cosh(params))
+        cross = a * b
+    weights = numpy.sqrt(cross / speed)
+    cumulated = numpy.zeros(len(params))
+    numpy.cumsum((weights[1:] + weights[:-1]) * numpy.diff(params) / 2, out=cumulated[1:])
+    targets = numpy.linspace(0, cumulated[-1], nb_points, endpoint=not closed)
+    params = numpy.interp(targets, cumulated, params)
+    positions = numpy.zeros((nb_points, 3))
+    if closed:
+        positions[:, 0] = a * (numpy.cos(params) - ecc)
+        positions[:, 1] = b * numpy.sin(params)
+    elif ecc == 1.0:
+        positions[:, 0] = pericenter * (1 - params * params)
+        positions[:, 1] = 2 * pericenter * params
+    else:
+        positions[:, 0] = a * (ecc - numpy.cosh(params))
+        positions[:, 1] = b * numpy.sinh(params)
+    return positions
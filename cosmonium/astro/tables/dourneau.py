@@ -44,7 +44,7 @@ class Dourneau(FuncOrbit):
     def is_closed(self):
         return False
 
-    def get_frame_position_at(self, time):
+    def calc_frame_position_at(self, time):
         return dourneau_sat_pos(time, self.sat_id)
 
     def get_frame_rotation_at(self, time):
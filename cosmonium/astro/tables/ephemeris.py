@@ -0,0 +1,161 @@
+#
+#This file is part of Cosmonium.
+#
+#Copyright (C) 2018-2019 Laurent Deru.
+#
+#Cosmonium is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+#
+#Cosmonium is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License
+#along with Cosmonium.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+from __future__ import print_function
+from __future__ import absolute_import
+
+from panda3d.core import LPoint3d, LQuaterniond
+
+from ..elementsdb import orbit_elements_db
+from ..orbits import FuncOrbit
+from ..frame import J2000EclipticReferenceFrame, J2000EquatorialReferenceFrame
+from ..frame import J2000BarycentricEclipticReferenceFrame, J2000HeliocentricEclipticReferenceFrame
+from ..frame import J2000BarycentricEquatorialReferenceFrame, J2000HeliocentricEquatorialReferenceFrame
+from ..chebyshev import chebyshev_fit, chebyshev_eval, chebyshev_error
+from ... import settings
+
+from math import ceil
+import numpy
+import sys
+import os
+
+ephemeris_magic = b'COSMEPH'
+ephemeris_version = 1
+
+ephemeris_header_type = numpy.dtype([('magic', 'S8'),
+                                     ('version', '<u4'),
+                                     ('degree', '<u4'),
+                                     ('count', '<u4'),
+                                     ('frame', 'S40'),
+                                     ('start', '<f8'),
+                                     ('step', '<f8'),
+                                     ('period', '<f8'),
+                                     ('radius', '<f8')])
+
+ephemeris_frames = {'J2000Ecliptic': J2000EclipticReferenceFrame,
+                    'J2000BarycentricEcliptic': J2000BarycentricEclipticReferenceFrame,
+                    'J2000HeliocentricEcliptic': J2000HeliocentricEclipticReferenceFrame,
+                    'J2000Equatorial': J2000EquatorialReferenceFrame,
+                    'J2000BarycentricEquatorial': J2000BarycentricEquatorialReferenceFrame,
+                    'J2000HeliocentricEquatorial': J2000HeliocentricEquatorialReferenceFrame,
+                    }
+
+class EphemerisOrbit(FuncOrbit):
+    def __init__(self, filename):
+        header = numpy.fromfile(filename, ephemeris_header_type, 1)
+        if len(header) != 1 or header['magic'][0] != ephemeris_magic or header['version'][0] != ephemeris_version:
+            raise ValueError("Invalid ephemeris file %s" % filename)
+        header = header[0]
+        frame = ephemeris_frames[header['frame'].decode()]()
+        FuncOrbit.__init__(self, float(header['period']), float(header['radius']), 0.0, frame)
+        self.filename = filename
+        self.start = float(header['start'])
+        self.step = float(header['step'])
+        self.count = int(header['count'])
+        self.end = self.start + self.count * self.step
+        self.coefs = numpy.memmap(filename, numpy.float64, 'r', offset=ephemeris_header_type.itemsize,
+                                  shape=(self.count, int(header['degree']) + 1, 3))
+
+    def is_periodic(self):
+        return True
+
+    def is_closed(self):
+        return False
+
+    def get_frame_position_at(self, time):
+        #The segments are already a Chebyshev interpolation, there is no need for the cache
+        return self.calc_frame_position_at(time)
+
+    def calc_frame_position_at(self, time):
+        time = min(max(time, self.start), self.end)
+        index = min(int((time - self.start) / self.step), self.count - 1)
+        start = self.start + index * self.step
+        return LPoint3d(*chebyshev_eval(self.coefs[index], start, start + self.step, time))
+
+    def get_frame_rotation_at(self, time):
+        return LQuaterniond()
+
+def create_ephemeris(orbit, start, end, filename, accuracy=settings.func_orbits_cache_accuracy, degree=12):
+    frame_name = None
+    for (name, frame_class) in ephemeris_frames.items():
+        if type(orbit.frame) is frame_class:
+            frame_name = name
+            break
+    if frame_name is None:
+        print("Unsupported reference frame", orbit.frame.__class__.__name__)
+        return False
+    def func(time):
+        return orbit.get_frame_rotation_at(time).xform(orbit.get_frame_position_at(time))
+    period = orbit.get_period()
+    if period == 0.0:
+        period = end - start
+    step = min(period / 32, end - start)
+    while True:
+        count = int(ceil((end - start) / step))
+        segments = numpy.empty((count, degree + 1, 3))
+        radius = 0.0
+        for i in range(count):
+            segment_start = start + i * step
+            segments[i] = chebyshev_fit(func, segment_start, segment_start + step, degree)
+            error = chebyshev_error(func, segments[i], segment_start, segment_start + step)
+            if error > accuracy:
+                break
+            radius = max(radius, func(segment_start).length())
+        else:
+            break
+        step /= 2.0
+        print("Error", error, "too large, reducing step to", step)
+    header = numpy.zeros(1, ephemeris_header_type)
+    header['magic'] = ephemeris_magic
+    header['version'] = ephemeris_version
+    header['degree'] = degree
+    header['count'] = count
+    header['frame'] = frame_name.encode()
+    header['start'] = start
+    header['step'] = step
+    header['period'] = period
+    header['radius'] = radius
+    with open(filename, 'wb') as output:
+        header.tofile(output)
+        segments.tofile(output)
+    print("Created", filename, "with", count, "segments of", step, "days")
+    return True
+
+def load_ephemeris_dir(path):
+    if not os.path.isdir(path): return
+    for filename in sorted(os.listdir(path)):
+        (element_name, ext) = os.path.splitext(filename)
+        if ext != '.eph': continue
+        try:
+            orbit_elements_db.register_element('ephemeris', element_name, EphemerisOrbit(os.path.join(path, filename)))
+        except (ValueError, KeyError, IOError) as e:
+            print("Could not load ephemeris", filename, e)
+
+orbit_elements_db.register_category('ephemeris', 75)
+load_ephemeris_dir(settings.ephemeris_dir)
+
+if __name__ == '__main__':
+    if len(sys.argv) == 5:
+        #import the tables to add them to the DB
+        from . import vsop87, lieske_e5, elp82, meeus, gust86, dourneau, rckin, htc20
+        orbit = orbit_elements_db.get(sys.argv[1])
+        if orbit is not None:
+            create_ephemeris(orbit, float(sys.argv[2]), float(sys.argv[3]), sys.argv[4])
+    else:
+        print("Usage:", sys.argv[0], "<orbit> <start JD> <end JD> <output.eph>")
@@ -44,7 +44,7 @@ class LieskE5(FuncOrbit):
     def is_closed(self):
         return False
 
-    def get_frame_position_at(self, time):
+    def calc_frame_position_at(self, time):
         #TODO: The position is in the ecliptic plane of date, not J2000.0
         #The precession must be taken into account
         return lieske_e5_sat_pos(time, self.sat_id)
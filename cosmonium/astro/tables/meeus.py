@@ -44,7 +44,7 @@ class PlutoOrbit(FuncOrbit):
     def is_closed(self):
         return False
 
-    def get_frame_position_at(self, time):
+    def calc_frame_position_at(self, time):
         return pluto_pos(time)
 
     def get_frame_rotation_at(self, time):
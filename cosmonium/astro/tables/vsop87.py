@@ -46,7 +46,7 @@ class VSOP87(FuncOrbit):
     def is_closed(self):
         return False
 
-    def get_frame_position_at(self, time):
+    def calc_frame_position_at(self, time):
         #TODO: The position is in the ecliptic plane of date, not J2000.0
         #The precession must be taken into account
         return vsop87_pos(time, self.planet_id)
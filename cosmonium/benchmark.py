@@ -0,0 +1,145 @@
+#
+#This file is part of Cosmonium.
+#
+#Copyright (C) 2018-2019 Laurent Deru.
+#
+#Cosmonium is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+#
+#Cosmonium is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License
+#along with Cosmonium.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+from __future__ import print_function
+from __future__ import absolute_import
+
+from panda3d.core import ClockObject
+from direct.task.Task import Task
+
+from .stellarobject import StellarObject
+from .patchscheduler import patchLoadScheduler
+from . import version
+
+from functools import wraps
+from time import perf_counter
+import json
+import gc
+import sys
+
+class FrameBenchmark(object):
+    stages = ['update_octree', 'update_universe', 'update_obs', 'update_visibility', 'update_instances']
+    counters = ['nb_update', 'nb_obs', 'nb_visibility', 'nb_instance']
+
+    def __init__(self, engine, output, states=None, nb_frames=100, frame_rate=60.0):
+        self.engine = engine
+        self.output = output
+        if states is None:
+            states = []
+        self.states = list(states)
+        self.nb_frames = nb_frames
+        self.frame_rate = frame_rate
+        self.segments = []
+        self.frames = []
+        self.state = None
+        self.stage_times = dict((stage, 0.0) for stage in self.stages)
+        self.last_frame = None
+        self.last_blocks = None
+        self.last_collections = None
+
+    def wrap_stage(self, name):
+        method = getattr(self.engine, name)
+        @wraps(method)
+        def timed_stage(*args, **kwargs):
+            start = perf_counter()
+            result = method(*args, **kwargs)
+            self.stage_times[name] += perf_counter() - start
+            return result
+        setattr(self.engine, name, timed_stage)
+
+    def start(self):
+        #The frames are advanced with a constant time step so that each run replays the same simulation
+        globalClock.set_mode(ClockObject.M_non_real_time)
+        globalClock.set_frame_rate(self.frame_rate)
+        for stage in self.stages:
+            self.wrap_stage(stage)
+        if len(self.states) == 0:
+            #The start up script, or the default target, is already running, only the date must be fixed
+            self.engine.time.set_J2000_date()
+            self.start_segment(self.engine.app_config.script or 'default')
+        else:
+            self.next_state()
+        taskMgr.add(self.frame_task, 'benchmark-task', sort=1)
+
+    def next_state(self):
+        url = self.states.pop(0)
+        self.engine.load_cel_url(url)
+        self.start_segment(url)
+
+    def start_segment(self, state):
+        print("Benchmarking", state)
+        self.state = state
+        self.frames = []
+        self.last_frame = perf_counter()
+        self.last_blocks = sys.getallocatedblocks()
+        self.last_collections = self.get_collections()
+
+    def get_collections(self):
+        return sum(stats['collections'] for stats in gc.get_stats())
+
+    def frame_task(self, task):
+        now = perf_counter()
+        blocks = sys.getallocatedblocks()
+        collections = self.get_collections()
+        frame = {'frame': now - self.last_frame,
+                 'allocated_blocks': blocks - self.last_blocks,
+                 'gc_collections': collections - self.last_collections}
+        for stage in self.stages:
+            frame[stage] = self.stage_times[stage]
+            self.stage_times[stage] = 0.0
+        for counter in self.counters:
+            frame[counter] = getattr(StellarObject, counter)
+        scheduler_stats = patchLoadScheduler.get_stats()
+        frame['patch_queue_depth'] = scheduler_stats['queue_depth']
+        frame['patch_in_flight'] = scheduler_stats['in_flight']
+        self.frames.append(frame)
+        self.last_frame = now
+        self.last_blocks = blocks
+        self.last_collections = collections
+        if len(self.frames) < self.nb_frames:
+            return Task.cont
+        self.segments.append(self.summarize())
+        if len(self.states) > 0:
+            self.next_state()
+            return Task.cont
+        self.save()
+        self.engine.userExit()
+        return Task.done
+
+    def summarize(self):
+        summary = {}
+        for key in self.frames[0].keys():
+            values = sorted(frame[key] for frame in self.frames)
+            summary[key] = {'mean': sum(values) / len(values),
+                            'median': values[len(values) // 2],
+                            'min': values[0],
+                            'max': values[-1]}
+        return {'state': self.state, 'summary': summary, 'patch_scheduler': patchLoadScheduler.get_stats(), 'frames': self.frames}
+
+    def save(self):
+        result = {'version': version.version_str,
+                  'frame_rate': self.frame_rate,
+                  'nb_frames': self.nb_frames,
+                  'segments': self.segments}
+        try:
+            with open(self.output, 'w') as output:
+                json.dump(result, output, indent=1)
+            print("Benchmark saved to", self.output)
+        except IOError as e:
+            print("Could not save benchmark to", self.output, ':', e)
@@ -23,6 +23,10 @@ from __future__ import absolute_import
 from . import settings
 
 import os
+import io
+import hashlib
+import pickle
+from itertools import islice
 
 def init_cache():
     print("Cache directory:", settings.cache_dir)
@@ -32,3 +36,141 @@ def create_path_for(*path):
     if not os.path.isdir(final_path):
         os.makedirs(final_path)
     return final_path
+
+#Total size of the parsed cache, scanned once on the first write and then updated with each new entry
+parsed_cache_size = None
+#Fraction of the maximum size kept by an eviction, so that the following entries do not trigger a new one
+parsed_cache_low_mark = 0.75
+
+def scan_parsed():
+    entries = []
+    total_size = 0
+    for (dirpath, dirnames, filenames) in os.walk(create_path_for('parsed')):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_size += stat.st_size
+    return (entries, total_size)
+
+def evict_parsed(max_size):
+    #Remove the least recently used entries until the cache fits in the allowed size
+    (entries, total_size) = scan_parsed()
+    entries.sort()
+    for (mtime, size, path) in entries:
+        if total_size <= max_size: break
+        try:
+            os.remove(path)
+            total_size -= size
+        except OSError as e:
+            print("Could not remove", path, ':', e)
+    return total_size
+
+def add_parsed_size(size):
+    global parsed_cache_size
+    if parsed_cache_size is None:
+        #The new entry is already written and is included in the scan
+        parsed_cache_size = scan_parsed()[1]
+    else:
+        parsed_cache_size += size
+    if parsed_cache_size > settings.parsed_cache_max_size:
+        parsed_cache_size = evict_parsed(settings.parsed_cache_max_size * parsed_cache_low_mark)
+
+def get_parsed_cache_file(category, version, text):
+    md5 = hashlib.md5(text.encode('utf8'))
+    md5.update(('%s-%d' % (category, version)).encode())
+    return os.path.join(create_path_for('parsed', category), md5.hexdigest() + ".dat")
+
+def parse_with_cache(category, version, filepath, parse, encoding='utf8'):
+    #The result of parse() is stored for the content of the file and the version of the parser
+    #Only the parsed data is cached, the objects built from it by the callers can not be pickled
+    #and are created again at each start
+    text = io.open(filepath, encoding=encoding).read()
+    cache_file = get_parsed_cache_file(category, version, text)
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, "rb") as f:
+                data = pickle.load(f)
+            #The modification time is used as last access time for the eviction
+            os.utime(cache_file, None)
+            return data
+        except (IOError, OSError, ValueError, EOFError, pickle.UnpicklingError) as e:
+            print("Could not read cache for", filepath, cache_file, ':', e)
+    data = parse(text)
+    if data is not None:
+        #The entry is written in a temporary file so that a failed or interrupted write leaves no truncated entry
+        temp_file = cache_file + '.tmp'
+        try:
+            try:
+                with open(temp_file, "wb") as f:
+                    pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+                    size = f.tell()
+                os.replace(temp_file, cache_file)
+                add_parsed_size(size)
+            finally:
+                if os.path.exists(temp_file):
+                    os.remove(temp_file)
+        except (IOError, pickle.PicklingError, AttributeError, TypeError) as e:
+            print("Could not write cache for", filepath, cache_file, ':', e)
+    return data
+
+def stream_with_cache(category, version, filepath, parse_items, encoding='utf8'):
+    #Same as parse_with_cache() for a parser generating items, the items are pickled one by one
+    #so that they can be streamed to the caller both when they are parsed and when they are read back
+    text = io.open(filepath, encoding=encoding).read()
+    cache_file = get_parsed_cache_file(category, version, text)
+    nb_items = 0
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, "rb") as f:
+                #The modification time is used as last access time for the eviction
+                os.utime(cache_file, None)
+                while True:
+                    try:
+                        item = pickle.load(f)
+                    except EOFError:
+                        return
+                    nb_items += 1
+                    yield item
+        except (IOError, OSError, ValueError, pickle.UnpicklingError) as e:
+            print("Could not read cache for", filepath, cache_file, ':', e)
+            try:
+                os.remove(cache_file)
+            except OSError:
+                pass
+        #The items already read are skipped, the rest are parsed again, the entry is written at the next run
+        for item in islice(parse_items(text), nb_items, None):
+            yield item
+        return
+    #The entry is written in a temporary file and only stored once all the items are parsed
+    temp_file = cache_file + '.tmp'
+    try:
+        f = open(temp_file, "wb")
+    except IOError as e:
+        print("Could not write cache for", filepath, cache_file, ':', e)
+        f = None
+    try:
+        for item in parse_items(text):
+            if f is not None:
+                try:
+                    pickle.dump(item, f, pickle.HIGHEST_PROTOCOL)
+                except (IOError, pickle.PicklingError) as e:
+                    print("Could not write cache for", filepath, cache_file, ':', e)
+                    f.close()
+                    f = None
+                    os.remove(temp_file)
+            yield item
+        if f is not None:
+            size = f.tell()
+            f.close()
+            f = None
+            os.replace(temp_file, cache_file)
+            add_parsed_size(size)
+    finally:
+        #The caller stopped before the end of the items or the parser failed
+        if f is not None:
+            f.close()
+            os.remove(temp_file)
@@ -18,6 +18,60 @@
 #
 from .utils import int_to_color
 
+from bisect import bisect_left
+import numpy
+
+class NamesIndex(object):
+    def __init__(self, names, values, orders):
+        #The entries are sorted on the upper case names to allow prefix searches
+        keys = numpy.char.upper(names)
+        key_order = numpy.argsort(keys, kind='stable')
+        self.keys = keys[key_order]
+        self.names = names[key_order]
+        self.values = values[key_order]
+        self.orders = orders[key_order]
+        self.value_order = None
+        self.sorted_values = None
+
+    @classmethod
+    def from_dict(cls, names_dict):
+        values = []
+        names = []
+        orders = []
+        for (value, aliases) in names_dict.items():
+            for (order, name) in enumerate(aliases):
+                values.append(value)
+                names.append(name)
+                orders.append(order)
+        return cls(numpy.array(names, dtype=str), numpy.array(values, dtype=numpy.int64), numpy.array(orders, dtype=numpy.int32))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def find(self, key):
+        position = numpy.searchsorted(self.keys, key)
+        if position < len(self.keys) and self.keys[position] == key:
+            return int(self.values[position])
+        return None
+
+    def startswith(self, prefix):
+        result = []
+        position = int(numpy.searchsorted(self.keys, prefix))
+        while position < len(self.keys) and self.keys[position].startswith(prefix):
+            result.append((str(self.names[position]), int(self.values[position])))
+            position += 1
+        return result
+
+    def get_names(self, value):
+        if self.value_order is None:
+            self.value_order = numpy.lexsort((self.orders, self.values))
+            self.sorted_values = self.values[self.value_order]
+        start = numpy.searchsorted(self.sorted_values, value, 'left')
+        end = numpy.searchsorted(self.sorted_values, value, 'right')
+        if start == end:
+            return None
+        return self.names[self.value_order[start:end]].tolist()
+
 class ObjectsDB(object):
     def __init__(self):
         self.db = {}
@@ -44,7 +98,9 @@ class ObjectsDB(object):
 class GlobalObjectsDB(object):
     def __init__(self):
         self.db = {}
+        self.sorted_keys = None
         self.oids = []
+        self.catalogs = []
 
     def add(self, body):
         body.oid = len(self.oids)
@@ -54,13 +110,42 @@ class GlobalObjectsDB(object):
             self.db[name.upper()] = body
         for name in body.source_names:
             self.db[name.upper()] = body
+        self.sorted_keys = None
+
+    def add_catalog(self, catalog):
+        #Reserve a range of oids for the catalog, its entries are only instanciated on demand
+        catalog.base_oid = len(self.oids)
+        self.oids.extend([None] * catalog.size)
+        self.catalogs.append(catalog)
+
+    def set_oid(self, body, oid):
+        if body.oid is not None and self.oids[body.oid] is body:
+            if body.oid == len(self.oids) - 1:
+                self.oids.pop()
+            else:
+                self.oids[body.oid] = None
+        body.oid = oid
+        body.oid_color = int_to_color(oid)
+        self.oids[oid] = body
 
     def get(self, name):
-        return self.db.get(name.upper(), None)
+        name = name.upper()
+        body = self.db.get(name, None)
+        if body is None:
+            for catalog in self.catalogs:
+                body = catalog.find_by_name(name)
+                if body is not None: break
+        return body
 
     def get_oid(self, oid):
         if oid < len(self.oids):
-            return self.oids[oid]
+            body = self.oids[oid]
+            if body is None:
+                for catalog in self.catalogs:
+                    if catalog.base_oid <= oid < catalog.base_oid + catalog.size:
+                        body = catalog.get_star(oid - catalog.base_oid)
+                        break
+            return body
         else:
             return None
 
@@ -68,13 +153,22 @@ class GlobalObjectsDB(object):
         for name in body.names:
             self.db.pop(name.upper(), None)
         self.oids[body.oid] = None
+        self.sorted_keys = None
 
     def startswith(self, text):
         text = text.upper()
         result = []
-        for (key, value) in self.db.items():
-            if key.startswith(text):
-                result.append((value.get_exact_name(key), value))
+        #The names are only sorted when a search is done after the database was modified
+        if self.sorted_keys is None:
+            self.sorted_keys = sorted(self.db)
+        position = bisect_left(self.sorted_keys, text)
+        while position < len(self.sorted_keys) and self.sorted_keys[position].startswith(text):
+            key = self.sorted_keys[position]
+            value = self.db[key]
+            result.append((value.get_exact_name(key), value))
+            position += 1
+        for catalog in self.catalogs:
+            result += catalog.startswith(text)
         return result
 
 objectsDB = GlobalObjectsDB()
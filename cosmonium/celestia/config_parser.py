@@ -20,263 +20,187 @@
 from __future__ import print_function
 from __future__ import absolute_import
 
-from ply import lex
-from ply import yacc
+from ..cache import stream_with_cache
+from .. import settings
 
 import sys
+import io
+import re
+
+#Must be increased when the parsed items change to invalidate the cache
+parser_version = 3
+
+#The token patterns are tried in order, like the rules of the previous PLY lexer
+token_re = re.compile(r'''
+    (?P<ignore>[ \t\r]+|\#.*)
+   |(?P<BOOL>(?:true|false)\b)
+   |(?P<NAME>[a-zA-Z_][a-zA-Z0-9_]*)
+   |(?P<STRING>\".*?\")
+   |(?P<FLOAT>[\+-]?((\d*\.\d+)([eE][\+-]?\d+)?|[\+-]?([1-9]\d*[eE][\+-]?\d+)))
+   |(?P<INT>[\+-]?\d+)
+   |(?P<LITERAL>[\(\)\[\]\{\}])
+   ''', re.VERBOSE)
+
+class ConfigSyntaxError(Exception):
+    pass
+
+def tokenize(stream):
+    #The tokens never span several lines, the stream is tokenized incrementally line by line
+    for (lineno, line) in enumerate(stream, 1):
+        line = line.rstrip('\n')
+        position = 0
+        end = len(line)
+        while position < end:
+            match = token_re.match(line, position)
+            if match is None:
+                print("Illegal character '%s'" % line[position])
+                position += 1
+                continue
+            position = match.end()
+            kind = match.lastgroup
+            if kind == 'ignore':
+                continue
+            value = match.group(kind)
+            if kind == 'BOOL':
+                value = value == 'true'
+            elif kind == 'STRING':
+                value = value[1:-1]
+            elif kind == 'FLOAT':
+                value = float(value)
+            elif kind == 'INT':
+                value = int(value)
+            elif kind == 'LITERAL':
+                kind = value
+            yield (kind, value, lineno)
+
+class ItemsReader(object):
+    def __init__(self, stream):
+        self.tokens = tokenize(stream)
+        self.token = None
+        self.depth = 0
+        self.next()
+
+    def next(self):
+        token = self.token
+        self.token = next(self.tokens, None)
+        #Track the nesting of the consumed braces to be able to resynchronize after an error
+        if token is not None:
+            if token[0] == '{':
+                self.depth += 1
+            elif token[0] == '}' and self.depth > 0:
+                self.depth -= 1
+        return token
+
+    def error(self):
+        if self.token is not None:
+            (kind, value, lineno) = self.token
+            print("Syntax error at token", kind, "line", lineno, ":", value)
+        else:
+            print("SYNTAX ERROR AT EOF")
+        raise ConfigSyntaxError()
+
+    def expect(self, kind):
+        if self.token is None or self.token[0] != kind:
+            self.error()
+        return self.next()[1]
+
+    def skip_definition(self):
+        #Resynchronize on the end of the current top level definition, the error can be in a nested hash
+        if self.depth == 0:
+            #The error is in the header, its definition is skipped too
+            while self.token is not None and self.token[0] != '{':
+                self.next()
+            if self.token is None: return
+            self.next()
+        while self.token is not None and self.depth > 0:
+            self.next()
+
+    def read_header(self):
+        header = []
+        while self.token is not None and self.token[0] != '{':
+            header.append(self.next())
+        kinds = [token[0] for token in header]
+        values = [token[1] for token in header]
+        nb_names = 0
+        while nb_names < min(len(kinds), 2) and kinds[nb_names] == 'NAME':
+            nb_names += 1
+        if nb_names == 2:
+            (disposition, item_type) = values[:2]
+        elif nb_names == 1:
+            (disposition, item_type) = ('Add', values[0])
+        else:
+            (disposition, item_type) = ('Add', 'Body')
+        kinds = kinds[nb_names:]
+        values = values[nb_names:]
+        item_name = None
+        item_parent = None
+        item_alias = None
+        if kinds == [] and nb_names == 1:
+            pass
+        elif kinds in (['INT'], ['STRING']):
+            item_name = values[0]
+        elif kinds == ['INT', 'STRING']:
+            (item_name, item_alias) = values
+        elif kinds == ['STRING', 'STRING']:
+            (item_name, item_parent) = values
+        else:
+            self.error()
+        return [disposition, item_type, item_name, item_parent, item_alias]
+
+    def read_entries(self):
+        entries = {}
+        self.expect('{')
+        while self.token is not None and self.token[0] == 'NAME':
+            key = self.next()[1]
+            entries[key] = self.read_value()
+        self.expect('}')
+        return entries
+
+    def read_value(self):
+        if self.token is None:
+            self.error()
+        kind = self.token[0]
+        if kind in ('INT', 'FLOAT', 'STRING', 'BOOL'):
+            return self.next()[1]
+        elif kind == '[':
+            self.next()
+            values = []
+            while self.token is not None and self.token[0] in ('INT', 'FLOAT'):
+                values.append(self.next()[1])
+            self.expect(']')
+            return values
+        elif kind == '{':
+            return self.read_entries()
+        else:
+            self.error()
+
+    def __iter__(self):
+        while self.token is not None:
+            try:
+                item = self.read_header()
+                item.append(self.read_entries())
+                yield item
+            except ConfigSyntaxError:
+                self.skip_definition()
+
+def read_items(stream):
+    return iter(ItemsReader(stream))
+
+def parse_items(data):
+    return read_items(io.StringIO(data))
 
-tokens = ('STRING', 'NAME', 'INT', 'FLOAT', 'BOOL')
-
-literals = ['(', ')', '[', ']', '{', '}']
-
-# Ignored characters
-t_ignore = " \t"
-t_ignore_COMMENT = r'\#.*'
-
-def t_BOOL(t):
-    r'true|false'
-    t.value = t.value == 'true'
-    return t
- 
-def t_NAME(t):   
-    r'[a-zA-Z_][a-zA-Z0-9_]*'
-    return t
-
-def t_STRING(t):
-    r'\".*?\"'
-    t.value = t.value[1:-1]
-    return t
-
-def t_FLOAT(t):
-    r'[\+-]?((\d*\.\d+)([eE][\+-]?\d+)?|[\+-]?([1-9]\d*[eE][\+-]?\d+))'
-    try:
-        t.value = float(t.value)
-    except ValueError:
-        print("Float value too large %d", t.value)
-        t.value = 0
-    return t
-
-def t_INT(t):
-    r'[\+-]?\d+'
-    try:
-        t.value = int(t.value)
-    except ValueError:
-        print("Integer value too large %d", t.value)
-        t.value = 0
-    return t
- 
-def t_newline(t):
-    r'(\r?\n)+'
-    t.lexer.lineno += t.value.count("\n")
-    
-def t_error(t):
-    print("Illegal character '%s'" % t.value[0])
-    t.lexer.skip(1)
-    
-# Build the lexer
-lexer = lex.lex()
-
-precedence=()
-
-def p_definition_list(p):
-    '''definition_list : definition_list definition'''
-    p[0] = p[1]
-    p[0].append(p[2])
-
-def p_definition_list_1(p):
-    '''definition_list : definition'''
-    p[0]=[p[1]]
-
-def p_definition_without_alias(p):
-    ''' definition : NAME NAME INT '{' entry_list '}'
-                   | NAME INT '{' entry_list '}'
-                   | INT '{' entry_list '}'
-    '''
-    item_parent = None
-    item_alias = None
-    if len(p) == 7:
-        disposition = p[1]
-        item_type = p[2]
-        item_name = p[3]
-        item_data = p[5]
-    elif len(p) == 6:
-        disposition = 'Add'
-        item_type = p[1]
-        item_name = p[2]
-        item_data = p[4]
-    else:
-        disposition = 'Add'
-        item_type = 'Body'
-        item_name = p[1]
-        item_data = p[3]
-    #print("Got definition of ", item_type, item_name, "of", item_parent)
-    #print(item_data)
-    p[0] = [disposition, item_type, item_name, item_parent, item_alias, item_data]
-
-def p_definition_with_alias(p):
-    ''' definition : NAME NAME INT STRING '{' entry_list '}'
-                   | NAME INT STRING '{' entry_list '}'
-                   | INT STRING '{' entry_list '}'
-    '''
-    item_parent = None
-    if len(p) == 8:
-        disposition = p[1]
-        item_type = p[2]
-        item_name = p[3]
-        item_alias = p[4]
-        item_data = p[6]
-    elif len(p) == 7:
-        disposition = 'Add'
-        item_type = p[1]
-        item_name = p[2]
-        item_alias = p[3]
-        item_data = p[5]
-    else:
-        disposition = 'Add'
-        item_type = 'Body'
-        item_name = p[1]
-        item_alias = p[2]
-        item_data = p[4]
-    #print("Got definition of ", item_type, item_name, "of", item_parent)
-    #print(item_data)
-    p[0] = [disposition, item_type, item_name, item_parent, item_alias, item_data]
-
-
-def p_definition_without_parent(p):
-    ''' definition : NAME NAME STRING '{' entry_list '}'
-                   | NAME STRING '{' entry_list '}'
-                   | STRING '{' entry_list '}'
-    '''
-    item_parent = None
-    item_alias = None
-    if len(p) == 7:
-        disposition = p[1]
-        item_type = p[2]
-        item_name = p[3]
-        item_data = p[5]
-    elif len(p) == 6:
-        disposition = 'Add'
-        item_type = p[1]
-        item_name = p[2]
-        item_data = p[4]
-    else:
-        disposition = 'Add'
-        item_type = 'Body'
-        item_name = p[1]
-        item_data = p[3]
-    #print("Got definition of ", item_type, item_name, "of", item_parent)
-    #print(item_data)
-    p[0] = [disposition, item_type, item_name, item_parent, item_alias, item_data]
-
-def p_definition_with_parent(p):
-    ''' definition : NAME NAME STRING STRING '{' entry_list '}'
-                   | NAME STRING STRING '{' entry_list '}'
-                   | STRING STRING '{' entry_list '}'
-    '''
-    item_alias = None
-    if len(p) == 8:
-        disposition = p[1]
-        item_type = p[2]
-        item_name = p[3]
-        item_parent = p[4]
-        item_data = p[6]
-    elif len(p) == 7:
-        disposition = 'Add'
-        item_type = p[1]
-        item_name = p[2]
-        item_parent = p[3]
-        item_data = p[5]
-    else:
-        disposition = 'Add'
-        item_type = 'Body'
-        item_name = p[1]
-        item_parent = p[2]
-        item_data = p[4]
-    #print("Got definition of ", item_type, item_name, "of", item_parent)
-    #print(item_data)
-    p[0] = [disposition, item_type, item_name, item_parent, item_alias, item_data]
-
-def p_definition_without_name(p):
-    ''' definition : NAME '{' entry_list '}'
-    '''
-    item_parent = None
-    item_alias = None
-    disposition = 'Add'
-    item_type = p[1]
-    item_name = None
-    item_data = p[3]
-    #print("Got definition of ", item_type, item_name, "of", item_parent)
-    #print(item_data)
-    p[0] = [disposition, item_type, item_name, item_parent, item_alias, item_data]
-
-
-def p_entry_list(p):
-    '''entry_list : entry_list entry'''
-    p[0] = p[1]
-    entry = p[2]
-    p[0][entry[0]] = entry[1]
-
-def p_entry_list_1(p):
-    '''entry_list : entry'''
-    p[0] = {}
-    entry = p[1]
-    p[0][entry[0]] = entry[1]
-
-def p_entry_list_2(p):
-    '''entry_list : empty'''
-    p[0] = {}
-
-def p_entry(p):
-    '''entry : NAME INT
-             | NAME FLOAT
-             | NAME STRING
-             | NAME BOOL
-             | NAME vector
-             | NAME hash'''
-    p[0] = [p[1], p[2]]
-
-def p_vector(p):
-    '''vector : '[' float_list ']' '''
-    p[0] = p[2]
-
-def p_float_list(p):
-    '''float_list : float_list FLOAT
-                  | float_list INT'''
-    p[0] = p[1]
-    p[0].append(p[2])
-
-def p_float_list_1(p):
-    '''float_list : FLOAT
-                  | INT'''
-    p[0] = [p[1]]
-
-def p_float_list_2(p):
-    '''float_list : empty'''
-    p[0] = []
-
-def p_hash(p):
-    '''hash : '{' entry_list '}' '''
-    p[0] = p[2]
-
-def p_empty(p):
-    '''empty : '''
-
-# Catastrophic error handler
+def parse(data, debug=0):
+    return list(parse_items(data))
 
-def p_error(p):
-    if p:
-        print("Syntax error at token", p.type, "line", p.lineno, ":", p.value)
+def load_file(filepath):
+    if settings.cache_celestia:
+        #The whole file is read to compute its hash, the items are streamed and stored for the next run
+        for item in stream_with_cache('celestia', parser_version, filepath, parse_items, encoding='latin-1'):
+            yield item
     else:
-        print("SYNTAX ERROR AT EOF")
-
-parser = yacc.yacc(tabmodule='ssc_parsetab', write_tables=False, debug=False)
-
-def parse(data, debug=0):
-    parser.error = 0
-    p = parser.parse(data, lexer=lexer, debug=debug)
-    if parser.error:
-        return None
-    return p
+        with io.open(filepath, encoding='latin-1') as stream:
+            for item in read_items(stream):
+                yield item
 
 if __name__ == '__main__':
     if len(sys.argv) == 2:
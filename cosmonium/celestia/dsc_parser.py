@@ -33,7 +33,6 @@ from ..dircontext import defaultDirContext
 from .. import utils
 
 import sys
-import io
 
 def names_list(name):
     return name.split(':')
@@ -109,10 +108,8 @@ def parse_file(filename, universe, context=defaultDirContext):
     if filepath is not None:
         print("Loading", filepath)
         base.splash.set_text("Loading %s" % filepath)
-        data = io.open(filepath, encoding='latin-1').read()
-        items = config_parser.parse(data)
-        if items is not None:
-            instanciate(items, universe)
+        items = config_parser.load_file(filepath)
+        instanciate(items, universe)
     else:
         print("File not found", filename)
 
@@ -46,7 +46,6 @@ from ..dircontext import defaultDirContext
 
 from time import time
 import sys
-import io
 
 def get_color(value):
     if len(value) == 4:
@@ -442,10 +441,8 @@ def parse_file(filename, universe, context=defaultDirContext):
         start = time()
         print("Loading", filepath)
         base.splash.set_text("Loading %s" % filepath)
-        data = io.open(filepath, encoding='latin-1').read()
-        items = config_parser.parse(data)
-        if items is not None:
-            instanciate(items, universe)
+        items = config_parser.load_file(filepath)
+        instanciate(items, universe)
         end = time()
         print("Load time:", end - start)
     else:
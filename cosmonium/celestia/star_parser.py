@@ -23,6 +23,8 @@ from panda3d.core import LVector3d
 
 from ..universe import Universe
 from ..bodies import Star
+from ..starcatalog import StarCatalog
+from ..catalogs import NamesIndex
 from ..astro.spectraltype import spectralTypeStringDecoder, spectralTypeIntDecoder
 from ..astro.orbits import FixedPosition
 from ..astro.rotations import UnknownRotation
@@ -31,10 +33,13 @@ from ..astro.astro import app_to_abs_mag
 from ..astro import bayer
 from ..astro import units
 from ..dircontext import defaultDirContext
+from .. import cache
+from .. import settings
 
 from .bodies import celestiaStarSurfaceFactory
 
 from time import time
+import numpy
 import struct
 import sys
 import io
@@ -45,10 +50,10 @@ def parse_line(line, names, universe):
     if len(data) == 6:
         (catNo, ra, decl, distance, app_magnitude, spectral_type) = data
         catNo=int(catNo)
-        if catNo in names:
-            name = names[catNo]
-        else:
-            name = "HIP %d" % catNo
+        name = names.get_names(catNo)
+        if name is None:
+            name = []
+        name.append("HIP %d" % catNo)
         orbit = FixedPosition(right_asc=float(ra), declination=float(decl), distance=float(distance), distance_unit=units.Ly,
                               frame=j2000BarycentricEquatorialReferenceFrame)
         abs_magnitude = app_to_abs_mag(float(app_magnitude), float(distance) * units.KmPerLy)
@@ -82,6 +87,11 @@ def load_text(filename, names, universe, context=defaultDirContext):
         print("File not found", filename)
         return {}
 
+star_record_type = numpy.dtype([('catNo', '<i4'),
+                                ('x', '<f4'), ('y', '<f4'), ('z', '<f4'),
+                                ('abs_magnitude', '<i2'),
+                                ('spectral_type', '<i2')])
+
 def do_load_bin(filepath, names, universe):
     start = time()
     print("Loading", filepath)
@@ -96,24 +106,21 @@ def do_load_bin(filepath, names, universe):
         print("Invalid version", version)
         return
     print("Found", count, "stars")
-    fmt="<ifffhh"
-    size=struct.calcsize(fmt)
-    for i in range(count):
-        fields = data.read(size)
-        catNo, x, y, z, abs_magnitude, spectral_type = struct.unpack(fmt, fields)
-        if catNo in names:
-            name = names[catNo]
-        else:
-            name = "HIP %d" % catNo
-        position = LVector3d(x * units.Ly, -z * units.Ly, y * units.Ly)
-        orbit = FixedPosition(position=position, frame=j2000BarycentricEclipticReferenceFrame)
-        star = Star(name, source_names=[],
-                    surface_factory=celestiaStarSurfaceFactory,
-                    spectral_type=spectralTypeIntDecoder.decode(spectral_type),
-                    abs_magnitude=abs_magnitude / 256.0,
-                    orbit=orbit,
-                    rotation=UnknownRotation())
-        universe.add_child_star_fast(star)
+    records = numpy.fromfile(data, dtype=star_record_type, count=count)
+    if len(records) != count:
+        print("Truncated file, found only", len(records), "stars")
+    positions = numpy.empty((len(records), 3))
+    positions[:, 0] = records['x']
+    positions[:, 1] = -records['z']
+    positions[:, 2] = records['y']
+    positions *= units.Ly
+    catalog = StarCatalog(records['catNo'].copy(),
+                          positions,
+                          records['abs_magnitude'] / 256.0,
+                          records['spectral_type'].copy(),
+                          names,
+                          surface_factory=celestiaStarSurfaceFactory)
+    universe.add_star_catalog(catalog)
     end = time()
     print("Load time:", end - start)
 
@@ -129,18 +136,26 @@ def parse_line_name(line):
     data = re.split(':', line.rstrip('\r\n'))
     catNo = int(data[0])
     names = data[1:]
-    names.append("HIP %d" % catNo)
     return (catNo, names)
 
+#Must be increased when the names index changes to invalidate the cache
+names_version = 1
+
+def parse_names(text):
+    names = {}
+    for line in text.splitlines():
+        catNo, aliases = parse_line_name(line)
+        names[catNo] = list(map(lambda x: bayer.canonize_name(x), aliases))
+    return NamesIndex.from_dict(names)
+
 def do_load_names(filepath):
     start = time()
     print("Loading", filepath)
     base.splash.set_text("Loading %s" % filepath)
-    names = {}
-    data = io.open(filepath, encoding='latin-1')
-    for line in data.readlines():
-        catNo, aliases = parse_line_name(line)
-        names[catNo] = list(map(lambda x: bayer.canonize_name(x), aliases))
+    if settings.cache_celestia:
+        names = cache.parse_with_cache('starnames', names_version, filepath, parse_names, encoding='latin-1')
+    else:
+        names = parse_names(io.open(filepath, encoding='latin-1').read())
     end = time()
     print("Load time:", end - start)
     return names
@@ -151,7 +166,7 @@ def load_names(filename, context=defaultDirContext):
         return do_load_names(filepath)
     else:
         print("File not found", filename)
-        return {}
+        return NamesIndex.from_dict({})
 
 if __name__ == '__main__':
     if len(sys.argv) == 2:
@@ -39,7 +39,6 @@ from . import config_parser
 
 from time import time
 import sys
-import io
 
 def names_list(name):
     return name.split(':')
@@ -203,10 +202,8 @@ def parse_file(filename, universe, context=defaultDirContext):
         start = time()
         print("Loading", filepath)
         base.splash.set_text("Loading %s" % filepath)
-        data = io.open(filepath, encoding='latin-1').read()
-        items = config_parser.parse(data)
-        if items is not None:
-            instanciate(items, universe)
+        items = config_parser.load_file(filepath)
+        instanciate(items, universe)
         end = time()
         print("Load time:", end - start)
     else:
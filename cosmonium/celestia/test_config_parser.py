@@ -0,0 +1,59 @@
+#
+#This file is part of Cosmonium.
+#
+#Copyright (C) 2018-2019 Laurent Deru.
+#
+#Cosmonium is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+#
+#Cosmonium is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License
+#along with Cosmonium.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os
+import sys
+
+# Add third-party/ directory to import path to be able to load the external libraries
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), '..', '..', 'third-party'))
+
+from cosmonium.celestia.config_parser import parse
+
+def test_items():
+    items = parse('''
+"Moon" "Sol/Earth" { Radius 1737 Atmosphere { Height 10 } Color [ 1 0.5 0 ] }
+Modify Body "Earth" "Sol" { Mass 1 }
+''')
+    assert items == [['Add', 'Body', 'Moon', 'Sol/Earth', None, {'Radius': 1737, 'Atmosphere': {'Height': 10}, 'Color': [1, 0.5, 0]}],
+                     ['Modify', 'Body', 'Earth', 'Sol', None, {'Mass': 1}]]
+
+def test_recover_from_error_in_nested_block():
+    #The array in the nested hash is not closed, the whole definition must be skipped
+    items = parse('''
+"A" "Sol" { Radius 10 Atmosphere { Height 60 Lower [ 1 2 } Mass 5 }
+"B" "Sol" { Radius 20 Atmosphere { Height 30 } }
+''')
+    assert items == [['Add', 'Body', 'B', 'Sol', None, {'Radius': 20, 'Atmosphere': {'Height': 30}}]]
+
+def test_recover_from_error_in_deep_nested_block():
+    items = parse('''
+"A" "Sol" { Atmosphere { Clouds { Height "x" { } } } Mass 5 }
+"B" "Sol" { Radius 20 }
+''')
+    assert items == [['Add', 'Body', 'B', 'Sol', None, {'Radius': 20}]]
+
+def test_recover_from_error_in_header():
+    items = parse('''
+"A" "B" "C" { Radius 10 Atmosphere { Height 60 } }
+"D" "Sol" { Radius 20 }
+''')
+    assert items == [['Add', 'Body', 'D', 'Sol', None, {'Radius': 20}]]
@@ -41,6 +41,7 @@ from .stellarobject import StellarObject
 from .bodies import StellarBody, ReflectiveBody
 from .systems import StellarSystem, SimpleSystem
 from .universe import Universe
+from .starcatalog import StarCatalog
 from .annotations import Grid
 from .pointsset import PointsSet
 from .sprites import RoundDiskPointSprite, GaussianPointSprite, ExpPointSprite, MergeSprite
@@ -57,6 +58,7 @@ from .bodyclass import bodyClasses
 from .autopilot import AutoPilot
 from .camera import CameraHolder, CameraController, FixedCameraController, TrackCameraController, LookAroundCameraController, FollowCameraController
 from .timecal import Time
+from .benchmark import FrameBenchmark
 from .events import EventsDispatcher
 from .debug import Debug
 from .appstate import AppState
@@ -133,6 +135,7 @@ class CosmoniumBase(ShowBase):
         BaseObject.context = self
         YamlModuleParser.app = self
         BodyController.context = self
+        StarCatalog.context = self
 
         self.setBackgroundColor(0, 0, 0, 1)
         self.disableMouse()
@@ -150,6 +153,7 @@ class CosmoniumBase(ShowBase):
 
         workers.asyncTextureLoader = workers.AsyncTextureLoader(self)
         workers.syncTextureLoader = workers.SyncTextureLoader()
+        workers.asyncComputeLoader = workers.AsyncComputeLoader(self)
 
         # Front to back bin is added between opaque and transparent
         CullBinManager.get_global_ptr().add_bin("front_to_back", CullBinManager.BT_front_to_back, 25)
@@ -410,6 +414,7 @@ class Cosmonium(CosmoniumBase):
         self.body_controllers = []
         self.ships = []
         self.ship = None
+        self.benchmark = None
 
         if self.app_config.test_start:
             self.near_cam = None
@@ -520,7 +525,11 @@ class Cosmonium(CosmoniumBase):
         taskMgr.add(self.time_task, "time-task")
 
         self.start_universe()
-        if self.app_config.test_start:
+        if self.app_config.benchmark is not None:
+            self.benchmark = FrameBenchmark(self, self.app_config.benchmark, self.app_config.benchmark_urls,
+                                            self.app_config.benchmark_frames, self.app_config.benchmark_frame_rate)
+            self.benchmark.start()
+        elif self.app_config.test_start:
             #TODO: this is where the tests should be inserted
             print("Tests done.")
             self.userExit()
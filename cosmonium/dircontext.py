@@ -23,13 +23,71 @@ from __future__ import absolute_import
 from panda3d.core import ExecutionEnvironment
 
 import glob
+import fnmatch
 import os
-from copy import deepcopy
+import sys
+
+#Glob follows the case sensitivity of the filesystem
+case_insensitive = sys.platform in ('win32', 'darwin')
+
+class DirectoryIndex(object):
+    def __init__(self):
+        self.listings = {}
+        self.generation = 0
+
+    def invalidate(self, path=None):
+        if path is None:
+            self.listings = {}
+        else:
+            self.listings.pop(path, None)
+        self.generation += 1
+
+    def get_listing(self, path):
+        listing = self.listings.get(path)
+        if listing is None:
+            try:
+                entries = os.listdir(path)
+            except OSError:
+                entries = []
+            if case_insensitive:
+                listing = (entries, set(entry.lower() for entry in entries))
+            else:
+                listing = (entries, set(entries))
+            self.listings[path] = listing
+        return listing
+
+    def find(self, full_pattern):
+        (dirname, basename) = os.path.split(full_pattern)
+        if glob.has_magic(dirname):
+            files = glob.glob(full_pattern)
+            if len(files) > 0:
+                return files[0]
+            return None
+        if basename == '':
+            return full_pattern if os.path.isdir(dirname) else None
+        (entries, names) = self.get_listing(dirname)
+        if not glob.has_magic(basename):
+            key = basename.lower() if case_insensitive else basename
+            if key in names:
+                return full_pattern
+            return None
+        if not basename.startswith('.'):
+            #Like glob, hidden files are only matched explicitly
+            entries = [entry for entry in entries if not entry.startswith('.')]
+        files = fnmatch.filter(entries, basename)
+        if len(files) > 0:
+            return os.path.join(dirname, files[0])
+        return None
+
+directoryIndex = DirectoryIndex()
 
 class DirContext(object):
     def __init__(self, context=None):
         if context is not None:
-            self.category_paths = deepcopy(context.category_paths)
+            #The paths are shared with the parent context until one of them is modified
+            self.category_paths = context.category_paths
+            self.shared = True
+            context.shared = True
         else:
             self.category_paths={
                                 'textures': [],
@@ -42,38 +100,60 @@ class DirContext(object):
                                 'doc': [],
                                 'main': [],
                                 }
+            self.shared = False
+        self.resolved = {}
+        self.generation = directoryIndex.generation
+
+    def unshare(self):
+        if self.shared:
+            self.category_paths = {category: list(paths) for (category, paths) in self.category_paths.items()}
+            self.shared = False
+        self.resolved = {}
+
+    def invalidate(self):
+        self.resolved = {}
 
     def add_path(self, category, path):
+        self.unshare()
         if category not in self.category_paths:
             self.category_paths[category] = []
         self.category_paths[category].insert(0, path)
 
     def add_all_path(self, path):
+        self.unshare()
         for category in self.category_paths.keys():
             self.category_paths[category].insert(0, path)
 
     def add_all_path_auto(self, path):
+        self.unshare()
         for category in self.category_paths.keys():
             self.category_paths[category].insert(0, os.path.join(path, category))
 
     def remove_path(self, category, path):
         if category in self.category_paths and path in self.category_paths[category]:
+            self.unshare()
             self.category_paths[category].remove(path)
 
     def find_file(self, category, pattern):
         if pattern is None: return None
+        if self.generation != directoryIndex.generation:
+            self.resolved = {}
+            self.generation = directoryIndex.generation
+        key = (category, pattern)
+        if key in self.resolved:
+            return self.resolved[key]
+        result = None
         if os.path.isabs(pattern):
-            files = glob.glob(pattern)
-            if len(files) > 0:
-                return files[0]
+            result = directoryIndex.find(pattern)
         else:
             for res in self.category_paths[category]:
                 #print("Looking for", pattern, "in", res)
                 full_pattern =  os.path.join(res, pattern)
-                files = glob.glob(full_pattern)
-                if len(files) > 0:
-                    return files[0]
-        return None
+                result = directoryIndex.find(full_pattern)
+                if result is not None:
+                    break
+        self.resolved[key] = result
+        return result
 
     def find_texture(self, pattern):
         return self.find_file('textures', pattern)
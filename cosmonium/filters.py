@@ -21,51 +21,56 @@ from __future__ import print_function
 from __future__ import absolute_import
 from __future__ import division
 
-from panda3d.core import LColor, Texture
+from panda3d.core import Texture
 
 from .heightmapshaders import HeightmapDataSource
-from . import settings
 
-from math import floor
+import numpy
 
 class TexFilter(object):
     def __init__(self):
         pass
 
-    def get_single_value(self, peeker, x, y, clamp=True):
-        x /= peeker.get_x_size()
-        y /= peeker.get_y_size()
+    def get_single_values(self, data, x, y, clamp=True):
+        (height, width) = data.shape
         if clamp:
-            x = min(max(x, 0.0), 1.0)
-            y = min(max(y, 0.0), 1.0)
-        value = LColor()
-        peeker.lookup(value, x, y)
-        if settings.encode_float:
-            value = value[0] + value[1] / 255.0 + value[2] / 65025.0 + value[3] / 16581375.0
-        else:
-            value = value[0]
-        return value
-
-    def get_bilinear_value(self, peeker, x, y, clamp=True):
-        x /= peeker.get_x_size()
-        y /= peeker.get_y_size()
+            x = numpy.clip(x, 0.0, width)
+            y = numpy.clip(y, 0.0, height)
+        i_x = numpy.clip(numpy.floor(x).astype(numpy.int32), 0, width - 1)
+        i_y = numpy.clip(numpy.floor(y).astype(numpy.int32), 0, height - 1)
+        return data[i_y, i_x]
+
+    def get_bilinear_values(self, data, x, y, clamp=True):
+        (height, width) = data.shape
         if clamp:
-            x = min(max(x, 0.0), 1.0)
-            y = min(max(y, 0.0), 1.0)
-        value = LColor()
-        result = peeker.lookup_bilinear(value, x, y)
-        if not result:
-            print("Invalid offsets", x, y)
-            return 0.0
-        if settings.encode_float:
-            value = value[0] + value[1] / 255.0 + value[2] / 65025.0 + value[3] / 16581375.0
-        else:
-            value = value[0]
-        return value
-
-    def get_value(self, peeker, x, y):
+            x = numpy.clip(x, 0.0, width)
+            y = numpy.clip(y, 0.0, height)
+        #The texels values are at their center
+        x = x - 0.5
+        y = y - 0.5
+        x0 = numpy.floor(x)
+        y0 = numpy.floor(y)
+        f_x = x - x0
+        f_y = y - y0
+        x0 = x0.astype(numpy.int32)
+        y0 = y0.astype(numpy.int32)
+        x1 = numpy.clip(x0 + 1, 0, width - 1)
+        y1 = numpy.clip(y0 + 1, 0, height - 1)
+        x0 = numpy.clip(x0, 0, width - 1)
+        y0 = numpy.clip(y0, 0, height - 1)
+        a = data[y0, x0] * (1.0 - f_x) + data[y0, x1] * f_x
+        b = data[y1, x0] * (1.0 - f_x) + data[y1, x1] * f_x
+        return a * (1.0 - f_y) + b * f_y
+
+    def get_values(self, data, x, y):
         return None
 
+    def get_value(self, data, x, y):
+        values = self.get_values(data, numpy.array([x], dtype=numpy.float64), numpy.array([y], dtype=numpy.float64))
+        if values is None:
+            return None
+        return float(values[0])
+
     def configure_texture(self, texture):
         pass
 
@@ -73,8 +78,8 @@ class TexFilter(object):
         return None
 
 class NearestFilter(TexFilter):
-    def get_value(self, peeker, x, y):
-        return self.get_single_value(peeker, x, y)
+    def get_values(self, data, x, y):
+        return self.get_single_values(data, x, y)
 
     def configure_texture(self, texture):
         texture.setMinfilter(Texture.FT_nearest)
@@ -84,8 +89,8 @@ class NearestFilter(TexFilter):
         return HeightmapDataSource.F_nearest
 
 class BilinearFilter(TexFilter):
-    def get_value(self, peeker, x, y):
-        return self.get_bilinear_value(peeker, x, y)
+    def get_values(self, data, x, y):
+        return self.get_bilinear_values(data, x, y)
 
     def configure_texture(self, texture):
         texture.setMinfilter(Texture.FT_linear)
@@ -95,19 +100,19 @@ class BilinearFilter(TexFilter):
         return HeightmapDataSource.F_bilinear
 
 class SmoothstepFilter(TexFilter):
-    def get_value(self, peeker, x, y):
-        x += 0.5
-        y += 0.5
+    def get_values(self, data, x, y):
+        x = x + 0.5
+        y = y + 0.5
 
-        i_x = floor(x)
-        i_y = floor(y)
+        i_x = numpy.floor(x)
+        i_y = numpy.floor(y)
         f_x = x - i_x
         f_y = y - i_y
 
         f_x = f_x*f_x*(3.0-2.0*f_x)
         f_y = f_y*f_y*(3.0-2.0*f_y)
 
-        return self.get_bilinear_value(peeker, i_x + f_x - 0.5, i_y + f_y - 0.5)
+        return self.get_bilinear_values(data, i_x + f_x - 0.5, i_y + f_y - 0.5)
 
     def configure_texture(self, texture):
         texture.setMinfilter(Texture.FT_linear)
@@ -117,19 +122,19 @@ class SmoothstepFilter(TexFilter):
         return HeightmapDataSource.F_smoothstep
 
 class QuinticFilter(TexFilter):
-    def get_value(self, peeker, x, y):
-        x += 0.5
-        y += 0.5
+    def get_values(self, data, x, y):
+        x = x + 0.5
+        y = y + 0.5
 
-        i_x = floor(x)
-        i_y = floor(y)
+        i_x = numpy.floor(x)
+        i_y = numpy.floor(y)
         f_x = x - i_x
         f_y = y - i_y
 
         f_x = f_x*f_x*f_x*(f_x*(f_x*6.0-15.0)+10.0)
         f_y = f_y*f_y*f_y*(f_y*(f_y*6.0-15.0)+10.0)
 
-        return self.get_bilinear_value(peeker, i_x + f_x - 0.5, i_y + f_y - 0.5)
+        return self.get_bilinear_values(data, i_x + f_x - 0.5, i_y + f_y - 0.5)
 
     def configure_texture(self, texture):
         texture.setMinfilter(Texture.FT_linear)
@@ -155,9 +160,9 @@ class BSplineFilter(TexFilter):
         w3 = 1./6. * alpha3
         return (w0, w1, w2, w3)
 
-    def get_value(self, peeker, x, y):
-        tc_x = floor(x - 0.5) + 0.5
-        tc_y = floor(y - 0.5) + 0.5
+    def get_values(self, data, x, y):
+        tc_x = numpy.floor(x - 0.5) + 0.5
+        tc_y = numpy.floor(y - 0.5) + 0.5
 
         alpha_x = x - tc_x
         alpha_y = y - tc_y
@@ -176,10 +181,10 @@ class BSplineFilter(TexFilter):
         sx = s_x / (s_x + s_y)
         sy = s_z / (s_z + s_w)
 
-        p00 = self.get_bilinear_value(peeker, offset_x, offset_z)
-        p01 = self.get_bilinear_value(peeker, offset_y, offset_z)
-        p10 = self.get_bilinear_value(peeker, offset_x, offset_w)
-        p11 = self.get_bilinear_value(peeker, offset_y, offset_w)
+        p00 = self.get_bilinear_values(data, offset_x, offset_z)
+        p01 = self.get_bilinear_values(data, offset_y, offset_z)
+        p10 = self.get_bilinear_values(data, offset_x, offset_w)
+        p11 = self.get_bilinear_values(data, offset_y, offset_w)
 
         def mix(x, y, a):
             return x * (1.0 - a) + y * a
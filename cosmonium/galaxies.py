@@ -20,17 +20,18 @@
 from __future__ import print_function
 from __future__ import absolute_import
 
-from panda3d.core import TextureStage, Texture, TexGenAttrib, GeomVertexRewriter
-from panda3d.core import GeomVertexArrayFormat, InternalName, GeomVertexFormat, GeomVertexData, GeomVertexWriter, OmniBoundingVolume
+from panda3d.core import TextureStage, Texture, TexGenAttrib
+from panda3d.core import GeomVertexArrayFormat, InternalName, GeomVertexFormat, GeomVertexData, OmniBoundingVolume
 from panda3d.core import GeomPoints, Geom, GeomNode
-from panda3d.core import LVecBase3, LPoint3d, LPoint3, LColor, LVector3d
-from panda3d.core import NodePath, StackedPerlinNoise3
+from panda3d.core import LVecBase3, LColor, LVector3d
+from panda3d.core import NodePath
 
 from .appearances import AppearanceBase
 from .shapes import Shape
 from .surfaces import EllipsoidFlatSurface
 from .sprites import ExpPointSprite
 from .textures import TransparentTexture, DirectTextureSource
+from .procedural.cpunoise import stegu_snoise
 from .shaders import PointControl
 from .utils import TransparencyBlend
 from .parameters import AutoUserParameter, UserParameter
@@ -41,9 +42,11 @@ from .utils import mag_to_scale_nolimit
 from .astro import units
 from . import settings
 
-from math import cos, sin, pi, log, tan, tanh, sqrt, exp, atan, atanh
-from random import random, gauss, choice, seed
+from collections import OrderedDict
+from math import pi, tan, sqrt
+from random import randrange
 from cosmonium.utils import srgb_to_linear
+import numpy
 
 class Galaxy(DeepSpaceObject):
     has_rotation_axis = False
@@ -127,12 +130,41 @@ class GalaxyAppearance(AppearanceBase):
                 AutoUserParameter("Color scale", "color_scale", self, UserParameter.TYPE_FLOAT, [0, 255]),
                 ]
 
+class GalaxyTemplateCache(object):
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self.templates = OrderedDict()
+
+    def get(self, template_id):
+        entry = self.templates.get(template_id)
+        if entry is None:
+            return None
+        self.templates.move_to_end(template_id)
+        return entry[0]
+
+    def add(self, template_id, template, size):
+        self.templates[template_id] = (template, size)
+        self.size += size
+        #The galaxies already using an evicted template keep their geometry, it is only no longer shared
+        while self.size > self.max_size and len(self.templates) > 1:
+            (key, (template, size)) = self.templates.popitem(last=False)
+            self.size -= size
+
+    def clear(self):
+        self.templates.clear()
+        self.size = 0
+
+galaxyTemplates = GalaxyTemplateCache(settings.galaxy_template_cache_size)
+
 class GalaxyShapeBase(Shape):
-    templates = {}
+    template_params = ()
+    vertex_type = numpy.dtype([('vertex', numpy.float32, 3), ('color', numpy.float32, 4), ('size', numpy.float32)])
+
     def __init__(self, radius=1.0, scale=None):
         Shape.__init__(self)
         self.radius = radius
-        self.seed = random()
+        self.seed = randrange(1 << 32)
         if scale is None:
             self.radius = radius
             self.scale = LVecBase3(self.radius, self.radius, self.radius)
@@ -147,6 +179,16 @@ class GalaxyShapeBase(Shape):
     def shape_id(self):
         return ''
 
+    def template_id(self):
+        #Galaxies with the same morphology and generation parameters share their geometry
+        params = []
+        for name in self.template_params:
+            value = getattr(self, name)
+            if hasattr(value, '__len__'):
+                value = tuple(value)
+            params.append(value)
+        return (self.shape_id(), tuple(params))
+
     def get_apparent_radius(self):
         return self.radius
 
@@ -156,37 +198,44 @@ class GalaxyShapeBase(Shape):
     def is_flat(self):
         return False
 
-    def create_points(self, radius=1.0):
+    def color_array(self, color):
+        array = numpy.ones(4, dtype=numpy.float32)
+        color = tuple(color)
+        array[:len(color)] = color
+        return array
+
+    def create_points(self, rng, radius=1.0):
         return None
 
+    def create_geom_node(self):
+        rng = numpy.random.default_rng(self.seed)
+        gnode = GeomNode('galaxy')
+        gnode.addGeom(self.makeGeom(*self.create_points(rng)))
+        return gnode
+
     def apply(self):
         self.instance.node().setBounds(OmniBoundingVolume())
         self.instance.node().setFinal(True)
 
     async def create_instance(self):
-        shape_id = self.shape_id()
-        if shape_id in GalaxyShapeBase.templates:
-            template =  GalaxyShapeBase.templates[shape_id]
-        else:
-            seed(self.seed)
-            self.gnode = GeomNode('galaxy')
-            self.geom = self.makeGeom(*self.create_points())
-            self.gnode.addGeom(self.geom)
-            template = NodePath(self.gnode)
-            # Disable caching
-            #GalaxyShapeBase.templates[shape_id] = template
+        template_id = self.template_id()
+        template = galaxyTemplates.get(template_id)
+        if template is None:
+            gnode = self.create_geom_node()
+            template = (NodePath(gnode), self.size)
+            galaxyTemplates.add(template_id, template, gnode.get_geom(0).get_vertex_data().get_array(0).get_data_size_bytes())
+        (template_node, self.size) = template
         self.instance = NodePath('galaxy')
-        template.instanceTo(self.instance)
+        template_node.instanceTo(self.instance)
         self.apply()
-        self.update_geom(*self.create_points())
         return self.instance
 
     def update_shape(self):
-        seed(self.seed)
-        self.update_geom(*self.create_points())
+        #The geometry could be shared with other galaxies, it is replaced instead of modified
+        self.instance.node().remove_all_children()
+        self.instance.attach_new_node(self.create_geom_node())
 
     def makeGeom(self, points, colors, sizes):
-        #format = GeomVertexFormat.getV3c4()
         array = GeomVertexArrayFormat()
         array.addColumn(InternalName.get_vertex(), 3, Geom.NTFloat32, Geom.CPoint)
         array.addColumn(InternalName.get_color(), 4, Geom.NTFloat32, Geom.CColor)
@@ -196,36 +245,19 @@ class GalaxyShapeBase(Shape):
         format = GeomVertexFormat.registerFormat(format)
         vdata = GeomVertexData('vdata', format, Geom.UH_static)
         vdata.unclean_set_num_rows(len(points))
-        self.vwriter = GeomVertexWriter(vdata, InternalName.get_vertex())
-        self.colorwriter = GeomVertexWriter(vdata, InternalName.get_color())
-        self.sizewriter = GeomVertexWriter(vdata, InternalName.get_size())
+        vertices = numpy.frombuffer(memoryview(vdata.modify_array(0)).cast('B'), self.vertex_type)
+        vertices['vertex'] = points
+        vertices['color'] = colors
+        vertices['size'] = sizes
         geompoints = GeomPoints(Geom.UH_static)
-        geompoints.reserve_num_vertices(len(points))
-        index = 0
-        for (point, color, size) in zip(points, colors, sizes):
-            self.vwriter.addData3f(*point)
-            self.colorwriter.addData4f(*color)
-            self.sizewriter.addData1f(size)
-            geompoints.addVertex(index)
-            #geompoints.closePrimitive()
-            index += 1
+        geompoints.add_consecutive_vertices(0, len(points))
         geom = Geom(vdata)
         geom.addPrimitive(geompoints)
         return geom
 
-    def update_geom(self, points, colors, sizes):
-        geom = self.instance.children[0].node().modify_geom(0)
-        vdata = geom.modify_vertex_data()
-        vdata.unclean_set_num_rows(len(points))
-        vwriter = GeomVertexRewriter(vdata, InternalName.get_vertex())
-        colorwriter = GeomVertexWriter(vdata, InternalName.get_color())
-        sizewriter = GeomVertexWriter(vdata, InternalName.get_size())
-        for (point, color, size) in zip(points, colors, sizes):
-            vwriter.addData3f(*point)
-            colorwriter.addData4f(*color)
-            sizewriter.addData1f(size)
-
 class EllipticalGalaxyShape(GalaxyShapeBase):
+    template_params = ('nb_points', 'spread', 'zspread', 'sprite_size', 'sersic', 'color')
+
     def __init__(self, factor, radius=1.0, scale=None, nb_points=4000, spread=0.4, zspread=0.2, sprite_size=400, sersic=4.0):
         GalaxyShapeBase.__init__(self, radius, scale)
         self.factor = factor
@@ -239,27 +271,13 @@ class EllipticalGalaxyShape(GalaxyShapeBase):
     def shape_id(self):
         return 'elliptical-%g' % self.factor
 
-    def create_points(self, radius=1.0):
-        points = []
-        colors = []
-        sizes = []
+    def create_points(self, rng, radius=1.0):
         nb_points = self.nb_points
-        sprite_size = self.sprite_size
-        half_sprite_size = self.sprite_size / 2.0
-        color = self.color
-        spread = self.spread
-        spreadf = self.spread * self.factor
-        zspreadf = self.zspread * self.factor
-        sersic_inv = 1. / self.sersic
-        for i in range(nb_points):
-            x = gauss(0.0, spread)
-            y = gauss(0.0, spreadf)
-            z = gauss(0.0, zspreadf)
-            point = LPoint3d(x * radius, y * radius, z * radius)
-            points.append(point)
-            colors.append(color * (0.9 - pow(point.length(), sersic_inv)))
-            size = sprite_size + gauss(0, half_sprite_size)
-            sizes.append(size)
+        spread = (self.spread, self.spread * self.factor, self.zspread * self.factor)
+        points = rng.normal(0.0, spread, (nb_points, 3)) * radius
+        distances = numpy.linalg.norm(points, axis=1)
+        colors = numpy.outer(0.9 - distances ** (1. / self.sersic), self.color_array(self.color))
+        sizes = self.sprite_size + rng.normal(0, self.sprite_size / 2.0, nb_points)
         return (points, colors, sizes)
 
     def get_user_parameters(self):
@@ -272,7 +290,9 @@ class EllipticalGalaxyShape(GalaxyShapeBase):
                 ]
 
 class IrregularGalaxyShape(GalaxyShapeBase):
-    noise = None
+    template_params = ('nb_points', 'spread', 'zspread', 'sprite_size', 'sersic', 'color1', 'color2')
+    noise_octaves = 8
+
     def __init__(self, radius=1.0, scale=None, nb_points=4000, spread=0.4, zspread=0.2, sprite_size=400, sersic=4.0):
         GalaxyShapeBase.__init__(self, radius, scale)
         self.nb_points = nb_points
@@ -286,32 +306,28 @@ class IrregularGalaxyShape(GalaxyShapeBase):
     def shape_id(self):
         return 'irregular'
 
-    def create_points(self, radius=1.0):
-        if IrregularGalaxyShape.noise is None:
-            IrregularGalaxyShape.noise = StackedPerlinNoise3(1, 1, 1, 8, 4, 0.7)
-        points = []
-        colors = []
-        sizes = []
+    def noise(self, points):
+        #Stacked simplex noise, only its sign is used to reject the points
+        points = points.T.astype(numpy.float32)
+        value = numpy.zeros(points.shape[1], dtype=numpy.float32)
+        for i in range(self.noise_octaves):
+            value += stegu_snoise(points * 4 ** i) * 0.7 ** i
+        return value
+
+    def create_points(self, rng, radius=1.0):
         nb_points = self.nb_points
-        sprite_size = self.sprite_size
-        colors_list = [self.color1, self.color2]
-        spread = self.spread
-        zspread = self.zspread
-        sersic_inv = 1. / self.sersic
-        count = 0
-        while count < nb_points:
-            p = LPoint3(gauss(0.0, spread), gauss(0.0, spread), gauss(0.0, zspread))
-            value = self.noise(p) * 0.5 + 0.5
-            if value < 0.5:
-                points.append(p * radius)
-                color = choice(colors_list)
-                color = color * (1 - 0.9 * pow(p.length(), sersic_inv))
-                color[3] = 1.0
-                colors.append(color)
-                size = sprite_size + gauss(0, sprite_size)
-                sizes.append(size)
-                count += 1
-        return (points, colors, sizes)
+        spread = (self.spread, self.spread, self.zspread)
+        points = numpy.empty((0, 3))
+        while len(points) < nb_points:
+            candidates = rng.normal(0.0, spread, (nb_points * 2, 3))
+            points = numpy.concatenate((points, candidates[self.noise(candidates) < 0]))
+        points = points[:nb_points]
+        colors_list = numpy.array((self.color_array(self.color1), self.color_array(self.color2)))
+        distances = numpy.linalg.norm(points, axis=1)
+        colors = colors_list[rng.integers(0, 2, nb_points)] * (1 - 0.9 * distances ** (1. / self.sersic))[:, numpy.newaxis]
+        colors[:, 3] = 1.0
+        sizes = self.sprite_size + rng.normal(0, self.sprite_size, nb_points)
+        return (points * radius, colors, sizes)
 
     def get_user_parameters(self):
         return [
@@ -324,6 +340,9 @@ class IrregularGalaxyShape(GalaxyShapeBase):
                 ]
 
 class SpiralGalaxyShapeBase(GalaxyShapeBase):
+    template_params = ('nb_points_bulge', 'nb_points_arms', 'spread', 'zspread', 'sprite_size', 'max_angle',
+                       'sersic_bulge', 'sersic_disk', 'bulge_color', 'arms_color', 'arm_spread')
+
     def __init__(self, radius=1.0, scale=None, nb_points_bulge=200, nb_points_arms=1000, spread=0.4, zspread=0.01, sprite_size=400, max_angle=2 * pi, sersic_bulge=4.0, sersic_disk=1.0):
         GalaxyShapeBase.__init__(self, radius, scale)
         self.nb_points_bulge = nb_points_bulge
@@ -336,97 +355,74 @@ class SpiralGalaxyShapeBase(GalaxyShapeBase):
         self.sersic_disk = sersic_disk
         self.bulge_color = self.yellow_color
         self.arms_color = self.blue_color
+        self.arm_spread = 5
 
     def is_flat(self):
         return True
 
-    def create_bulge(self, count, radius, spread, zspread, points, colors, sizes):
-        sprite_size = self.sprite_size
-        bulge_color = self.bulge_color
-        sersic_inv = 1. / self.sersic_bulge
-        for i in range(count):
-            x = gauss(0.0, spread)
-            y = gauss(0.0, spread)
-            z = gauss(0.0, zspread)
-            point = LPoint3d(x * radius, y * radius, z * radius)
-            points.append(point)
-            color = bulge_color * (1 - pow(point.length(), sersic_inv)) * 2
-            color[3] = 1.0
-            colors.append(color)
-            size = sprite_size + gauss(0, sprite_size)
-            sizes.append(size)
-
-    def create_spiral(self, count,radius, spread, zspread, points, colors, sizes):
-        func = self.shape_func
-        sprite_size = self.sprite_size
-        arm_color = self.arms_color
-        sersic_inv = 1. / self.sersic_disk
-        distance = 0
-        for i in (-1.0, 1.0):
-            for c in range(count):
-                t = sqrt(random())
-                angle = t * self.max_angle
-                shape = func(angle)
-                x = i * cos(angle) * shape + gauss(0.0, spread)
-                y = i * sin(angle) * shape + gauss(0.0, spread)
-                z = gauss(0.0, zspread)
-                point = LPoint3d(x * radius, y * radius, z * radius)
-                points.append(point)
-                distance = max(distance, point.length())
-                color = arm_color * (1 - 0.9 * pow(distance, sersic_inv))
-                color[3] = 1.0
-                colors.append(color)
-                size = sprite_size + gauss(0, sprite_size)
-                sizes.append(size)
-        self.size = distance
-
-    def create_spiral_distance(self, count, radius, spread, zspread, points, colors, sizes):
-        sprite_size = self.sprite_size
-        arm_color = self.arms_color
-        disk_color = self.bulge_color
+    def create_bulge(self, rng, count, radius, spread, zspread):
+        #The bulge size given by the shape function can be negative
+        points = rng.normal(0.0, numpy.abs((spread, spread, zspread)), (count, 3)) * radius
+        distances = numpy.linalg.norm(points, axis=1)
+        colors = numpy.outer((1 - distances ** (1. / self.sersic_bulge)) * 2, self.color_array(self.bulge_color))
+        colors[:, 3] = 1.0
+        sizes = self.sprite_size + rng.normal(0, self.sprite_size, count)
+        return (points, colors, sizes)
+
+    def create_spiral(self, rng, count, radius, spread, zspread):
+        angles = numpy.sqrt(rng.random(count * 2)) * self.max_angle
+        shapes = self.shape_func(angles)
+        #The first half of the points is on the first arm, the second half on the opposite one
+        sides = numpy.repeat((-1.0, 1.0), count)
+        points = numpy.empty((count * 2, 3))
+        points[:, 0] = sides * numpy.cos(angles) * shapes + rng.normal(0.0, spread, count * 2)
+        points[:, 1] = sides * numpy.sin(angles) * shapes + rng.normal(0.0, spread, count * 2)
+        points[:, 2] = rng.normal(0.0, zspread, count * 2)
+        points *= radius
+        distances = numpy.maximum.accumulate(numpy.linalg.norm(points, axis=1))
+        colors = numpy.outer(1 - 0.9 * distances ** (1. / self.sersic_disk), self.color_array(self.arms_color))
+        colors[:, 3] = 1.0
+        sizes = self.sprite_size + rng.normal(0, self.sprite_size, count * 2)
+        self.size = distances[-1]
+        return (points, colors, sizes)
+
+    def create_spiral_distance(self, rng, count, radius, spread, zspread):
         bulge_size = self.bulge_size()
-        sersic_inv = 1. / self.sersic_disk
-        distance = 0
-        for c in range(count * 2):
-            r = sqrt(random() + bulge_size*bulge_size)
-            theta = random() * 2 * pi
-            x = r * cos(theta)
-            y = r * sin(theta)
-            z = gauss(0.0, zspread)
-            coef = 0.0
-            for c in (0, 1.):
-                arm_angle = self.inv_shape_func(r) * max(self.max_angle, 0.001) / (2 * pi)
-                mtheta = c * pi + theta
-                delta = abs(mtheta - arm_angle)
-                for i in range(int(self.max_angle / (2 * pi)) + 1):
-                    delta = min(delta, abs(mtheta - arm_angle - (i + 1) * 2 * pi), abs(mtheta - arm_angle + (i  + 1) * 2 * pi))
-                coef = max(pow(max(1 - delta / pi, 0.0), self.arm_spread), coef)
-            point = LPoint3d(x * radius, y * radius, z * radius)
-            points.append(point)
-            distance = max(distance, point.length())
-            color = disk_color * (1 - coef) + arm_color * coef
-            color = color * (1 - 0.9 * pow(r, sersic_inv))
-            color[3] = 1.0
-            colors.append(color)
-            size = sprite_size + gauss(0, sprite_size)
-            sizes.append(size)
-        self.size = distance
-
-    def create_points(self, radius=1.0):
-        points = []
-        colors = []
-        sizes = []
+        r = numpy.sqrt(rng.random(count * 2) + bulge_size * bulge_size)
+        theta = rng.random(count * 2) * 2 * pi
+        points = numpy.empty((count * 2, 3))
+        points[:, 0] = r * numpy.cos(theta)
+        points[:, 1] = r * numpy.sin(theta)
+        points[:, 2] = rng.normal(0.0, zspread, count * 2)
+        arm_angle = self.inv_shape_func(r) * max(self.max_angle, 0.001) / (2 * pi)
+        coef = numpy.zeros(count * 2)
+        for c in (0, 1.):
+            mtheta = c * pi + theta
+            delta = abs(mtheta - arm_angle)
+            for i in range(int(self.max_angle / (2 * pi)) + 1):
+                delta = numpy.minimum(delta, abs(mtheta - arm_angle - (i + 1) * 2 * pi))
+                delta = numpy.minimum(delta, abs(mtheta - arm_angle + (i + 1) * 2 * pi))
+            coef = numpy.maximum(numpy.maximum(1 - delta / pi, 0.0) ** self.arm_spread, coef)
+        points *= radius
+        colors = numpy.outer(1 - coef, self.color_array(self.bulge_color)) + numpy.outer(coef, self.color_array(self.arms_color))
+        colors *= (1 - 0.9 * r ** (1. / self.sersic_disk))[:, numpy.newaxis]
+        colors[:, 3] = 1.0
+        sizes = self.sprite_size + rng.normal(0, self.sprite_size, count * 2)
+        self.size = numpy.linalg.norm(points, axis=1).max()
+        return (points, colors, sizes)
+
+    def create_points(self, rng, radius=1.0):
         nb_points_bulge = self.nb_points_bulge
         nb_points_arms = self.nb_points_arms
         spread = self.bulge_size() / 2
         zspread = spread / 2.0
-        self.create_bulge(nb_points_bulge, radius, spread, zspread, points, colors, sizes)
+        bulge = self.create_bulge(rng, nb_points_bulge, radius, spread, zspread)
         if True:
-            self.create_spiral_distance(nb_points_arms, radius, self.spread, self.zspread, points, colors, sizes)
+            arms = self.create_spiral_distance(rng, nb_points_arms, radius, self.spread, self.zspread)
         else:
-            self.create_spiral(nb_points_arms, radius, self.spread, self.zspread, points, colors, sizes)
+            arms = self.create_spiral(rng, nb_points_arms, radius, self.spread, self.zspread)
         self.nb_points = nb_points_bulge + nb_points_arms
-        return (points, colors, sizes)
+        return [numpy.concatenate(values) for values in zip(bulge, arms)]
 
     def get_user_parameters(self):
         return [
@@ -452,10 +448,10 @@ class FullSpiralGalaxyShape(SpiralGalaxyShapeBase):
         return 2 * self.shape_func(0)
 
     def shape_func(self, angle):
-        return 1.0 / log(self.B * max(0.00001, tan(angle / (2 * self.N))))
+        return 1.0 / numpy.log(self.B * numpy.maximum(0.00001, numpy.tan(angle / (2 * self.N))))
 
     def inv_shape_func(self, distance):
-        return atan(exp(1.0 / distance) / self.B) * 2 * self.N
+        return numpy.arctan(numpy.exp(1.0 / distance) / self.B) * 2 * self.N
 
     def get_user_parameters(self):
         params = SpiralGalaxyShapeBase.get_user_parameters(self)
@@ -465,6 +461,8 @@ class FullSpiralGalaxyShape(SpiralGalaxyShapeBase):
         return params
 
 class FullRingGalaxyShape(SpiralGalaxyShapeBase):
+    max_ratio = 1.0 - 1e-6
+
     def __init__(self, N, B, radius=1.0, scale=None, nb_points_bulge=200, nb_points_arms=1000, spread=0.4, zspread=0.2, point_size=400, max_angle=2 * pi, sersic_bulge=4.0, sersic_disk=1.0):
         SpiralGalaxyShapeBase.__init__(self, radius, scale, nb_points_bulge, nb_points_arms, spread, zspread, point_size, max_angle, sersic_bulge, sersic_disk)
         self.N = N
@@ -477,10 +475,13 @@ class FullRingGalaxyShape(SpiralGalaxyShapeBase):
         return 2 * self.shape_func(0)
 
     def shape_func(self, angle):
-        return 1.0 / log(self.B * max(0.00001, tanh(angle / (2 * self.N))))
+        return 1.0 / numpy.log(self.B * numpy.maximum(0.00001, numpy.tanh(angle / (2 * self.N))))
 
     def inv_shape_func(self, distance):
-        return atanh(exp(1.0 / distance) / self.B) * 2 * self.N
+        #Inside the limit radius of the ring, the argument of arctanh is not below 1 and the arms are never
+        #reached, it is clamped to put the arms at their furthest angle instead of returning NaN
+        ratio = numpy.clip(numpy.exp(1.0 / distance) / self.B, -self.max_ratio, self.max_ratio)
+        return numpy.arctanh(ratio) * 2 * self.N
 
     def get_user_parameters(self):
         params = SpiralGalaxyShapeBase.get_user_parameters(self)
@@ -494,7 +495,6 @@ class SpiralGalaxyShape(SpiralGalaxyShapeBase):
     def __init__(self, pitch, radius=1.0, scale=None, nb_points_bulge=200, nb_points_arms=1000, spread=0.4, zspread=0.2, point_size=400, max_angle=2 * pi, sersic_bulge=4.0, sersic_disk=1.0):
         SpiralGalaxyShapeBase.__init__(self, radius, scale, nb_points_bulge, nb_points_arms, spread, zspread, point_size, max_angle, sersic_bulge, sersic_disk)
         self.pitch = pitch
-        self.arm_spread = 5
 
     def set_pitch(self, pitch):
         self.pitch = pitch / 180 * pi
@@ -516,11 +516,11 @@ class SpiralGalaxyShape(SpiralGalaxyShapeBase):
 
     def shape_func(self, angle):
         pitch = self.pitch
-        return self.bar_radius / (1 - pitch * tan(pitch) * log(max(0.00001, (angle / pitch))))
+        return self.bar_radius / (1 - pitch * tan(pitch) * numpy.log(numpy.maximum(0.00001, (angle / pitch))))
 
     def inv_shape_func(self, distance):
         pitch = self.pitch
-        return pitch * exp((1 - self.bar_radius / distance) / (pitch * tan(pitch)))
+        return pitch * numpy.exp((1 - self.bar_radius / distance) / (pitch * tan(pitch)))
 
     def get_user_parameters(self):
         params = SpiralGalaxyShapeBase.get_user_parameters(self)
@@ -539,23 +539,23 @@ class LenticularGalaxyShape(SpiralGalaxyShapeBase):
     def bulge_size(self):
         return self.bulge_radius
 
-    def create_spiral(self, count, radius, spread, zspread, points, colors, sizes):
-        sprite_size = self.sprite_size
-        disk_color = self.yellow_color
-        sersic_inv = 1. / self.sersic_disk
-        for r in range(count * 2):
-            distance = self.bulge_radius + abs(gauss(0, (1 - self.bulge_radius)))
-            angle = random() * 2.0 * pi
-            x = distance * cos(angle) + gauss(0.0, spread)
-            y = distance * sin(angle) + gauss(0.0, spread)
-            z = gauss(0.0, zspread)
-            point = LPoint3d(x * radius, y * radius, z * radius)
-            points.append(point)
-            color = disk_color * (1 - 0.9 * pow(point, sersic_inv))
-            color[3] = 1.0
-            colors.append(color)
-            size = sprite_size + gauss(0, sprite_size)
-            sizes.append(size)
+    def create_spiral(self, rng, count, radius, spread, zspread):
+        distances = self.bulge_radius + abs(rng.normal(0, (1 - self.bulge_radius), count * 2))
+        angles = rng.random(count * 2) * 2.0 * pi
+        points = numpy.empty((count * 2, 3))
+        points[:, 0] = distances * numpy.cos(angles) + rng.normal(0.0, spread, count * 2)
+        points[:, 1] = distances * numpy.sin(angles) + rng.normal(0.0, spread, count * 2)
+        points[:, 2] = rng.normal(0.0, zspread, count * 2)
+        points *= radius
+        distances = numpy.linalg.norm(points, axis=1)
+        colors = numpy.outer(1 - 0.9 * distances ** (1. / self.sersic_disk), self.color_array(self.yellow_color))
+        colors[:, 3] = 1.0
+        sizes = self.sprite_size + rng.normal(0, self.sprite_size, count * 2)
+        return (points, colors, sizes)
+
+    def create_spiral_distance(self, rng, count, radius, spread, zspread):
+        #There are no arms on a lenticular galaxy
+        return self.create_spiral(rng, count, radius, spread, zspread)
 
 class GalaxyPointControl(PointControl):
     use_vertex = True
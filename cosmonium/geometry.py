@@ -22,7 +22,7 @@ from __future__ import division
 from __future__ import print_function
 
 from panda3d.core import Geom, GeomNode, GeomPatches, GeomPoints, GeomVertexData, GeomVertexArrayFormat, InternalName,\
-    LVector3d, GlobPattern, BoundingBox, LPoint3, BoundingSphere
+    LVector3d, GlobPattern, BoundingBox, LPoint3, BoundingSphere, OmniBoundingVolume
 from panda3d.core import GeomVertexFormat, GeomTriangles, GeomVertexWriter, ColorAttrib
 from panda3d.core import NodePath, VBase3, Vec3, LPoint3d, LPoint2d, BitMask32, LVector3, LVector4i
 from panda3d.egg import EggData, EggVertexPool, EggVertex, EggPolygon, loadEggData
@@ -31,6 +31,7 @@ from .pstats import named_pstat
 from . import settings
 
 from math import sin, cos, pi, atan2, sqrt, asin
+import numpy
 
 def empty_node(prefix, color=False):
     path = NodePath(prefix + '_path')
@@ -721,6 +722,104 @@ def make_primitives_skirt(prim, inner, nb_vertices):
                 prim.addVertices(skirt + 1, v + 1, v + nb_vertices + 1)
                 prim.addVertices(skirt, v + 1, skirt + 1)
 
+#The topology of a square patch only depends on its tessellation, the primitives and the grid are
+#built once and shared by all the patches
+patch_primitives = {}
+patch_grids = {}
+
+def make_patch_primitive(tesselation, use_patch_adaptation, use_patch_skirts):
+    inner = tesselation.inner
+    if use_patch_adaptation:
+        ratio = tuple(tesselation.ratio)
+    else:
+        ratio = None
+    key = (inner, ratio, use_patch_skirts)
+    prim = patch_primitives.get(key)
+    if prim is None:
+        nb_vertices = inner + 1
+        prim = GeomTriangles(Geom.UHStatic)
+        if use_patch_adaptation:
+            make_adapted_square_primitives(prim, inner, nb_vertices, ratio)
+            if use_patch_skirts:
+                make_adapted_square_primitives_skirt(prim, inner, nb_vertices, ratio)
+        else:
+            make_square_primitives(prim, inner, nb_vertices)
+            if use_patch_skirts:
+                make_primitives_skirt(prim, inner, nb_vertices)
+        prim.closePrimitive()
+        patch_primitives[key] = prim
+    return prim
+
+def make_patch_grid(inner, use_patch_skirts):
+    #Returns the u, v coordinates of the vertices of a square patch and the mask of the skirt vertices
+    key = (inner, use_patch_skirts)
+    grid = patch_grids.get(key)
+    if grid is None:
+        nb_vertices = inner + 1
+        steps = numpy.arange(nb_vertices)
+        i = numpy.repeat(steps, nb_vertices)
+        j = numpy.tile(steps, nb_vertices)
+        if use_patch_skirts:
+            first = numpy.zeros(nb_vertices, dtype=int)
+            last = numpy.full(nb_vertices, inner)
+            i = numpy.concatenate((i, first, last, steps, steps))
+            j = numpy.concatenate((j, steps, steps, first, last))
+        skirt = numpy.arange(len(i)) >= nb_vertices * nb_vertices
+        grid = (i / inner, j / inner, skirt)
+        patch_grids[key] = grid
+    return grid
+
+def update_patch_primitive(path, tesselation, use_patch_adaptation, use_patch_skirts):
+    #Only the primitives depend on the tessellation of the neighbours, the vertices are kept as is
+    geom = path.find('+GeomNode').node().modify_geom(0)
+    geom.set_primitive(0, make_patch_primitive(tesselation, use_patch_adaptation, use_patch_skirts))
+
+#When the cube projection is done in the vertex shader, all the patches with the same tessellation share
+#the same geom. The vertices only contain the u, v coordinates in the patch and the skirt flag.
+patch_templates = {}
+
+def make_patch_template(tesselation, use_patch_adaptation, use_patch_skirts):
+    inner = tesselation.inner
+    if use_patch_adaptation:
+        ratio = tuple(tesselation.ratio)
+    else:
+        ratio = None
+    key = (inner, ratio, use_patch_skirts)
+    geom = patch_templates.get(key)
+    if geom is None:
+        (u, v, skirt) = make_patch_grid(inner, use_patch_skirts)
+        (gvw, gcw, gtw, gnw, gtanw, gbiw, prim, geom) = empty_geom('template', len(u), 0, normal=False, texture=False)
+        gvd = geom.modify_vertex_data()
+        data = numpy.frombuffer(memoryview(gvd.modify_array(0)).cast('B'), numpy.float32).reshape(-1, 3)
+        data[:, 0] = u
+        data[:, 1] = v
+        data[:, 2] = skirt
+        geom.add_primitive(make_patch_primitive(tesselation, use_patch_adaptation, use_patch_skirts))
+        patch_templates[key] = geom
+    return geom
+
+def SquarePatchTemplate(height, tesselation,
+                        x0, y0, x1, y1,
+                        x_inverted=False, y_inverted=False, xy_swap=False, has_offset=False, offset=None,
+                        use_patch_adaptation = True,
+                        use_patch_skirts = True):
+    #The patch only holds the shader inputs used by the cube projection of the vertex input
+    (path, node) = empty_node('uv')
+    node.add_geom(make_patch_template(tesselation, use_patch_adaptation, use_patch_skirts))
+    #The vertices of the template are not in model space
+    node.set_bounds(OmniBoundingVolume())
+    node.set_final(True)
+    (x0, y0, x1, y1, dx, dy) = convert_xy(x0, y0, x1, y1, x_inverted, y_inverted, xy_swap)
+    if offset is None:
+        offset = 0.0
+    path.set_shader_input('patch_xy', (x0, y0, x1, y1))
+    #The skirt is the border of the patch lowered by the size of one cell
+    path.set_shader_input('patch_height', (height, height - offset, sqrt(dx * dx + dy * dy) / tesselation.inner))
+    return path
+
+def update_patch_template(path, tesselation, use_patch_adaptation, use_patch_skirts):
+    path.find('+GeomNode').node().set_geom(0, make_patch_template(tesselation, use_patch_adaptation, use_patch_skirts))
+
 @named_pstat("geom")
 def PyTile(size, tesselation,
         inv_u=False, inv_v=False, swap_uv=False,
@@ -731,11 +830,9 @@ def PyTile(size, tesselation,
     nb_vertices = inner + 1
     (path, node) = empty_node('uv')
     nb_points = nb_vertices * nb_vertices
-    nb_primitives = inner * inner
     if use_patch_skirts:
         nb_points += nb_vertices * 4
-        nb_primitives += inner * 4
-    (gvw, gcw, gtw, gnw, gtanw, gbiw, prim, geom) = empty_geom('cube', nb_points, nb_primitives, tanbin=True)
+    (gvw, gcw, gtw, gnw, gtanw, gbiw, prim, geom) = empty_geom('cube', nb_points, 0, tanbin=True)
     node.add_geom(geom)
 
     for i in range(0, nb_vertices):
@@ -796,16 +893,7 @@ def PyTile(size, tesselation,
                 gtanw.add_data3(1, 0, 0)
                 gbiw.add_data3(0, 1, 0)
 
-    if use_patch_adaptation:
-        make_adapted_square_primitives(prim, inner, nb_vertices, tesselation.ratio)
-        if use_patch_skirts:
-            make_adapted_square_primitives_skirt(prim, inner, nb_vertices, tesselation.ratio)
-    else:
-        make_square_primitives(prim, inner, nb_vertices)
-        if use_patch_skirts:
-            make_primitives_skirt(prim, inner, nb_vertices)
-    prim.closePrimitive()
-    geom.addPrimitive(prim)
+    geom.add_primitive(make_patch_primitive(tesselation, use_patch_adaptation, use_patch_skirts))
 
     return path
 
@@ -928,6 +1016,31 @@ def SquarePatch(height, inner, outer,
 
     return path
 
+def patch_vertex_view(gvd):
+    #The columns created by empty_geom() with tanbin are vertex, texcoord, normal, tangent and binormal
+    return numpy.frombuffer(memoryview(gvd.modify_array(0)).cast('B'), numpy.float32).reshape(-1, 14)
+
+def write_patch_vertices(gvd, u, v, vertices, normals, tangents, binormals, inv_u, inv_v, swap_uv):
+    if inv_u:
+        u = 1.0 - u
+        tangents = -tangents
+    if inv_v:
+        v = 1.0 - v
+        binormals = -binormals
+    if swap_uv:
+        u, v = v, u
+        tangents, binormals = binormals, tangents
+    data = patch_vertex_view(gvd)
+    data[:, 0:3] = vertices
+    data[:, 3] = u
+    data[:, 4] = v
+    data[:, 5:8] = normals
+    data[:, 8:11] = tangents
+    data[:, 11:14] = binormals
+
+def normalize_rows(vectors):
+    return vectors / numpy.linalg.norm(vectors, axis=1)[:, numpy.newaxis]
+
 @named_pstat("geom")
 def PySquaredDistanceSquarePatch(height, tesselation,
                 x0, y0, x1, y1,
@@ -937,126 +1050,34 @@ def PySquaredDistanceSquarePatch(height, tesselation,
                 use_patch_skirts = True):
     (path, node) = empty_node('uv')
     inner = tesselation.inner
-    nb_vertices = inner + 1
-    nb_points = nb_vertices * nb_vertices
-    nb_primitives = inner * inner
-    if use_patch_skirts:
-        nb_points += nb_vertices * 4
-        nb_primitives += inner * 4
-    (gvw, gcw, gtw, gnw, gtanw, gbiw, prim, geom) = empty_geom('cube', nb_points, nb_primitives, tanbin=True)
+    (u, v, skirt) = make_patch_grid(inner, use_patch_skirts)
+    (gvw, gcw, gtw, gnw, gtanw, gbiw, prim, geom) = empty_geom('cube', len(u), 0, tanbin=True)
     node.add_geom(geom)
 
-    if offset is not None:
-        normal = SquaredDistanceSquarePatchNormal(x0, y0, x1, y1, x_inverted, y_inverted, xy_swap)
+    normal = SquaredDistanceSquarePatchNormal(x0, y0, x1, y1, x_inverted, y_inverted, xy_swap)
 
     (x0, y0, x1, y1, dx, dy) = convert_xy(x0, y0, x1, y1, x_inverted, y_inverted, xy_swap)
 
-    for i in range(0, nb_vertices):
-        for j in range(0, nb_vertices):
-            u = float(i) / inner
-            v = float(j) / inner
-            x = x0 + i * dx / inner
-            y = y0 + j * dy / inner
-            x = 2.0 * x - 1.0
-            y = 2.0 * y - 1.0
-            z = 1.0
-            x2 = x * x
-            y2 = y * y
-            z2 = z * z
-            xp = x * sqrt(1.0 - y2 * 0.5 - z2 * 0.5 + y2 * z2 / 3.0)
-            yp = y * sqrt(1.0 - z2 * 0.5 - x2 * 0.5 + z2 * x2 / 3.0)
-            zp = z * sqrt(1.0 - x2 * 0.5 - y2 * 0.5 + x2 * y2 / 3.0)
-            if inv_u:
-                u = 1.0 - u
-            if inv_v:
-                v = 1.0 - v
-            if swap_uv:
-                u, v = v, u
-            gtw.add_data2(u, v)
-            if offset is not None:
-                gvw.add_data3(xp * height - normal[0] * offset,
-                              yp * height - normal[1] * offset,
-                              zp * height - normal[2] * offset)
-            else:
-                gvw.add_data3(xp * height, yp * height, zp * height)
-            gnw.add_data3(xp, yp, zp)
-            tan = LVector3d(1.0, x * y * (z2 / 3.0 - 0.5), x * z * (y2 / 3.0 - 0.5))
-            tan.normalize()
-            bin = LVector3d(x * y * (z2 / 3.0 - 0.5), 1.0, y * z * (x2 / 3.0 - 0.5))
-            bin.normalize()
-            if inv_u: tan = -tan
-            if inv_v: bin = -bin
-            if swap_uv:
-                tan, bin = bin, tan
-            gtanw.add_data3d(tan)
-            gbiw.add_data3d(bin)
-
-    if use_patch_skirts:
-        if offset is None:
-            offset = 0
-        offset = offset + sqrt(dx * dx + dy * dy) / inner
-        for a in range(0, 4):
-            for b in range(0, nb_vertices):
-                if a == 0:
-                    i = 0
-                    j = b
-                elif a == 1:
-                    i = inner
-                    j = b
-                elif a == 2:
-                    i = b
-                    j = 0
-                elif a == 3:
-                    i = b
-                    j = inner
-                u = float(i) / inner
-                v = float(j) / inner
-                x = x0 + i * dx / inner
-                y = y0 + j * dy / inner
-                x = 2.0 * x - 1.0
-                y = 2.0 * y - 1.0
-                z = 1.0
-                x2 = x * x
-                y2 = y * y
-                z2 = z * z
-                xp = x * sqrt(1.0 - y2 * 0.5 - z2 * 0.5 + y2 * z2 / 3.0)
-                yp = y * sqrt(1.0 - z2 * 0.5 - x2 * 0.5 + z2 * x2 / 3.0)
-                zp = z * sqrt(1.0 - x2 * 0.5 - y2 * 0.5 + x2 * y2 / 3.0)
-                if inv_u:
-                    u = 1.0 - u
-                if inv_v:
-                    v = 1.0 - v
-                if swap_uv:
-                    u, v = v, u
-                gtw.add_data2(u, v)
-                if offset is not None:
-                    gvw.add_data3(xp * height - normal[0] * offset,
-                                  yp * height - normal[1] * offset,
-                                  zp * height - normal[2] * offset)
-                else:
-                    gvw.add_data3(xp * height, yp * height, zp * height)
-                gnw.add_data3(xp, yp, zp)
-                tan = LVector3d(1.0, x * y * (z2 / 3.0 - 0.5), x * z * (y2 / 3.0 - 0.5))
-                tan.normalize()
-                bin = LVector3d(x * y * (z2 / 3.0 - 0.5), 1.0, y * z * (x2 / 3.0 - 0.5))
-                bin.normalize()
-                if inv_u: tan = -tan
-                if inv_v: bin = -bin
-                if swap_uv:
-                    tan, bin = bin, tan
-                gtanw.add_data3d(tan)
-                gbiw.add_data3d(bin)
+    x = 2.0 * (x0 + u * dx) - 1.0
+    y = 2.0 * (y0 + v * dy) - 1.0
+    x2 = x * x
+    y2 = y * y
+    #z is always 1.0
+    xp = x * numpy.sqrt(0.5 - y2 / 6.0)
+    yp = y * numpy.sqrt(0.5 - x2 / 6.0)
+    zp = numpy.sqrt(1.0 - x2 * 0.5 - y2 * 0.5 + x2 * y2 / 3.0)
+    normals = numpy.column_stack((xp, yp, zp))
+    ones = numpy.ones(len(u))
+    tangents = normalize_rows(numpy.column_stack((ones, x * y * (1.0 / 3.0 - 0.5), x * (y2 / 3.0 - 0.5))))
+    binormals = normalize_rows(numpy.column_stack((x * y * (1.0 / 3.0 - 0.5), ones, y * (x2 / 3.0 - 0.5))))
+    if offset is None:
+        offset = 0.0
+    #The skirt is the border of the patch lowered by the size of one cell
+    offsets = numpy.where(skirt, offset + sqrt(dx * dx + dy * dy) / inner, offset)
+    vertices = normals * height - numpy.outer(offsets, tuple(normal))
+    write_patch_vertices(geom.modify_vertex_data(), u, v, vertices, normals, tangents, binormals, inv_u, inv_v, swap_uv)
 
-    if use_patch_adaptation:
-        make_adapted_square_primitives(prim, inner, nb_vertices, tesselation.ratio)
-        if use_patch_skirts:
-            make_adapted_square_primitives_skirt(prim, inner, nb_vertices, tesselation.ratio)
-    else:
-        make_square_primitives(prim, inner, nb_vertices)
-        if use_patch_skirts:
-            make_primitives_skirt(prim, inner, nb_vertices)
-    prim.closePrimitive()
-    geom.addPrimitive(prim)
+    geom.add_primitive(make_patch_primitive(tesselation, use_patch_adaptation, use_patch_skirts))
 
     return path
 
@@ -1126,114 +1147,28 @@ def PyNormalizedSquarePatch(height, tesselation,
                           use_patch_skirts = True):
     (path, node) = empty_node('uv')
     inner = tesselation.inner
-    nb_vertices = inner + 1
-    nb_points = nb_vertices * nb_vertices
-    nb_primitives = inner * inner
-    if use_patch_skirts:
-        nb_points += nb_vertices * 4
-        nb_primitives += inner * 4
-    (gvw, gcw, gtw, gnw, gtanw, gbiw, prim, geom) = empty_geom('cube', nb_points, nb_primitives, tanbin=True)
+    (u, v, skirt) = make_patch_grid(inner, use_patch_skirts)
+    (gvw, gcw, gtw, gnw, gtanw, gbiw, prim, geom) = empty_geom('cube', len(u), 0, tanbin=True)
     node.add_geom(geom)
 
-    if has_offset:
-        normal = NormalizedSquarePatchNormal(x0, y0, x1, y1, x_inverted, y_inverted, xy_swap)
+    normal = NormalizedSquarePatchNormal(x0, y0, x1, y1, x_inverted, y_inverted, xy_swap)
 
     (x0, y0, x1, y1, dx, dy) = convert_xy(x0, y0, x1, y1, x_inverted, y_inverted, xy_swap)
 
-    for i in range(0, nb_vertices):
-        for j in range(0, nb_vertices):
-            x = x0 + i * dx / inner
-            y = y0 + j * dy / inner
-            x = 2.0 * x - 1.0
-            y = 2.0 * y - 1.0
-            vec = LVector3d(x, y, 1.0)
-            vec.normalize()
-            u = float(i) / inner
-            v = float(j) / inner
-            if inv_u:
-                u = 1.0 - u
-            if inv_v:
-                v = 1.0 - v
-            if swap_uv:
-                u, v = v, u
-            gtw.add_data2(u, v)
-            nvec = vec
-            vec = vec * height
-            if offset is not None:
-                vec = vec - normal * offset
-            gvw.add_data3d(vec)
-            gnw.add_data3d(nvec)
-            tan = LVector3d(1.0 + y*y, -x*y, -x)
-            tan.normalize()
-            bin = LVector3d(x * y, 1.0 + x*x, -y)
-            bin.normalize()
-            if inv_u: tan = -tan
-            if inv_v: bin = -bin
-            if swap_uv:
-                tan, bin = bin, tan
-            gtanw.add_data3d(tan)
-            gbiw.add_data3d(bin)
-
-    if use_patch_skirts:
-        if offset is None:
-            offset = 0
-        offset = offset + sqrt(dx * dx + dy * dy) / inner
-        for a in range(0, 4):
-            for b in range(0, nb_vertices):
-                if a == 0:
-                    i = 0
-                    j = b
-                elif a == 1:
-                    i = inner
-                    j = b
-                elif a == 2:
-                    i = b
-                    j = 0
-                elif a == 3:
-                    i = b
-                    j = inner
-                x = x0 + i * dx / inner
-                y = y0 + j * dy / inner
-                x = 2.0 * x - 1.0
-                y = 2.0 * y - 1.0
-                vec = LVector3d(x, y, 1.0)
-                vec.normalize()
-                u = float(i) / inner
-                v = float(j) / inner
-                if inv_u:
-                    u = 1.0 - u
-                if inv_v:
-                    v = 1.0 - v
-                if swap_uv:
-                    u, v = v, u
-                gtw.add_data2(u, v)
-                nvec = vec
-                vec = vec * height
-                if has_offset:
-                    vec = vec - normal * offset
-                gvw.add_data3d(vec)
-                gnw.add_data3d(nvec)
-                tan = LVector3d(1.0 + y*y, -x*y, -x)
-                tan.normalize()
-                bin = LVector3d(x * y, 1.0 + x*x, -y)
-                bin.normalize()
-                if inv_u: tan = -tan
-                if inv_v: bin = -bin
-                if swap_uv:
-                    tan, bin = bin, tan
-                gtanw.add_data3d(tan)
-                gbiw.add_data3d(bin)
+    x = 2.0 * (x0 + u * dx) - 1.0
+    y = 2.0 * (y0 + v * dy) - 1.0
+    ones = numpy.ones(len(u))
+    normals = normalize_rows(numpy.column_stack((x, y, ones)))
+    tangents = normalize_rows(numpy.column_stack((1.0 + y * y, -x * y, -x)))
+    binormals = normalize_rows(numpy.column_stack((x * y, 1.0 + x * x, -y)))
+    if offset is None:
+        offset = 0.0
+    #The skirt is the border of the patch lowered by the size of one cell
+    offsets = numpy.where(skirt, offset + sqrt(dx * dx + dy * dy) / inner, offset)
+    vertices = normals * height - numpy.outer(offsets, tuple(normal))
+    write_patch_vertices(geom.modify_vertex_data(), u, v, vertices, normals, tangents, binormals, inv_u, inv_v, swap_uv)
 
-    if use_patch_adaptation:
-        make_adapted_square_primitives(prim, inner, nb_vertices, tesselation.ratio)
-        if use_patch_skirts:
-            make_adapted_square_primitives_skirt(prim, inner, nb_vertices, tesselation.ratio)
-    else:
-        make_square_primitives(prim, inner, nb_vertices)
-        if use_patch_skirts:
-            make_primitives_skirt(prim, inner, nb_vertices)
-    prim.closePrimitive()
-    geom.addPrimitive(prim)
+    geom.add_primitive(make_patch_primitive(tesselation, use_patch_adaptation, use_patch_skirts))
 
     return path
 
@@ -1365,6 +1300,8 @@ try:
     SquaredDistanceSquarePatch = improved_qcs_patch_generator.make
     tile_patch_generator = TilePatchGenerator()
     Tile = tile_patch_generator.make
+    #The vertices created by the C implementation could be in another order, the patches must be rebuilt
+    update_patch_primitive = None
 except ImportError as e:
     print("WARNING: Could not load geometry C implementation, fallback on python implementation")
     print("\t", e)
@@ -28,25 +28,65 @@ from .textures import TexCoord, AutoTextureSource, TextureBase, HeightMapTexture
 from .interpolators import HardwareInterpolator
 from .filters import BilinearFilter
 from .dircontext import defaultDirContext
+from . import settings
 
 import traceback
 import numpy
 import sys
 
+def get_heightmap_data(texture, signed=False):
+    #Return the height channel of the texture as a 2D array of normalized values
+    data = texture.getRamImage()
+    component_type = texture.getComponentType()
+    if component_type == Texture.T_float:
+        buffer_type = numpy.float32
+        scale = 1.0
+    elif component_type == Texture.T_unsigned_byte:
+        if signed:
+            buffer_type = numpy.int8
+            scale = 128.0
+        else:
+            buffer_type = numpy.uint8
+            scale = 255.0
+    elif component_type == Texture.T_unsigned_short:
+        if signed:
+            buffer_type = numpy.int16
+            scale = 32768.0
+        else:
+            buffer_type = numpy.uint16
+            scale = 65535.0
+    if sys.version_info[0] < 3:
+        buf = data.getData()
+        np_buffer = numpy.fromstring(buf, dtype=buffer_type)
+    else:
+        np_buffer = numpy.frombuffer(data, buffer_type)
+    nb_components = texture.getNumComponents()
+    np_buffer = np_buffer.reshape(texture.getYSize(), texture.getXSize(), nb_components)
+    # Data is stored as BGRA
+    if nb_components >= 3:
+        red = 2
+    else:
+        red = 0
+    if settings.encode_float and nb_components == 4:
+        values = np_buffer[:, :, 2] + np_buffer[:, :, 1] / 255.0 + np_buffer[:, :, 0] / 65025.0 + np_buffer[:, :, 3] / 16581375.0
+    else:
+        values = np_buffer[:, :, red]
+    return numpy.asarray(values, dtype=numpy.float32) / scale
+
 #TODO: HeightmapPatch has common code with Heightmap and TextureHeightmapBase, this should be refactored
 #TODO: Texture data should be refactored like appearance to be fully independent from the source
 
 class HeightmapPatch(PatchData):
     def __init__(self, parent, patch, width, height, overlap):
         PatchData.__init__(self, parent, patch, width, height, overlap)
-        self.texture_peeker = None
+        self.height_data = None
         self.min_height = None
         self.max_height = None
         self.mean_height = None
 
     def copy_from(self, parent_data):
         PatchData.copy_from(self, parent_data)
-        self.texture_peeker = parent_data.texture_peeker
+        self.height_data = parent_data.height_data
         self.min_height = parent_data.min_height
         self.max_height = parent_data.max_height
         self.mean_height = parent_data.mean_height
@@ -54,18 +94,28 @@ class HeightmapPatch(PatchData):
     def set_height(self, x, y, height):
         pass
 
+    def get_heights(self, x, y, filter=None):
+        if self.height_data is None:
+            print("No height data", self.patch.str_id(), self.patch.instance_ready)
+            traceback.print_stack()
+            return numpy.zeros(len(x))
+        new_x = numpy.minimum(x * self.texture_scale[0] + self.texture_offset[0] * self.width, self.width - 1)
+        new_y = numpy.minimum(y * self.texture_scale[1] + self.texture_offset[1] * self.height, self.height - 1)
+        if filter is None:
+            filter = self.parent.filter
+        heights = filter.get_values(self.height_data, new_x, new_y)
+        #TODO: This should be done in PatchedHeightmap.get_height()
+        return heights * self.parent.height_scale + self.parent.height_offset
+
+    def get_heights_uv(self, u, v, filter=None):
+        return self.get_heights(numpy.asarray(u) * self.width, numpy.asarray(v) * self.height, filter)
+
     def get_height(self, x, y):
-        if self.texture_peeker is None:
-            print("No peeker", self.patch.str_id(), self.patch.instance_ready)
+        if self.height_data is None:
+            print("No height data", self.patch.str_id(), self.patch.instance_ready)
             traceback.print_stack()
             return 0.0
-        new_x = x * self.texture_scale[0] + self.texture_offset[0] * self.width
-        new_y = y * self.texture_scale[1] + self.texture_offset[1] * self.height
-        new_x = min(new_x, self.width - 1)
-        new_y = min(new_y, self.height - 1)
-        height = self.parent.filter.get_value(self.texture_peeker, new_x, new_y)
-        #TODO: This should be done in PatchedHeightmap.get_height()
-        return height * self.parent.height_scale + self.parent.height_offset
+        return float(self.get_heights(numpy.array([x]), numpy.array([y]))[0])
 
     def get_height_uv(self, u, v):
         return self.get_height(u * self.width, v * self.height)
@@ -85,7 +135,7 @@ class HeightmapPatch(PatchData):
 
     def clear(self):
         PatchData.clear(self)
-        self.texture_peeker = None
+        self.height_data = None
 
     def collect_shader_data(self, data):
         # Data is set as RGBA, but stored as BGRA
@@ -102,39 +152,10 @@ class HeightmapPatch(PatchData):
         self.texture.set_wrap_u(Texture.WMClamp)
         self.texture.set_wrap_v(Texture.WMClamp)
         self.parent.filter.configure_texture(self.texture)
-        self.texture_peeker = self.texture.peek()
-#       if self.texture_peeker is None:
-#           print("NOT READY !!!")
-        data = self.texture.getRamImage()
-        #TODO: should be completed and refactored
-        signed = False
-        component_type = self.texture.getComponentType()
-        if component_type == Texture.T_float:
-            buffer_type = numpy.float32
-            scale = 1.0
-        elif component_type == Texture.T_unsigned_byte:
-            if signed:
-                buffer_type = numpy.int8
-                scale = 128.0
-            else:
-                buffer_type = numpy.uint8
-                scale = 255.0
-        elif component_type == Texture.T_unsigned_short:
-            if signed:
-                buffer_type = numpy.int16
-                scale = 32768.0
-            else:
-                buffer_type = numpy.uint16
-                scale = 65535.0
-        if sys.version_info[0] < 3:
-            buf = data.getData()
-            np_buffer = numpy.fromstring(buf, dtype=buffer_type)
-        else:
-            np_buffer = numpy.frombuffer(data, buffer_type)
-        np_buffer.shape = (self.texture.getYSize(), self.texture.getXSize(), self.texture.getNumComponents())
-        self.min_height = np_buffer.min() / scale
-        self.max_height = np_buffer.max() / scale
-        self.mean_height = np_buffer.mean() / scale
+        self.height_data = get_heightmap_data(self.texture)
+        self.min_height = self.height_data.min()
+        self.max_height = self.height_data.max()
+        self.mean_height = self.height_data.mean()
 
     def make_default_data(self):
         texture = Texture()
@@ -221,38 +242,41 @@ class TextureHeightmapBase(HeightmapBase, TextureShapeDataBase):
     def __init__(self, name, width, height, min_height, max_height, height_scale, height_offset, interpolator, filter):
         HeightmapBase.__init__(self, width, height, min_height, max_height, height_scale, height_offset, interpolator, filter)
         TextureShapeDataBase.__init__(self, name, width, height)
-        self.texture_peeker = None
+        self.height_data = None
 
     def set_height(self, x, y, height):
         pass
 
+    def get_heights(self, x, y, filter=None):
+        if self.height_data is None:
+            print("No height data")
+            traceback.print_stack()
+            return numpy.zeros(len(x))
+        new_x = numpy.minimum(x * self.texture_scale[0] + self.texture_offset[0] * self.width, self.width - 1)
+        new_y = numpy.minimum(y * self.texture_scale[1] + self.texture_offset[1] * self.height, self.height - 1)
+        if filter is None:
+            filter = self.filter
+        heights = filter.get_values(self.height_data, new_x, new_y)
+        return heights * self.height_scale + self.height_offset
+
+    def get_heights_uv(self, u, v, filter=None):
+        return self.get_heights(numpy.asarray(u) * self.width, numpy.asarray(v) * self.height, filter)
+
     def get_height(self, x, y):
-        if self.texture_peeker is None:
-            print("No peeker")
+        if self.height_data is None:
+            print("No height data")
             traceback.print_stack()
             return 0.0
-        new_x = x * self.texture_scale[0] + self.texture_offset[0] * self.width
-        new_y = y * self.texture_scale[1] + self.texture_offset[1] * self.height
-        new_x = min(new_x, self.width - 1)
-        new_y = min(new_y, self.height - 1)
-        height = self.filter.get_value(self.texture_peeker, new_x, new_y)
-        return height * self.height_scale + self.height_offset
+        return float(self.get_heights(numpy.array([x]), numpy.array([y]))[0])
 
     def configure_texture(self, texture):
         texture.set_wrap_u(Texture.WMClamp)
         texture.set_wrap_v(Texture.WMClamp)
         self.filter.configure_texture(texture)
-        self.texture_peeker = self.texture.peek()
-        data = self.texture.getRamImage()
-        if sys.version_info[0] < 3:
-            buf = data.getData()
-            np_buffer = numpy.fromstring(buf, dtype=numpy.float32)
-        else:
-            np_buffer = numpy.frombuffer(data, numpy.float32)
-        np_buffer.shape = (self.texture.getYSize(), self.texture.getXSize(), self.texture.getNumComponents())
-        self.min_height = np_buffer.min()
-        self.max_height = np_buffer.max()
-        self.mean_height = np_buffer.mean()
+        self.height_data = get_heightmap_data(self.texture)
+        self.min_height = self.height_data.min()
+        self.max_height = self.height_data.max()
+        self.mean_height = self.height_data.mean()
 
 
 class TextureHeightmap(TextureHeightmapBase):
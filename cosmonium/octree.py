@@ -21,11 +21,12 @@ from __future__ import absolute_import
 
 try:
     from cosmonium_engine import OctreeNode, OctreeLeaf, InfiniteFrustum, VisibleObjectsTraverser
+    CoherentVisibleObjectsTraverser = None
     hasOctreeLeaf = True
     print("Using C++ Engine")
 except ImportError as e:
     print("WARNING: Could not load Octree C implementation, fallback on python implementation")
     print("\t", e)
-    from .pyengine.pyoctree import OctreeNode, OctreeLeaf, VisibleObjectsTraverser
+    from .pyengine.pyoctree import OctreeNode, OctreeLeaf, VisibleObjectsTraverser, CoherentVisibleObjectsTraverser
     from .pyengine.pyfrustum import InfiniteFrustum
     hasOctreeLeaf = False
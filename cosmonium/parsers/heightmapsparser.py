@@ -24,8 +24,9 @@ from ..astro import units
 from ..heightmap import TextureHeightmap, TexturePatchedHeightmap, heightmapRegistry
 from ..interpolators import HardwareInterpolator, SoftwareInterpolator
 from ..filters import NearestFilter, BilinearFilter, SmoothstepFilter, QuinticFilter, BSplineFilter
-from ..procedural.shaderheightmap import HeightmapPatchGenerator, ShaderPatchedHeightmap
+from ..procedural.shaderheightmap import HeightmapPatchGenerator, CpuHeightmapPatchGenerator, ShaderPatchedHeightmap
 from ..textures import HeightMapTexture
+from .. import settings
 
 from .yamlparser import YamlModuleParser
 from .objectparser import ObjectYamlParser
@@ -120,7 +121,13 @@ class HeightmapYamlParser(YamlModuleParser):
                 func = data.get('noise')
                 print("Warning: 'noise' entry is deprecated, use 'func' instead'")
             heightmap_function = noise_parser.decode(func)
-            heightmap_data_source = HeightmapPatchGenerator(size, size, heightmap_function, 1.0)
+            generator = data.get('generator', settings.heightmap_generator)
+            if generator == 'cpu':
+                heightmap_data_source = CpuHeightmapPatchGenerator(size, size, heightmap_function, 1.0)
+            else:
+                if generator != 'gpu':
+                    print("Unknown heightmap generator", generator)
+                heightmap_data_source = HeightmapPatchGenerator(size, size, heightmap_function, 1.0)
             #TODO: The actual heightmap class is parametric until heightmaps are also a data source like the textures 
             heightmap_class = ShaderPatchedHeightmap
         else:
@@ -21,12 +21,10 @@ from __future__ import print_function
 from __future__ import absolute_import
 
 from ..dircontext import defaultDirContext, DirContext
-from ..cache import create_path_for
+from ..cache import parse_with_cache
 from ..import settings
 
 import os
-import hashlib
-import pickle
 import io
 
 import ruamel.yaml
@@ -110,6 +108,8 @@ class YamlParser(object):
         return (object_type, object_data)
 
 class YamlModuleParser(YamlParser):
+    #Must be increased when the parsed data changes to invalidate the cache
+    parser_version = 1
     context = defaultDirContext
     translation = None
     app = None
@@ -153,35 +153,6 @@ class YamlModuleParser(YamlParser):
             new_context.add_path(category, os.path.join(path, category))
         return new_context
 
-    def load_from_cache(self, filename, filepath):
-        data = None
-        config_path = create_path_for('config')
-        md5 = hashlib.md5(filepath.encode()).hexdigest()
-        cache_file = os.path.join(config_path, md5 + ".dat")
-        if os.path.exists(cache_file):
-            file_timestamp = os.path.getmtime(filepath)
-            cache_timestamp = os.path.getmtime(cache_file)
-            if cache_timestamp > file_timestamp:
-                print("Loading %s (cached)" % filepath)
-                base.splash.set_text("Loading %s (cached)" % filepath)
-                try:
-                    with open(cache_file, "rb") as f:
-                        data = pickle.load(f)
-                except (IOError, ValueError) as e:
-                    print("Could not read cache for", filename, cache_file, ':', e)
-        return data
-
-    def store_to_cache(self, data, filename, filepath):
-        config_path = create_path_for('config')
-        md5 = hashlib.md5(filepath.encode()).hexdigest()
-        cache_file = os.path.join(config_path, md5 + ".dat")
-        try:
-            with open(cache_file, "wb") as f:
-                print("Caching into", cache_file)
-                pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
-        except IOError as e:
-            print("Could not write cache for", filename, cache_file, ':', e)
-
     def load_and_parse(self, filename, parent=None, context=None):
         data = None
         if context is None:
@@ -190,18 +161,16 @@ class YamlModuleParser(YamlParser):
         if filepath is not None:
             saved_context = YamlModuleParser.context
             YamlModuleParser.context = self.create_new_context(context, filepath)
-            if settings.cache_yaml:
-                data = self.load_from_cache(filename, filepath)
-            if data is None:
-                print("Loading %s" % filepath)
-                base.splash.set_text("Loading %s" % filepath)
-                try:
+            print("Loading %s" % filepath)
+            base.splash.set_text("Loading %s" % filepath)
+            try:
+                if settings.cache_yaml:
+                    data = parse_with_cache('yaml', self.parser_version, filepath, lambda text: self.parse(text, filepath))
+                else:
                     text = io.open(filepath, encoding='utf8').read()
                     data = self.parse(text, filepath)
-                except IOError as e:
-                    print("Could not read", filename, filepath, ':', e)
-                if settings.cache_yaml and data is not None:
-                    self.store_to_cache(data, filename, filepath)
+            except IOError as e:
+                print("Could not read", filename, filepath, ':', e)
             if data is not None:
                 if parent is not None:
                     data = self.decode(data, parent)
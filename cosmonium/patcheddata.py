@@ -22,6 +22,7 @@ from __future__ import print_function
 from panda3d.core import LVector2
 
 from .textures import TexCoord
+from .patchkey import parent_patch_key
 
 class PatchData:
     def __init__(self, parent, patch, width, height, overlap):
@@ -125,36 +126,35 @@ class PatchedData():
         self.map_patch_data = {}
 
     def get_texture_offset(self, patch):
-        return self.map_patch_data[patch.str_id()].texture_offset
+        return self.map_patch_data[patch.key].texture_offset
 
     def get_texture_scale(self, patch):
-        return self.map_patch_data[patch.str_id()].texture_scale
+        return self.map_patch_data[patch.key].texture_scale
 
     def get_patch_data(self, patch, recurse=False):
+        key = patch.key
+        patch_data = self.map_patch_data.get(key, None)
         if recurse:
-            while patch is not None:
-                patch_data = self.map_patch_data.get(patch.str_id(), None)
-                if patch_data is not None: break
-                patch = patch.parent
-        else:
-            patch_data = self.map_patch_data.get(patch.str_id(), None)
+            while patch_data is None and key is not None:
+                key = parent_patch_key(key)
+                patch_data = self.map_patch_data.get(key, None)
         return patch_data
 
     def do_create_patch_data(self, patch):
         pass
 
     def create_patch_data(self, patch):
-        if patch.str_id() in self.map_patch_data: return
+        if patch.key in self.map_patch_data: return
         patch_data = self.do_create_patch_data(patch)
-        self.map_patch_data[patch.str_id()] = patch_data
-        parent = patch.parent
+        self.map_patch_data[patch.key] = patch_data
+        parent_key = parent_patch_key(patch.key)
         # The parent data is also used for early display of the patch
-        while parent is not None:
-            parent_data = self.map_patch_data.get(parent.str_id())
+        while parent_key is not None:
+            parent_data = self.map_patch_data.get(parent_key)
             if parent_data is not None and not parent_data.cloned:
                 patch_data.parent_data = parent_data
                 break
-            parent = parent.parent
+            parent_key = parent_patch_key(parent_key)
         if patch_data.parent_data is None and patch.lod > 0:
             print("NO PARENT DATA FOR", patch.str_id())
 
@@ -162,8 +162,8 @@ class PatchedData():
         tasks_tree.add_task_for(self, self.load_patch_data(tasks_tree, patch, owner))
 
     async def load_patch_data(self, tasks_tree, patch, owner):
-        if patch.str_id() in self.map_patch_data:
-            patch_data = self.map_patch_data[patch.str_id()]
+        patch_data = self.map_patch_data.get(patch.key)
+        if patch_data is not None:
             if not patch_data.loaded:
                 if patch.lod > self.max_lod:
                     patch_data.calc_sub_patch()
@@ -175,8 +175,8 @@ class PatchedData():
             print("PATCH NOT CREATED?", patch.str_id())
 
     def apply_patch_data(self, patch, instance):
-        if patch.str_id() in self.map_patch_data:
-            patch_data = self.map_patch_data[patch.str_id()]
+        patch_data = self.map_patch_data.get(patch.key)
+        if patch_data is not None:
             patch_data.apply(instance)
         else:
             print("PATCH NOT CREATED?", patch.str_id())
@@ -185,17 +185,16 @@ class PatchedData():
         raise NotImplementedError()
 
     def collect_shader_data(self, data, patch):
-        if patch.str_id() in self.map_patch_data:
-            patch_data = self.map_patch_data[patch.str_id()]
+        patch_data = self.map_patch_data.get(patch.key)
+        if patch_data is not None:
             patch_data.collect_shader_data(data)
         else:
             print("PATCH NOT CREATED?", patch.str_id())
 
     def clear_patch(self, patch):
         try:
-            patch_data = self.map_patch_data[patch.str_id()]
+            patch_data = self.map_patch_data.pop(patch.key)
             patch_data.clear()
-            del self.map_patch_data[patch.str_id()]
         except KeyError:
             pass
 
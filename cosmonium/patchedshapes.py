@@ -28,7 +28,10 @@ from direct.task.Task import gather
 
 from .shapes import Shape
 from .shaders import DataStoreManagerDataSource, ParametersDataStoreDataSource
+from .shaders import NormalizedCubePatchVertexInput, SquaredDistanceCubePatchVertexInput
 from .textures import TexCoord
+from .patchkey import make_patch_key
+from .patchscheduler import patchLoadScheduler
 from .pstats import pstat
 from . import geometry
 from . import settings
@@ -37,6 +40,7 @@ from math import cos, sin, pi, sqrt, copysign, log
 from collections import deque
 import struct
 from array import array
+import numpy
 
 class BoundingBoxShape():
     state = None
@@ -60,6 +64,14 @@ class BoundingBoxShape():
             self.instance.remove_node()
             self.instance = None
 
+    def set_box(self, box):
+        self.box = box
+        if self.instance is not None:
+            parent = self.instance.get_parent()
+            self.remove_instance()
+            self.create_instance()
+            self.instance.reparent_to(parent)
+
 class PyCullingFrustumBase:
     def is_bb_in_view(self, bb, patch_normal, patch_offset):
         raise NotImplementedError()
@@ -67,6 +79,24 @@ class PyCullingFrustumBase:
     def is_patch_in_view(self, patch):
         return self.is_bb_in_view(patch.bounds, patch.normal, patch.offset)
 
+    def are_bb_in_view(self, bb_min, bb_max, patch_normals, patch_offsets):
+        #Vectorized version of is_bb_in_view(), a box is culled if its corner nearest to the inside of the frustum
+        #is outside one of its planes, which is the test done by BoundingHexahedron
+        offsets = numpy.zeros((len(bb_min), 3))
+        if self.offset_body_center:
+            offsets += tuple(self.model_body_center_offset)
+        if self.shift_patch_origin:
+            offsets += patch_normals * patch_offsets[:, numpy.newaxis]
+        bb_min = bb_min + offsets
+        bb_max = bb_max + offsets
+        in_view = numpy.ones(len(bb_min), dtype=bool)
+        for i in range(self.lens_bounds.get_num_planes()):
+            (a, b, c, d) = self.lens_bounds.get_plane(i)
+            normal = numpy.array((a, b, c))
+            corners = numpy.where(normal > 0, bb_min, bb_max)
+            in_view &= corners.dot(normal) + d <= 0
+        return in_view
+
 class PyCullingFrustum(PyCullingFrustumBase):
     def __init__(self, lens, transform_mat, offset_body_center, model_body_center_offset, shift_patch_origin):
         self.lens = lens
@@ -203,6 +233,18 @@ class PatchFactory:
                 print("NO PATCH DATA !!!", patch.str_id())
         return (min_radius, max_radius, mean_radius)
 
+    def get_patch_radius_range(self, patch):
+        #Return the range of radius covered by the heightmap data of the patch itself, if already loaded
+        if self.heightmap is None:
+            return None
+        patch_data = self.heightmap.get_patch_data(patch)
+        if patch_data is None or patch_data.min_height is None:
+            return None
+        height_scale = self.heightmap.height_scale
+        height_offset = self.heightmap.height_offset
+        return (1.0 + patch_data.min_height * height_scale + height_offset,
+                1.0 + patch_data.max_height * height_scale + height_offset)
+
     def create_patch(self, parent, lod, x, y):
         pass
 
@@ -511,6 +553,11 @@ class PatchParametersDataStore:
         data_buffer[offset : offset + self.data_size * 4] = packed_data
 
 class PyQuadTreeNode:
+    #Incremented each time the structure of a quadtree changes
+    tree_version = 0
+    #Incremented each time the bounds of a node are changed
+    bounds_version = 0
+
     def __init__(self, patch, lod, density, centre, length, normal, offset, bounds):
         Shape.__init__(self)
         self.patch = patch
@@ -521,6 +568,7 @@ class PyQuadTreeNode:
         self.normal = normal
         self.offset = offset
         self.bounds = bounds
+        self.parent = None
         self.children = []
         self.children_bb = []
         self.children_normal = []
@@ -539,13 +587,22 @@ class PyQuadTreeNode:
         self.instance_ready = instance_ready
 
     def add_child(self, child):
+        PyQuadTreeNode.tree_version += 1
         child.parent = self
         self.children.append(child)
         self.children_bb.append(child.bounds.make_copy())
         self.children_normal.append(child.normal)
         self.children_offset.append(child.offset)
 
+    def set_bounds(self, bounds):
+        PyQuadTreeNode.bounds_version += 1
+        self.bounds = bounds
+        if self.parent is not None:
+            index = self.parent.children.index(self)
+            self.parent.children_bb[index] = bounds.make_copy()
+
     def remove_children(self):
+        PyQuadTreeNode.tree_version += 1
         for child in self.children:
             child.parent = None
         self.children = []
@@ -604,6 +661,92 @@ class PyQuadTreeNode:
             if not self.shown and lod_control.should_instanciate(self, self.apparent_size, self.distance):
                 lod_result.add_to_show(self)
 
+class PyQuadTreeFrontier:
+    #The static parameters of all the nodes of the quadtrees are kept in flat arrays, rebuilt only when the
+    #quadtrees change, so the culling and the LOD tests of all the nodes are done in one pass
+    def __init__(self):
+        self.roots = None
+        self.version = None
+        self.bounds_version = None
+        self.nodes = []
+
+    def update(self, roots):
+        if self.version == PyQuadTreeNode.tree_version and self.roots == roots:
+            if self.bounds_version != PyQuadTreeNode.bounds_version:
+                self.update_bounds()
+            return
+        self.version = PyQuadTreeNode.tree_version
+        self.roots = roots
+        nodes = []
+        children = []
+        nodes_index = {}
+        to_visit = list(roots)
+        while to_visit:
+            node = to_visit.pop()
+            nodes_index[id(node)] = len(nodes)
+            nodes.append(node)
+            to_visit.extend(node.children)
+        for node in nodes:
+            children.append([nodes_index[id(child)] for child in node.children])
+        self.nodes = nodes
+        self.children = children
+        self.roots_index = [nodes_index[id(root)] for root in roots]
+        count = len(nodes)
+        self.centres = numpy.array([tuple(node.centre) for node in nodes]).reshape(count, 3)
+        self.lengths = numpy.array([node.length for node in nodes])
+        self.normals = numpy.array([tuple(node.normal) for node in nodes]).reshape(count, 3)
+        self.offsets = numpy.array([node.offset or 0.0 for node in nodes])
+        self.update_bounds()
+        self.lods = numpy.array([node.lod for node in nodes])
+        self.densities = numpy.array([node.density for node in nodes])
+        self.leaves = numpy.array([len(node_children) == 0 for node_children in children], dtype=bool)
+        self.can_merge = [node.can_merge_children() for node in nodes]
+
+    def update_bounds(self):
+        self.bounds_version = PyQuadTreeNode.bounds_version
+        count = len(self.nodes)
+        self.bb_min = numpy.array([tuple(node.bounds.get_min()) for node in self.nodes]).reshape(count, 3)
+        self.bb_max = numpy.array([tuple(node.bounds.get_max()) for node in self.nodes]).reshape(count, 3)
+
+    @pstat
+    def check_lod(self, lod_result, culling_frustum, model_camera_pos, altitude, pixel_size, lod_control):
+        distances = numpy.linalg.norm(self.centres - tuple(model_camera_pos), axis=1) - self.lengths * 0.7071067811865476
+        distances = numpy.maximum(distances, altitude)
+        in_view = culling_frustum.are_bb_in_view(self.bb_min, self.bb_max, self.normals, self.offsets)
+        apparent_sizes = self.lengths / (distances * pixel_size)
+        to_split = lod_control.should_split_array(self.lods, self.densities, apparent_sizes, distances).tolist()
+        to_merge = lod_control.should_merge_array(self.lods, self.densities, apparent_sizes, distances).tolist()
+        to_show = lod_control.should_instanciate_array(in_view, self.lods, self.leaves, apparent_sizes, distances).tolist()
+        to_remove = lod_control.should_remove_array(in_view, self.lods, apparent_sizes, distances).tolist()
+        nodes = self.nodes
+        children = self.children
+        can_merge = self.can_merge
+        distances = distances.tolist()
+        in_view = in_view.tolist()
+        apparent_sizes = apparent_sizes.tolist()
+        #Same traversal as PyQuadTreeNode.check_lod(), the children of a merged node are not visited
+        to_visit = list(reversed(self.roots_index))
+        while to_visit:
+            i = to_visit.pop()
+            node = nodes[i]
+            node.distance = distances[i]
+            node.patch_in_view = in_view[i]
+            node.visible = in_view[i]
+            node.apparent_size = apparent_sizes[i]
+            lod_result.check_max_lod(node)
+            if children[i]:
+                if can_merge[i] and to_merge[i]:
+                    lod_result.add_to_merge(node)
+                else:
+                    to_visit.extend(reversed(children[i]))
+            else:
+                #A leaf has no children bounds, are_children_visibles() is always true
+                if in_view[i] and to_split[i] and (node.lod > 0 or node.instance_ready):
+                    lod_result.add_to_split(node)
+                if node.shown and to_remove[i]:
+                    lod_result.add_to_remove(node)
+                if not node.shown and to_show[i]:
+                    lod_result.add_to_show(node)
 
 class PatchBase(Shape):
     NORTH = 0
@@ -621,6 +764,7 @@ class PatchBase(Shape):
         Shape.__init__(self)
         self.parent = parent
         self.lod = lod
+        self.key = None
         self.density = density
         self.owner = None
         self.quadtree_node = None
@@ -632,6 +776,9 @@ class PatchBase(Shape):
         self.max_level = int(log(density, 2)) #TODO: should be done properly with checks
         self.flat_coord = None
         self.bounds_shape = None
+        #Range of radius of the patch and its children, known once the heightmap is loaded
+        self.min_radius = None
+        self.max_radius = None
         self.children = []
         self.shown = False
         self.last_split = 0
@@ -686,6 +833,17 @@ class PatchBase(Shape):
         for layer in self.layers:
             layer.patch_done(self)
 
+    def create_bounding_volume(self, min_radius, max_radius):
+        return None
+
+    def set_radius_range(self, min_radius, max_radius):
+        self.min_radius = min_radius
+        self.max_radius = max_radius
+        bounds = self.create_bounding_volume(min_radius, max_radius)
+        if bounds is not None:
+            self.quadtree_node.set_bounds(bounds)
+            self.bounds_shape.set_box(bounds)
+
     def create_geometry_instance(self):
         for layer in self.layers:
             layer.create_instance(self)
@@ -741,6 +899,7 @@ class SpherePatch(PatchBase):
         self.face = -1
         self.x = x
         self.y = y
+        self.key = make_patch_key(self.face, self.lod, self.x, self.y)
         r_div = 1 << self.lod
         s_div = 2 << self.lod
         if settings.shift_patch_origin:
@@ -767,9 +926,7 @@ class SpherePatch(PatchBase):
         length = mean_radius * 2 * pi / nb_sectors
         normal = geometry.UVPatchNormal(self.x0, self.y0, self.x1, self.y1)
         if self.lod > 0:
-            bounds = geometry.UVPatchAABB(min_radius, max_radius,
-                                          self.x0, self.y0, self.x1, self.y1,
-                                          offset=self.offset)
+            bounds = self.create_bounding_volume(min_radius, max_radius)
         else:
             bounds = geometry.halfSphereAABB(mean_radius, self.x == 1, self.offset)
         centre =  geometry.UVPatchPoint(mean_radius,
@@ -778,6 +935,14 @@ class SpherePatch(PatchBase):
                                         self.x1, self.y1)
         self.quadtree_node = QuadTreeNode(self, self.lod, self.density, centre, length, normal, self.offset, bounds)
 
+    def create_bounding_volume(self, min_radius, max_radius):
+        if self.lod == 0:
+            #The root patches are using the half sphere box
+            return None
+        return geometry.UVPatchAABB(min_radius, max_radius,
+                                    self.x0, self.y0, self.x1, self.y1,
+                                    offset=self.offset)
+
     def str_id(self):
         return "%d - %d %d" % (self.lod, self.y, self.x)
 
@@ -842,11 +1007,6 @@ class SpherePatchLayer(PatchLayer):
                                          offset=patch.offset)
         self.instance.reparent_to(patch.instance)
 
-    def update_instance(self, patch):
-        if self.instance is not None and patch.shown:
-                self.remove_instance()
-                self.create_instance(patch)
-
 class SquarePatchBase(PatchBase):
 
     RIGHT = 0
@@ -872,6 +1032,7 @@ class SquarePatchBase(PatchBase):
         self.face = face
         self.x = x
         self.y = y
+        self.key = make_patch_key(self.face, self.lod, self.x, self.y)
         div = 1 << self.lod
         self.x0 = float(self.x) / div
         self.y0 = float(self.y) / div
@@ -895,8 +1056,7 @@ class SquarePatchBase(PatchBase):
     def create_quadtree_node(self,min_radius, max_radius, mean_radius):
         nb_sectors = 4 << self.lod
         length = mean_radius * 2 * pi / nb_sectors
-        bounds = self.create_bounding_volume(min_radius, max_radius)
-        bounds.xform(self.rotations_mat[self.face])
+        bounds = self.create_oriented_bounding_volume(min_radius, max_radius)
         centre = self.create_centre(mean_radius)
         centre = self.rotations[self.face].xform(centre)
         source_normal = self.face_normal()
@@ -909,6 +1069,18 @@ class SquarePatchBase(PatchBase):
     def create_bounding_volume(self, x, y, min_radius, max_radius):
         return None
 
+    def create_oriented_bounding_volume(self, min_radius, max_radius):
+        bounds = self.create_bounding_volume(min_radius, max_radius)
+        bounds.xform(self.rotations_mat[self.face])
+        return bounds
+
+    def set_radius_range(self, min_radius, max_radius):
+        self.min_radius = min_radius
+        self.max_radius = max_radius
+        bounds = self.create_oriented_bounding_volume(min_radius, max_radius)
+        self.quadtree_node.set_bounds(bounds)
+        self.bounds_shape.set_box(bounds)
+
     def create_centre(self, x, y):
         return None
 
@@ -988,19 +1160,39 @@ class NormalizedSquarePatch(SquarePatchBase):
 
 class NormalizedSquarePatchLayer(PatchLayer):
     def create_instance(self, patch):
-        self.instance = geometry.NormalizedSquarePatch(1.0,
-                                                       geometry.TesselationInfo(patch.density, patch.tessellation_outer_level),
-                                                       patch.x0, patch.y0, patch.x1, patch.y1,
-                                                       has_offset=patch.offset is not None,
-                                                       offset=patch.offset,
-                                                       use_patch_adaptation=settings.use_patch_adaptation,
-                                                       use_patch_skirts=settings.use_patch_skirts)
+        if patch.owner.shader_vertex_input:
+            self.instance = geometry.SquarePatchTemplate(1.0,
+                                                         geometry.TesselationInfo(patch.density, patch.tessellation_outer_level),
+                                                         patch.x0, patch.y0, patch.x1, patch.y1,
+                                                         has_offset=patch.offset is not None,
+                                                         offset=patch.offset,
+                                                         use_patch_adaptation=settings.use_patch_adaptation,
+                                                         use_patch_skirts=settings.use_patch_skirts)
+        else:
+            self.instance = geometry.NormalizedSquarePatch(1.0,
+                                                           geometry.TesselationInfo(patch.density, patch.tessellation_outer_level),
+                                                           patch.x0, patch.y0, patch.x1, patch.y1,
+                                                           has_offset=patch.offset is not None,
+                                                           offset=patch.offset,
+                                                           use_patch_adaptation=settings.use_patch_adaptation,
+                                                           use_patch_skirts=settings.use_patch_skirts)
         self.instance.reparent_to(patch.instance)
         orientation = patch.rotations[patch.face]
         self.instance.set_quat(LQuaternion(*orientation))
 
     def update_instance(self, patch):
         if self.instance is not None and patch.shown:
+            if patch.owner.shader_vertex_input:
+                geometry.update_patch_template(self.instance,
+                                               geometry.TesselationInfo(patch.density, patch.tessellation_outer_level),
+                                               use_patch_adaptation=settings.use_patch_adaptation,
+                                               use_patch_skirts=settings.use_patch_skirts)
+            elif geometry.update_patch_primitive is not None:
+                geometry.update_patch_primitive(self.instance,
+                                                geometry.TesselationInfo(patch.density, patch.tessellation_outer_level),
+                                                use_patch_adaptation=settings.use_patch_adaptation,
+                                                use_patch_skirts=settings.use_patch_skirts)
+            else:
                 self.remove_instance()
                 self.create_instance(patch)
 
@@ -1046,13 +1238,22 @@ class SquaredDistanceSquarePatch(SquarePatchBase):
 
 class SquaredDistanceSquarePatchLayer(PatchLayer):
     def create_instance(self, patch):
-        self.instance = geometry.SquaredDistanceSquarePatch(1.0,
-                                                            geometry.TesselationInfo(patch.density, patch.tessellation_outer_level),
-                                                            patch.x0, patch.y0, patch.x1, patch.y1,
-                                                            has_offset=patch.offset is not None,
-                                                            offset=patch.offset,
-                                                            use_patch_adaptation=settings.use_patch_adaptation,
-                                                            use_patch_skirts=settings.use_patch_skirts)
+        if patch.owner.shader_vertex_input:
+            self.instance = geometry.SquarePatchTemplate(1.0,
+                                                         geometry.TesselationInfo(patch.density, patch.tessellation_outer_level),
+                                                         patch.x0, patch.y0, patch.x1, patch.y1,
+                                                         has_offset=patch.offset is not None,
+                                                         offset=patch.offset,
+                                                         use_patch_adaptation=settings.use_patch_adaptation,
+                                                         use_patch_skirts=settings.use_patch_skirts)
+        else:
+            self.instance = geometry.SquaredDistanceSquarePatch(1.0,
+                                                                geometry.TesselationInfo(patch.density, patch.tessellation_outer_level),
+                                                                patch.x0, patch.y0, patch.x1, patch.y1,
+                                                                has_offset=patch.offset is not None,
+                                                                offset=patch.offset,
+                                                                use_patch_adaptation=settings.use_patch_adaptation,
+                                                                use_patch_skirts=settings.use_patch_skirts)
 
         self.instance.reparent_to(patch.instance)
         orientation = patch.rotations[patch.face]
@@ -1060,6 +1261,17 @@ class SquaredDistanceSquarePatchLayer(PatchLayer):
 
     def update_instance(self, patch):
         if self.instance is not None and patch.shown:
+            if patch.owner.shader_vertex_input:
+                geometry.update_patch_template(self.instance,
+                                               geometry.TesselationInfo(patch.density, patch.tessellation_outer_level),
+                                               use_patch_adaptation=settings.use_patch_adaptation,
+                                               use_patch_skirts=settings.use_patch_skirts)
+            elif geometry.update_patch_primitive is not None:
+                geometry.update_patch_primitive(self.instance,
+                                                geometry.TesselationInfo(patch.density, patch.tessellation_outer_level),
+                                                use_patch_adaptation=settings.use_patch_adaptation,
+                                                use_patch_skirts=settings.use_patch_skirts)
+            else:
                 self.remove_instance()
                 self.create_instance(patch)
 
@@ -1088,6 +1300,12 @@ class PatchedShapeBase(Shape):
         self.culling_frustum = None
         self.frustum_node = None
         self.frustum_rel_position = None
+        self.lod_view = None
+        #The C++ engine has its own LOD evaluation
+        if QuadTreeNode is PyQuadTreeNode:
+            self.frontier = PyQuadTreeFrontier()
+        else:
+            self.frontier = None
 
     #TODO: Ugly workaround until we get rid of surface in PatchFactory
     def set_owner(self, owner):
@@ -1213,11 +1431,40 @@ class PatchedShapeBase(Shape):
         Shape.remove_instance(self)
 
     def patch_done(self, patch):
+        if QuadTreeNode is PyQuadTreeNode:
+            self.update_patch_bounds(patch)
         for linked_object in self.linked_objects:
             linked_object.patch_done(patch)
         if self.data_store is not None:
             self.data_store.update_patch(patch)
 
+    def update_patch_bounds(self, patch):
+        #The bounds of a patch are created from the height range of its parent, refine them with the heightmap of
+        #the patch itself, the parents must enclose their children so the new range is propagated up the quadtree
+        while patch is not None:
+            radius_range = self.factory.get_patch_radius_range(patch)
+            if radius_range is None:
+                break
+            (min_radius, max_radius) = radius_range
+            for child in patch.children:
+                if child.min_radius is not None:
+                    min_radius = min(min_radius, child.min_radius)
+                    max_radius = max(max_radius, child.max_radius)
+            if min_radius == patch.min_radius and max_radius == patch.max_radius:
+                break
+            patch.set_radius_range(min_radius, max_radius)
+            patch = patch.parent
+
+    def get_patches_min_radius(self):
+        #Return the lowest radius of the loaded heightmap data, or None if not all the root patches are loaded
+        min_radius = None
+        for patch in self.root_patches:
+            if patch.min_radius is None:
+                return None
+            if min_radius is None or patch.min_radius < min_radius:
+                min_radius = patch.min_radius
+        return min_radius
+
     def place_patches(self, owner):
         if self.frustum_node is not None:
             #Position the frustum relative to the body
@@ -1259,6 +1506,11 @@ class PatchedShapeBase(Shape):
         altitude_to_ground = (self.owner.distance_to_obs - self.owner._height_under) / self.parent.height_scale
         self.create_culling_frustum(self.owner.context.observer)
         self.create_frustum_node()
+        lod_view = (LPoint3d(model_camera_pos), LMatrix4(self.owner.context.observer.cam.getNetTransform().getMat()), pixel_size)
+        if lod_view != self.lod_view:
+            #The distance and visibility of the patches will change, so will the order of the pending patches
+            self.lod_view = lod_view
+            patchLoadScheduler.invalidate_priorities()
         self.to_split = []
         self.to_merge = []
         self.to_show = []
@@ -1271,8 +1523,12 @@ class PatchedShapeBase(Shape):
         else:
             self.lod_control.set_texture_size(0)
         lod_result = LodResult()
-        for patch in self.root_patches:
-            patch.quadtree_node.check_lod(lod_result, self.culling_frustum, LPoint2d(*coord), LPoint3d(model_camera_pos), LVector3d(model_camera_vector), altitude_to_ground, pixel_size, self.lod_control)
+        if self.frontier is not None:
+            self.frontier.update([patch.quadtree_node for patch in self.root_patches])
+            self.frontier.check_lod(lod_result, self.culling_frustum, model_camera_pos, altitude_to_ground, pixel_size, self.lod_control)
+        else:
+            for patch in self.root_patches:
+                patch.quadtree_node.check_lod(lod_result, self.culling_frustum, LPoint2d(*coord), LPoint3d(model_camera_pos), LVector3d(model_camera_vector), altitude_to_ground, pixel_size, self.lod_control)
         lod_result.sort_by_distance()
         apply_appearance = False
         update = []
@@ -1419,7 +1675,10 @@ class EllipsoidPatchedShape(PatchedShapeBase):
 
     def create_culling_frustum(self, camera):
         min_radius = self.owner.surface.get_min_radius() / self.parent.height_scale
-        altitude_to_min_radius = (self.owner.distance_to_obs - self.parent.height_scale) / self.parent.height_scale
+        patches_min_radius = self.get_patches_min_radius()
+        if patches_min_radius is not None:
+            min_radius = max(min_radius, patches_min_radius)
+        altitude_to_min_radius = self.owner.distance_to_obs / self.parent.height_scale - min_radius
         cam_transform_mat = camera.cam.getNetTransform().getMat()
         if False:
             upper = LMatrix3()
@@ -1622,6 +1881,11 @@ class NormalizedSquarePatchFactory(PatchFactory):
         return patch
 
 class NormalizedSquareShape(PatchedSquareShapeBase):
+    def get_vertex_input(self):
+        if settings.shader_cube_projection:
+            return NormalizedCubePatchVertexInput()
+        return None
+
     def xyz_to_xy(self, x, y, z):
         vx = x / z
         vy = y / z
@@ -1644,6 +1908,11 @@ class SquaredDistanceSquarePatchFactory(PatchFactory):
         return patch
 
 class SquaredDistanceSquareShape(PatchedSquareShapeBase):
+    def get_vertex_input(self):
+        if settings.shader_cube_projection:
+            return SquaredDistanceCubePatchVertexInput()
+        return None
+
     def xyz_to_xy(self, x, y, z):
         x2 = x * x * 2.0
         y2 = y * y * 2.0
@@ -1725,6 +1994,20 @@ class PyLodControl(object):
         #TODO: Temporary fix for patched shape shadows, keep lod 0 patch visible
         return (not patch.visible and patch.lod != 0)
 
+    #Vectorized versions of the predicates above, used by PyQuadTreeFrontier
+
+    def should_split_array(self, lods, densities, apparent_patch_sizes, distances):
+        return numpy.zeros(len(lods), dtype=bool)
+
+    def should_merge_array(self, lods, densities, apparent_patch_sizes, distances):
+        return numpy.zeros(len(lods), dtype=bool)
+
+    def should_instanciate_array(self, visible, lods, leaves, apparent_patch_sizes, distances):
+        return (visible | (lods == 0)) & leaves
+
+    def should_remove_array(self, visible, lods, apparent_patch_sizes, distances):
+        return ~visible & (lods != 0)
+
 #The lod control classes uses hysteresis to avoid cycle of split/merge due to
 #precision errors.
 #When splitting the resulting patch will be 1.1 bigger than the merge limit
@@ -1756,6 +2039,14 @@ class PyTextureLodControl(PyLodControl):
     def should_merge(self, patch, apparent_patch_size, distance):
         return apparent_patch_size < self.texture_size / 1.1
 
+    def should_split_array(self, lods, densities, apparent_patch_sizes, distances):
+        if self.texture_size <= 0:
+            return numpy.zeros(len(lods), dtype=bool)
+        return (lods < self.max_lod) & (apparent_patch_sizes > self.texture_size * 1.1)
+
+    def should_merge_array(self, lods, densities, apparent_patch_sizes, distances):
+        return apparent_patch_sizes < self.texture_size / 1.1
+
 class PyTextureOrVertexSizeLodControl(PyTextureLodControl):
     def __init__(self, max_vertex_size, min_density, density, max_lod=100):
         PyTextureLodControl.__init__(self, min_density, density, max_lod)
@@ -1778,6 +2069,19 @@ class PyTextureOrVertexSizeLodControl(PyTextureLodControl):
             apparent_vertex_size = apparent_patch_size / patch.density
             return apparent_vertex_size < self.max_vertex_size / 1.1
 
+    def should_split_array(self, lods, densities, apparent_patch_sizes, distances):
+        if self.texture_size > 0:
+            to_split = apparent_patch_sizes > self.texture_size * 1.1
+        else:
+            to_split = apparent_patch_sizes / densities > self.max_vertex_size
+        return (lods < self.max_lod) & to_split
+
+    def should_merge_array(self, lods, densities, apparent_patch_sizes, distances):
+        if self.texture_size > 0:
+            return apparent_patch_sizes < self.texture_size / 1.1
+        else:
+            return apparent_patch_sizes / densities < self.max_vertex_size / 1.1
+
 class PyVertexSizeLodControl(PyLodControl):
     def __init__(self, max_vertex_size, density, max_lod=100):
         PyLodControl.__init__(self, density, max_lod)
@@ -1794,6 +2098,12 @@ class PyVertexSizeLodControl(PyLodControl):
         to_merge = apparent_vertex_size < self.max_vertex_size / 1.1
         return to_merge
 
+    def should_split_array(self, lods, densities, apparent_patch_sizes, distances):
+        return (lods < self.max_lod) & (apparent_patch_sizes / densities > self.max_vertex_size * 1.1)
+
+    def should_merge_array(self, lods, densities, apparent_patch_sizes, distances):
+        return apparent_patch_sizes / densities < self.max_vertex_size / 1.1
+
 class PyVertexSizeMaxDistanceLodControl(PyVertexSizeLodControl):
     def __init__(self, max_distance, max_vertex_size, density, max_lod=100):
         PyVertexSizeLodControl.__init__(self, max_vertex_size, density, max_lod)
@@ -1805,6 +2115,12 @@ class PyVertexSizeMaxDistanceLodControl(PyVertexSizeLodControl):
     def should_remove(self, patch, apparent_patch_size, distance):
         return not patch.visible
 
+    def should_instanciate_array(self, visible, lods, leaves, apparent_patch_sizes, distances):
+        return visible & (distances < self.max_distance)
+
+    def should_remove_array(self, visible, lods, apparent_patch_sizes, distances):
+        return ~visible
+
 try:
     from cosmonium_engine import QuadTreeNode
     from cosmonium_engine import CullingFrustumBase, CullingFrustum, HorizonCullingFrustum
@@ -0,0 +1,67 @@
+#
+#This file is part of Cosmonium.
+#
+#Copyright (C) 2018-2019 Laurent Deru.
+#
+#Cosmonium is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+#
+#Cosmonium is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License
+#along with Cosmonium.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+from __future__ import print_function
+from __future__ import absolute_import
+
+#A patch key packs the position of the patch in the Morton order, its LOD and its face into one integer:
+#  key = morton << 9 | lod << 3 | (face + 1)
+#The two lowest bits of the Morton code are the position of the patch in its parent, the key of the parent
+#and of the children of a patch can thus be derived directly from its key.
+
+lod_shift = 3
+lod_mask = 0x3f
+morton_shift = 9
+face_mask = 0x7
+
+def spread_bits(value):
+    value &= 0xffffffff
+    value = (value | (value << 16)) & 0x0000ffff0000ffff
+    value = (value | (value << 8)) & 0x00ff00ff00ff00ff
+    value = (value | (value << 4)) & 0x0f0f0f0f0f0f0f0f
+    value = (value | (value << 2)) & 0x3333333333333333
+    value = (value | (value << 1)) & 0x5555555555555555
+    return value
+
+def morton_encode(x, y):
+    return spread_bits(x) | (spread_bits(y) << 1)
+
+def zigzag(value):
+    return (value << 1) if value >= 0 else (((-value) << 1) - 1)
+
+def make_patch_key(face, lod, x, y):
+    #The coordinates of the root patches can be negative or larger than 1 (see Tile or SpherePatch),
+    #they are encoded above the bits of the position inside the root patch
+    mask = (1 << lod) - 1
+    root = morton_encode(zigzag(x >> lod), zigzag(y >> lod))
+    morton = (root << (2 * lod)) | morton_encode(x & mask, y & mask)
+    return (morton << morton_shift) | (lod << lod_shift) | (face + 1)
+
+def patch_key_lod(key):
+    return (key >> lod_shift) & lod_mask
+
+def parent_patch_key(key):
+    lod = (key >> lod_shift) & lod_mask
+    if lod == 0:
+        return None
+    return ((key >> (morton_shift + 2)) << morton_shift) | ((lod - 1) << lod_shift) | (key & face_mask)
+
+def child_patch_key(key, index):
+    lod = (key >> lod_shift) & lod_mask
+    return ((((key >> morton_shift) << 2) | index) << morton_shift) | ((lod + 1) << lod_shift) | (key & face_mask)
@@ -0,0 +1,124 @@
+#
+#This file is part of Cosmonium.
+#
+#Copyright (C) 2018-2019 Laurent Deru.
+#
+#Cosmonium is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+#
+#Cosmonium is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License
+#along with Cosmonium.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+from __future__ import print_function
+from __future__ import absolute_import
+
+from . import settings
+
+from heapq import heappush, heappop, heapify
+from itertools import count
+
+class PatchLoadScheduler(object):
+    def __init__(self):
+        self.pending = {}
+        self.running = {}
+        self.heap = []
+        self.sequence = count()
+        self.priorities_valid = True
+        self.task = None
+        self.queued = 0
+        self.started = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.rebuilds = 0
+        self.total_wait = 0.0
+        self.total_latency = 0.0
+
+    def is_scheduled(self, patch):
+        return patch in self.pending or patch in self.running
+
+    def schedule(self, owner, patch):
+        if self.is_scheduled(patch): return
+        self.pending[patch] = (owner, globalClock.getRealTime())
+        self.queued += 1
+        if self.priorities_valid:
+            heappush(self.heap, (self.get_priority(patch), next(self.sequence), patch))
+        if self.task is None:
+            self.task = taskMgr.add(self.process, 'patch-load-scheduler', sort=-1000)
+
+    def invalidate_priorities(self):
+        #Called when the view used by the LOD changed, the queue is ordered again before the next jobs are started
+        self.priorities_valid = False
+
+    def get_priority(self, patch):
+        #Patches in view first, then the coarsest and the nearest
+        #Both the Python and the C++ quadtree nodes publish the visibility and distance of the last LOD check
+        node = patch.quadtree_node
+        if node is None:
+            return (False, patch.lod, 0.0)
+        return (not node.patch_in_view, patch.lod, node.distance)
+
+    def rebuild_heap(self):
+        #The patches removed while waiting are dropped, their running jobs are cancelled in remove_instance()
+        for patch in [patch for patch in self.pending if patch.instance is None]:
+            del self.pending[patch]
+            self.cancelled += 1
+        self.heap = [(self.get_priority(patch), next(self.sequence), patch) for patch in self.pending]
+        heapify(self.heap)
+        self.priorities_valid = True
+        self.rebuilds += 1
+
+    def process(self, task):
+        free_slots = settings.max_patch_jobs - len(self.running)
+        if free_slots <= 0 or len(self.pending) == 0:
+            return task.cont
+        if not self.priorities_valid:
+            self.rebuild_heap()
+        now = globalClock.getRealTime()
+        while free_slots > 0 and len(self.heap) > 0:
+            patch = heappop(self.heap)[2]
+            entry = self.pending.pop(patch, None)
+            if entry is None:
+                #Stale entry of a patch already started or dropped
+                continue
+            if patch.instance is None:
+                self.cancelled += 1
+                continue
+            (owner, request_time) = entry
+            self.running[patch] = request_time
+            self.total_wait += now - request_time
+            self.started += 1
+            free_slots -= 1
+            patch.task = taskMgr.add(owner.patch_task(patch), uponDeath=lambda task, patch=patch: self.job_done(patch, task))
+        return task.cont
+
+    def job_done(self, patch, task):
+        patch.task_done(task)
+        request_time = self.running.pop(patch, None)
+        if request_time is None: return
+        if patch.instance is None:
+            self.cancelled += 1
+        else:
+            self.completed += 1
+            self.total_latency += globalClock.getRealTime() - request_time
+
+    def get_stats(self):
+        return {'queue_depth': len(self.pending),
+                'in_flight': len(self.running),
+                'queued': self.queued,
+                'started': self.started,
+                'completed': self.completed,
+                'cancelled': self.cancelled,
+                'rebuilds': self.rebuilds,
+                'mean_wait': self.total_wait / self.started if self.started > 0 else 0.0,
+                'mean_latency': self.total_latency / self.completed if self.completed > 0 else 0.0,
+                }
+
+patchLoadScheduler = PatchLoadScheduler()
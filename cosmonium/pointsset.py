@@ -20,7 +20,7 @@
 from __future__ import print_function
 from __future__ import absolute_import
 
-from panda3d.core import GeomVertexArrayFormat, InternalName, GeomVertexFormat, GeomVertexData, GeomVertexWriter
+from panda3d.core import GeomVertexArrayFormat, InternalName, GeomVertexFormat, GeomVertexData
 from panda3d.core import GeomPoints, Geom, GeomNode
 from panda3d.core import NodePath, OmniBoundingVolume, DrawMask
 from .foundation import VisibleObject
@@ -28,6 +28,8 @@ from .appearances import ModelAppearance
 from .shaders import BasicShader, FlatLightingModel, StaticSizePointControl
 from .sprites import SimplePoint, RoundDiskPointSprite
 
+import numpy
+
 class PointsSet(VisibleObject):
     tex = None
     def __init__(self, use_sprites=True, use_sizes=True, points_size=2, sprite=None, background=None, shader=None):
@@ -43,7 +45,8 @@ class PointsSet(VisibleObject):
 
         self.reset()
 
-        self.geom = self.makeGeom([], [], [], [])
+        self.capacity = 0
+        self.geom = self.makeGeom()
         self.gnode.addGeom(self.geom)
         self.instance = NodePath(self.gnode)
         if self.use_sprites:
@@ -75,6 +78,7 @@ class PointsSet(VisibleObject):
         self.colors = []
         self.sizes = []
         self.oids = []
+        self.arrays = []
 
     def add_point(self, position, color, size, oid):
         self.points.append(position)
@@ -82,10 +86,25 @@ class PointsSet(VisibleObject):
         self.sizes.append(size)
         self.oids.append(oid)
 
+    def add_points(self, positions, colors, sizes, oids):
+        self.arrays.append((positions, colors, sizes, oids))
+
     def update(self):
-        self.update_arrays(self.points, self.colors, self.sizes, self.oids)
+        arrays = self.arrays
+        if len(self.points) > 0:
+            arrays = [(self.points, self.colors, self.sizes, self.oids)] + arrays
+        if len(arrays) == 1:
+            (points, colors, sizes, oids) = arrays[0]
+        elif len(arrays) > 1:
+            points = numpy.concatenate([numpy.asarray(array[0], dtype=numpy.float32) for array in arrays])
+            colors = numpy.concatenate([numpy.asarray(array[1], dtype=numpy.float32) for array in arrays])
+            sizes = numpy.concatenate([numpy.asarray(array[2], dtype=numpy.float32) for array in arrays])
+            oids = numpy.concatenate([numpy.asarray(array[3], dtype=numpy.float32) for array in arrays])
+        else:
+            points = colors = sizes = oids = []
+        self.update_arrays(points, colors, sizes, oids)
 
-    def makeGeom(self, points, colors, sizes, oids):
+    def makeGeom(self):
         array = GeomVertexArrayFormat()
         array.addColumn(InternalName.get_vertex(), 3, Geom.NTFloat32, Geom.CPoint)
         array.addColumn(InternalName.get_color(), 4, Geom.NTFloat32, Geom.CColor)
@@ -97,33 +116,37 @@ class PointsSet(VisibleObject):
         format = GeomVertexFormat()
         format.addArray(array)
         format = GeomVertexFormat.registerFormat(format)
-        vdata = GeomVertexData('vdata', format, Geom.UH_static)
-        vdata.unclean_set_num_rows(len(points))
-        self.vwriter = GeomVertexWriter(vdata, InternalName.get_vertex())
-        self.colorwriter = GeomVertexWriter(vdata, InternalName.get_color())
+        #Offsets of the columns in the rows, in number of floats
+        array = format.get_array(0)
+        self.nb_columns = array.get_stride() // 4
+        self.vertex_offset = array.get_column(InternalName.get_vertex()).get_start() // 4
+        self.color_offset = array.get_column(InternalName.get_color()).get_start() // 4
         if self.use_sizes:
-            self.sizewriter = GeomVertexWriter(vdata, InternalName.get_size())
+            self.size_offset = array.get_column(InternalName.get_size()).get_start() // 4
         if self.use_oids:
-            self.oidwriter = GeomVertexWriter(vdata, oids_column_name)
-        geompoints = GeomPoints(Geom.UH_static)
-        geompoints.reserve_num_vertices(len(points))
-        index = 0
-        for (point, color, size, oid) in zip(points, colors, sizes, oids):
-            self.vwriter.addData3f(*point)
-            #self.colorwriter.addData3f(color[0], color[1], color[2])
-            self.colorwriter.addData4(color)
-            if self.use_sizes:
-                self.sizewriter.addData1f(size)
-            if self.use_oids:
-                self.oidwriter.addData4(oid)
-            geompoints.addVertex(index)
-            geompoints.closePrimitive()
-            index += 1
+            self.oid_offset = array.get_column(oids_column_name).get_start() // 4
+        vdata = GeomVertexData('vdata', format, Geom.UH_dynamic)
+        geompoints = GeomPoints(Geom.UH_dynamic)
         geom = Geom(vdata)
         geom.addPrimitive(geompoints)
         return geom
 
     def update_arrays(self, points, colors, sizes, oids):
-        self.gnode.removeAllGeoms()
-        self.geom = self.makeGeom(points, colors, sizes, oids)
-        self.gnode.addGeom(self.geom)
+        nb_points = len(points)
+        vdata = self.geom.modify_vertex_data()
+        if nb_points > self.capacity:
+            #Grow the buffer geometrically to avoid reallocating it each time a few points are added
+            self.capacity = max(nb_points, self.capacity * 2, 1024)
+            vdata.unclean_set_num_rows(self.capacity)
+        if nb_points > 0:
+            data = numpy.asarray(memoryview(vdata.modify_array(0))).view(numpy.float32).reshape(self.capacity, self.nb_columns)
+            data[:nb_points, self.vertex_offset:self.vertex_offset + 3] = points
+            data[:nb_points, self.color_offset:self.color_offset + 4] = colors
+            if self.use_sizes:
+                data[:nb_points, self.size_offset] = sizes
+            if self.use_oids:
+                data[:nb_points, self.oid_offset:self.oid_offset + 4] = oids
+        geompoints = self.geom.modify_primitive(0)
+        geompoints.clear_vertices()
+        if nb_points > 0:
+            geompoints.add_consecutive_vertices(0, nb_points)
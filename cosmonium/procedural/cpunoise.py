@@ -0,0 +1,486 @@
+#
+#This file is part of Cosmonium.
+#
+#Copyright (C) 2018-2019 Laurent Deru.
+#
+#Cosmonium is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+#
+#Cosmonium is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License
+#along with Cosmonium.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+from __future__ import print_function
+from __future__ import absolute_import
+
+from .shadernoise import NoiseConst, NoiseCoord, PositionMap, NoiseMap
+from .shadernoise import NoiseAdd, NoiseSub, NoiseMul, NoisePow, NoiseExp, NoiseThreshold
+from .shadernoise import NoiseClamp, NoiseMin, NoiseMax, NegNoise, AbsNoise, SquareNoise, CubeNoise
+from .shadernoise import RidgedNoise, FbmNoise, SpiralNoise, NoiseWarp, Noise1D, NoiseRotate
+from .shadernoise import GpuNoiseLibPerlin3D, GpuNoiseLibCellular3D
+from .shadernoise import SteGuPerlin3D, SteGuCellular3D, SteGuCellularDiff3D
+from .shadernoise import QuilezPerlin3D, QuilezGradientNoise3D, SinCosNoise
+from .shadernoise import get_rot_for_face
+from ..textures import TexCoord
+
+from math import ceil
+import numpy
+
+#The functions below are ports of the GLSL noise libraries used by the shaders.
+#The points are given as a (3, N) array and all the computations are done in single precision, like on the GPU.
+
+def fract(x):
+    return x - numpy.floor(x)
+
+def mod289(x):
+    return x - numpy.floor(x * (1.0 / 289.0)) * 289.0
+
+def mod7(x):
+    return x - numpy.floor(x * (1.0 / 7.0)) * 7.0
+
+def permute(x):
+    return mod289((34.0 * x + 1.0) * x)
+
+def interpolation_c2(x):
+    return x * x * x * (x * (x * 6.0 - 15.0) + 10.0)
+
+def gnl_fast32_hash_3d(gridcell):
+    #Generates 3 random numbers for each of the 8 cell corners, the corners are ordered like the GLSL xyzw components
+    offset = numpy.array([50.0, 161.0, 50.0, 161.0], dtype=numpy.float32)[:, numpy.newaxis]
+    domain = numpy.float32(69.0)
+    somelargefloats = numpy.array([635.298681, 682.357502, 668.926525], dtype=numpy.float32)[:, numpy.newaxis]
+    zinc = numpy.array([48.500388, 65.294118, 63.934599], dtype=numpy.float32)[:, numpy.newaxis]
+    gridcell = gridcell - numpy.floor(gridcell * (1.0 / domain)) * domain
+    gridcell_inc1 = (gridcell <= domain - 1.5) * (gridcell + 1.0)
+    p = numpy.stack([gridcell[0], gridcell[1], gridcell_inc1[0], gridcell_inc1[1]]) + offset
+    p *= p
+    p = numpy.stack([p[0] * p[1], p[2] * p[1], p[0] * p[3], p[2] * p[3]])
+    lowz_mod = 1.0 / (somelargefloats + gridcell[2] * zinc)
+    highz_mod = 1.0 / (somelargefloats + gridcell_inc1[2] * zinc)
+    lowz_hash = fract(p[numpy.newaxis] * lowz_mod[:, numpy.newaxis])
+    highz_hash = fract(p[numpy.newaxis] * highz_mod[:, numpy.newaxis])
+    return (lowz_hash, highz_hash)
+
+def gnl_perlin3d(point):
+    pi = numpy.floor(point)
+    pf = point - pi
+    pf_min1 = pf - 1.0
+    (lowz_hash, highz_hash) = gnl_fast32_hash_3d(pi)
+    (grad_x0, grad_y0, grad_z0) = lowz_hash - 0.49999
+    (grad_x1, grad_y1, grad_z1) = highz_hash - 0.49999
+    xs = numpy.stack([pf[0], pf_min1[0], pf[0], pf_min1[0]])
+    ys = numpy.stack([pf[1], pf[1], pf_min1[1], pf_min1[1]])
+    grad_results_0 = (xs * grad_x0 + ys * grad_y0 + pf[2] * grad_z0) / numpy.sqrt(grad_x0 * grad_x0 + grad_y0 * grad_y0 + grad_z0 * grad_z0)
+    grad_results_1 = (xs * grad_x1 + ys * grad_y1 + pf_min1[2] * grad_z1) / numpy.sqrt(grad_x1 * grad_x1 + grad_y1 * grad_y1 + grad_z1 * grad_z1)
+    blend = interpolation_c2(pf)
+    res0 = grad_results_0 + (grad_results_1 - grad_results_0) * blend[2]
+    blend_x = numpy.stack([1.0 - blend[0], blend[0], 1.0 - blend[0], blend[0]])
+    blend_y = numpy.stack([1.0 - blend[1], 1.0 - blend[1], blend[1], blend[1]])
+    return (res0 * blend_x * blend_y).sum(axis=0) * 1.1547005383792515290182975610039
+
+def gnl_cellular_weight_samples(samples):
+    samples = samples * 2.0 - 1.0
+    return samples * samples * samples - numpy.sign(samples)
+
+def gnl_cellular3d(point):
+    pi = numpy.floor(point)
+    pf = point - pi
+    (lowz_hash, highz_hash) = gnl_fast32_hash_3d(pi)
+    jitter_window = 0.166666666
+    corner_x = numpy.array([0.0, 1.0, 0.0, 1.0], dtype=numpy.float32)[:, numpy.newaxis]
+    corner_y = numpy.array([0.0, 0.0, 1.0, 1.0], dtype=numpy.float32)[:, numpy.newaxis]
+    hash_x0 = gnl_cellular_weight_samples(lowz_hash[0]) * jitter_window + corner_x
+    hash_y0 = gnl_cellular_weight_samples(lowz_hash[1]) * jitter_window + corner_y
+    hash_z0 = gnl_cellular_weight_samples(lowz_hash[2]) * jitter_window
+    hash_x1 = gnl_cellular_weight_samples(highz_hash[0]) * jitter_window + corner_x
+    hash_y1 = gnl_cellular_weight_samples(highz_hash[1]) * jitter_window + corner_y
+    hash_z1 = gnl_cellular_weight_samples(highz_hash[2]) * jitter_window + 1.0
+    d1 = (pf[0] - hash_x0) ** 2 + (pf[1] - hash_y0) ** 2 + (pf[2] - hash_z0) ** 2
+    d2 = (pf[0] - hash_x1) ** 2 + (pf[1] - hash_y1) ** 2 + (pf[2] - hash_z1) ** 2
+    return numpy.minimum(d1, d2).min(axis=0) * (9.0 / 12.0)
+
+def stegu_snoise(v):
+    i = numpy.floor(v + v.sum(axis=0) * (1.0 / 3.0))
+    x0 = v - i + i.sum(axis=0) * (1.0 / 6.0)
+    g = (x0 >= x0[[1, 2, 0]]).astype(numpy.float32)
+    l = 1.0 - g
+    i1 = numpy.minimum(g, l[[2, 0, 1]])
+    i2 = numpy.maximum(g, l[[2, 0, 1]])
+    x1 = x0 - i1 + 1.0 / 6.0
+    x2 = x0 - i2 + 1.0 / 3.0
+    x3 = x0 - 0.5
+    i = mod289(i)
+    #Offsets of the 4 corners of the simplex for each axis
+    one = numpy.ones_like(i[0])
+    corners = numpy.stack([numpy.zeros_like(i), i1, i2, numpy.stack([one, one, one])], axis=1)
+    p = permute(permute(permute(i[2] + corners[2]) + i[1] + corners[1]) + i[0] + corners[0])
+    n_ = 0.142857142857
+    ns = (n_ * 2.0, n_ * 0.5 - 1.0, n_)
+    j = p - 49.0 * numpy.floor(p * ns[2] * ns[2])
+    x_ = numpy.floor(j * ns[2])
+    y_ = numpy.floor(j - 7.0 * x_)
+    x = x_ * ns[0] + ns[1]
+    y = y_ * ns[0] + ns[1]
+    h = 1.0 - numpy.abs(x) - numpy.abs(y)
+    sh = -(h <= 0.0).astype(numpy.float32)
+    grad_x = x + (numpy.floor(x) * 2.0 + 1.0) * sh
+    grad_y = y + (numpy.floor(y) * 2.0 + 1.0) * sh
+    grad_z = h
+    norm = 1.79284291400159 - 0.85373472095314 * (grad_x * grad_x + grad_y * grad_y + grad_z * grad_z)
+    xs = numpy.stack([x0, x1, x2, x3], axis=1)
+    m = numpy.maximum(0.6 - (xs * xs).sum(axis=0), 0.0)
+    m = m * m
+    dots = (grad_x * xs[0] + grad_y * xs[1] + grad_z * xs[2]) * norm
+    return 42.0 * (m * m * dots).sum(axis=0)
+
+def stegu_cell_offsets(p, k, ko, k2, kz, kzo):
+    ox = fract(p * k) - ko
+    oy = mod7(numpy.floor(p * k)) * k - ko
+    oz = numpy.floor(p * k2) * kz - kzo
+    return (ox, oy, oz)
+
+def stegu_cellular(point):
+    k = 0.142857142857
+    ko = 0.428571428571
+    k2 = 0.020408163265306
+    kz = 0.166666666667
+    kzo = 0.416666666667
+    jitter = 1.0
+    pi = mod289(numpy.floor(point))
+    pf = fract(point) - 0.5
+    shift = numpy.array([1.0, 0.0, -1.0], dtype=numpy.float32)[:, numpy.newaxis]
+    pfx = pf[0] + shift
+    pfy = pf[1] + shift
+    pfz = pf[2] + shift
+    p = permute(pi[0] - shift)
+    d = {}
+    for (iy, ty) in enumerate((-1.0, 0.0, 1.0)):
+        py = permute(p + pi[1] + ty)
+        for (iz, tz) in enumerate((-1.0, 0.0, 1.0)):
+            pyz = permute(py + pi[2] + tz)
+            (ox, oy, oz) = stegu_cell_offsets(pyz, k, ko, k2, kz, kzo)
+            dx = pfx + jitter * ox
+            dy = pfy[iy] + jitter * oy
+            dz = pfz[iz] + jitter * oz
+            d[(iy + 1, iz + 1)] = dx * dx + dy * dy + dz * dz
+    #Sorting network of the GLSL code, replicated to get the same F2
+    (d11, d12, d13) = (d[(1, 1)], d[(1, 2)], d[(1, 3)])
+    (d21, d22, d23) = (d[(2, 1)], d[(2, 2)], d[(2, 3)])
+    (d31, d32, d33) = (d[(3, 1)], d[(3, 2)], d[(3, 3)])
+    d1a = numpy.minimum(d11, d12)
+    d12 = numpy.maximum(d11, d12)
+    d11 = numpy.minimum(d1a, d13)
+    d13 = numpy.maximum(d1a, d13)
+    d12 = numpy.minimum(d12, d13)
+    d2a = numpy.minimum(d21, d22)
+    d22 = numpy.maximum(d21, d22)
+    d21 = numpy.minimum(d2a, d23)
+    d23 = numpy.maximum(d2a, d23)
+    d22 = numpy.minimum(d22, d23)
+    d3a = numpy.minimum(d31, d32)
+    d32 = numpy.maximum(d31, d32)
+    d31 = numpy.minimum(d3a, d33)
+    d33 = numpy.maximum(d3a, d33)
+    d32 = numpy.minimum(d32, d33)
+    da = numpy.minimum(d11, d21)
+    d21 = numpy.maximum(d11, d21)
+    d11 = numpy.minimum(da, d31)
+    d31 = numpy.maximum(da, d31)
+    d11 = d11.copy()
+    swap = d11[0] >= d11[1]
+    d11[0], d11[1] = numpy.where(swap, d11[1], d11[0]), numpy.where(swap, d11[0], d11[1])
+    swap = d11[0] >= d11[2]
+    d11[0], d11[2] = numpy.where(swap, d11[2], d11[0]), numpy.where(swap, d11[0], d11[2])
+    d12 = numpy.minimum(d12, d21)
+    d12 = numpy.minimum(d12, d22)
+    d12 = numpy.minimum(d12, d31)
+    d12 = numpy.minimum(d12, d32)
+    d11[1:3] = numpy.minimum(d11[1:3], d12[0:2])
+    d11[1] = numpy.minimum(d11[1], d12[2])
+    d11[1] = numpy.minimum(d11[1], d11[2])
+    return numpy.sqrt(d11[0:2])
+
+def stegu_cellular2x2x2(point):
+    k = 0.142857142857
+    ko = 0.428571428571
+    k2 = 0.020408163265306
+    kz = 0.166666666667
+    kzo = 0.416666666667
+    jitter = 0.8
+    pi = mod289(numpy.floor(point))
+    pf = fract(point)
+    corner_x = numpy.array([0.0, 1.0, 0.0, 1.0], dtype=numpy.float32)[:, numpy.newaxis]
+    corner_y = numpy.array([0.0, 0.0, 1.0, 1.0], dtype=numpy.float32)[:, numpy.newaxis]
+    pfx = pf[0] - corner_x
+    pfy = pf[1] - corner_y
+    p = permute(pi[0] + corner_x)
+    p = permute(p + pi[1] + corner_y)
+    p1 = permute(p + pi[2])
+    p2 = permute(p + pi[2] + 1.0)
+    (ox1, oy1, oz1) = stegu_cell_offsets(p1, k, ko, k2, kz, kzo)
+    (ox2, oy2, oz2) = stegu_cell_offsets(p2, k, ko, k2, kz, kzo)
+    dx1 = pfx + jitter * ox1
+    dy1 = pfy + jitter * oy1
+    dz1 = pf[2] + jitter * oz1
+    dx2 = pfx + jitter * ox2
+    dy2 = pfy + jitter * oy2
+    dz2 = pf[2] - 1.0 + jitter * oz2
+    d1 = dx1 * dx1 + dy1 * dy1 + dz1 * dz1
+    d2 = dx2 * dx2 + dy2 * dy2 + dz2 * dz2
+    #Sorting network of the GLSL code, replicated to get the same F2
+    d = numpy.minimum(d1, d2)
+    d2 = numpy.maximum(d1, d2)
+    for i in (1, 2, 3):
+        swap = d[0] >= d[i]
+        d[0], d[i] = numpy.where(swap, d[i], d[0]), numpy.where(swap, d[0], d[i])
+    d[1:4] = numpy.minimum(d[1:4], d2[1:4])
+    d[1] = numpy.minimum(d[1], d[2])
+    d[1] = numpy.minimum(d[1], d[3])
+    d[1] = numpy.minimum(d[1], d2[0])
+    return numpy.sqrt(d[0:2])
+
+def quilez_hash(p):
+    h = numpy.stack([p[0] * 127.1 + p[1] * 311.7 + p[2] * 74.7,
+                     p[0] * 269.5 + p[1] * 183.3 + p[2] * 246.1,
+                     p[0] * 113.5 + p[1] * 271.9 + p[2] * 124.6])
+    return -1.0 + 2.0 * fract(numpy.sin(h) * 43758.5453123)
+
+def quilez_corners(point):
+    i = numpy.floor(point)
+    f = point - i
+    values = []
+    for corner in ((0, 0, 0), (1, 0, 0), (0, 1, 0), (1, 1, 0), (0, 0, 1), (1, 0, 1), (0, 1, 1), (1, 1, 1)):
+        offset = numpy.array(corner, dtype=numpy.float32)[:, numpy.newaxis]
+        values.append((quilez_hash(i + offset) * (f - offset)).sum(axis=0))
+    return (f, values)
+
+def quilez_perlin3d(point):
+    (w, (va, vb, vc, vd, ve, vf, vg, vh)) = quilez_corners(point)
+    u = w * w * w * (w * (w * 6.0 - 15.0) + 10.0)
+    return va + \
+           u[0] * (vb - va) + \
+           u[1] * (vc - va) + \
+           u[2] * (ve - va) + \
+           u[0] * u[1] * (va - vb - vc + vd) + \
+           u[1] * u[2] * (va - vc - ve + vg) + \
+           u[2] * u[0] * (va - vb - ve + vf) + \
+           u[0] * u[1] * u[2] * (-va + vb + vc - vd + ve - vf - vg + vh)
+
+def quilez_gradient3d(point):
+    (f, (va, vb, vc, vd, ve, vf, vg, vh)) = quilez_corners(point)
+    u = f * f * (3.0 - 2.0 * f)
+    def mix(a, b, t):
+        return a + (b - a) * t
+    return mix(mix(mix(va, vb, u[0]), mix(vc, vd, u[0]), u[1]),
+               mix(mix(ve, vf, u[0]), mix(vg, vh, u[0]), u[1]), u[2])
+
+class NoiseEvaluator(object):
+    evaluators = {}
+
+    @classmethod
+    def register_evaluator(cls, noise_class, evaluator):
+        cls.evaluators[noise_class] = evaluator
+
+    @classmethod
+    def evaluate(cls, noise, points):
+        evaluator = cls.evaluators.get(noise.__class__)
+        if evaluator is None:
+            raise NotImplementedError("Noise function %s is not supported on CPU" % noise.__class__.__name__)
+        return evaluator(noise, points)
+
+    @classmethod
+    def check(cls, noise):
+        #Evaluate the noise on one point to report the unsupported functions before the generation starts
+        cls.evaluate(noise, numpy.zeros((3, 1), dtype=numpy.float32))
+
+    @classmethod
+    def calc_points(cls, coord, face, width, height, offset, scale, global_coord_scale=1.0, global_coord_offset=(0, 0, 0)):
+        #Position of the center of the texels, using the same texture coordinates as the generator card
+        x_margin = 1.0 / width / 2.0
+        y_margin = 1.0 / height / 2.0
+        u = -x_margin + (1.0 + 2.0 * x_margin) * (numpy.arange(width) + 0.5) / width
+        v = -y_margin + (1.0 + 2.0 * y_margin) * (numpy.arange(height) + 0.5) / height
+        (u, v) = numpy.meshgrid(u, v)
+        x = offset[0] + u.ravel() * scale[0]
+        y = offset[1] + v.ravel() * scale[1]
+        if coord == TexCoord.Cylindrical:
+            nx = 2 * numpy.pi * x
+            ny = numpy.pi * y
+            points = numpy.stack([numpy.cos(nx) * numpy.sin(ny), numpy.sin(nx) * numpy.sin(ny), numpy.cos(ny)])
+        elif coord == TexCoord.NormalizedCube or coord == TexCoord.SqrtCube:
+            rot = get_rot_for_face(face)
+            rot = numpy.array([[rot.get_cell(i, j) for j in range(3)] for i in range(3)])
+            points = rot.dot(numpy.stack([2.0 * x - 1.0, 2.0 * y - 1.0, numpy.ones_like(x)]))
+            if coord == TexCoord.NormalizedCube:
+                points /= numpy.sqrt((points * points).sum(axis=0))
+            else:
+                p2 = points * points
+                points = numpy.stack([points[0] * numpy.sqrt(1.0 - p2[1] * 0.5 - p2[2] * 0.5 + p2[1] * p2[2] / 3.0),
+                                      points[1] * numpy.sqrt(1.0 - p2[2] * 0.5 - p2[0] * 0.5 + p2[2] * p2[0] / 3.0),
+                                      points[2] * numpy.sqrt(1.0 - p2[0] * 0.5 - p2[1] * 0.5 + p2[0] * p2[1] / 3.0)])
+        else:
+            points = numpy.stack([x, y, numpy.full_like(x, offset[2])])
+        points = points * global_coord_scale + numpy.array(global_coord_offset)[:, numpy.newaxis]
+        return points.astype(numpy.float32)
+
+    @classmethod
+    def evaluate_grid(cls, noise, coord, face, width, height, offset, scale, global_coord_scale=1.0, global_coord_offset=(0, 0, 0), global_scale=1.0):
+        points = cls.calc_points(coord, face, width, height, offset, scale, global_coord_scale, global_coord_offset)
+        values = cls.evaluate(noise, points) * global_scale
+        return values.reshape(height, width)
+
+def evaluate_const(noise, points):
+    return numpy.full(points.shape[1], noise.value, dtype=numpy.float32)
+
+def evaluate_coord(noise, points):
+    return points['xyz'.index(noise.coord)].copy()
+
+def evaluate_position_map(noise, points):
+    return NoiseEvaluator.evaluate(noise.noise, points * noise.scale + noise.offset)
+
+def evaluate_map(noise, points):
+    value = NoiseEvaluator.evaluate(noise.noise, points)
+    return numpy.clip((value - noise.src_min_value) * noise.range_factor + noise.min_value, noise.min_value, noise.max_value)
+
+def evaluate_add(noise, points):
+    result = NoiseEvaluator.evaluate(noise.noises[0], points)
+    for term in noise.noises[1:]:
+        result = result + NoiseEvaluator.evaluate(term, points)
+    return result
+
+def evaluate_mul(noise, points):
+    result = NoiseEvaluator.evaluate(noise.noises[0], points)
+    for factor in noise.noises[1:]:
+        result = result * NoiseEvaluator.evaluate(factor, points)
+    return result
+
+def evaluate_binary(operator):
+    def evaluate(noise, points):
+        return operator(NoiseEvaluator.evaluate(noise.noise_a, points), NoiseEvaluator.evaluate(noise.noise_b, points))
+    return evaluate
+
+def evaluate_unary(operator):
+    def evaluate(noise, points):
+        return operator(NoiseEvaluator.evaluate(noise.noise, points))
+    return evaluate
+
+def evaluate_clamp(noise, points):
+    return numpy.clip(NoiseEvaluator.evaluate(noise.noise, points), noise.min_value, noise.max_value)
+
+def evaluate_ridged(noise, points):
+    value = 1.0 - numpy.abs(NoiseEvaluator.evaluate(noise.noise, points)) - noise.offset
+    if noise.shift:
+        value = value * 2.0 - 1.0
+    return value
+
+def evaluate_fbm(noise, points):
+    frequency = noise.frequency
+    if noise.geometric:
+        gain = noise.gain
+    else:
+        gain = noise.lacunarity ** -noise.h
+    result = 0.0
+    amplitude = 1.0
+    max_value = 0.0
+    for i in range(int(ceil(noise.octaves))):
+        result = result + NoiseEvaluator.evaluate(noise.noise, points * frequency) * amplitude
+        max_value += amplitude
+        amplitude *= gain
+        frequency *= noise.lacunarity
+    return result / max_value
+
+def evaluate_spiral(noise, points):
+    nudge = noise.nudge
+    normalizer = 1.0 / numpy.sqrt(1.0 + nudge * nudge)
+    frequency = noise.frequency
+    result = 0.0
+    amplitude = 1.0
+    max_value = 0.0
+    (x, y, z) = points
+    for i in range(int(ceil(noise.octaves))):
+        result = result + NoiseEvaluator.evaluate(noise.noise, numpy.stack([x, y, z]) * frequency) * amplitude
+        max_value += amplitude
+        amplitude *= noise.gain
+        frequency *= noise.lacunarity
+        (x, y) = ((x + y * nudge) * normalizer, (y - x * nudge) * normalizer)
+        (x, z) = ((x + z * nudge) * normalizer, (z - x * nudge) * normalizer)
+    return result / max_value
+
+def evaluate_warp(noise, points):
+    warped_points = numpy.stack([NoiseEvaluator.evaluate(noise.noise_warp, points),
+                                 NoiseEvaluator.evaluate(noise.noise_warp, points + numpy.array([[1.0], [2.0], [3.0]], dtype=numpy.float32)),
+                                 NoiseEvaluator.evaluate(noise.noise_warp, points + numpy.array([[4.0], [3.0], [2.0]], dtype=numpy.float32))])
+    return NoiseEvaluator.evaluate(noise.noise_main, points + noise.scale * warped_points)
+
+def evaluate_1d(noise, points):
+    axis = 'xyz'.index(noise.axis)
+    points_1d = numpy.zeros_like(points)
+    points_1d[axis] = points[axis]
+    return NoiseEvaluator.evaluate(noise.noise, points_1d)
+
+def evaluate_rotate(noise, points):
+    theta = NoiseEvaluator.evaluate(noise.noise_angle, points)
+    cos_theta = numpy.cos(theta)
+    sin_theta = numpy.sin(theta)
+    (x, y, z) = points
+    #The GLSL matrices are given column by column
+    if noise.axis == 'x':
+        rotated = numpy.stack([x, cos_theta * y + sin_theta * z, -sin_theta * y + cos_theta * z])
+    elif noise.axis == 'y':
+        rotated = numpy.stack([cos_theta * x - sin_theta * z, y, sin_theta * x + cos_theta * z])
+    else:
+        rotated = numpy.stack([cos_theta * x + sin_theta * y, -sin_theta * x + cos_theta * y, z])
+    return NoiseEvaluator.evaluate(noise.noise_main, rotated)
+
+def evaluate_stegu_cellular(noise, points):
+    if noise.fast:
+        return stegu_cellular2x2x2(points)[0]
+    else:
+        return stegu_cellular(points)[0]
+
+def evaluate_stegu_cellular_diff(noise, points):
+    if noise.fast:
+        f = stegu_cellular2x2x2(points)
+    else:
+        f = stegu_cellular(points)
+    return f[1] - f[0]
+
+NoiseEvaluator.register_evaluator(NoiseConst, evaluate_const)
+NoiseEvaluator.register_evaluator(NoiseCoord, evaluate_coord)
+NoiseEvaluator.register_evaluator(PositionMap, evaluate_position_map)
+NoiseEvaluator.register_evaluator(NoiseMap, evaluate_map)
+NoiseEvaluator.register_evaluator(NoiseAdd, evaluate_add)
+NoiseEvaluator.register_evaluator(NoiseSub, evaluate_binary(numpy.subtract))
+NoiseEvaluator.register_evaluator(NoiseMul, evaluate_mul)
+NoiseEvaluator.register_evaluator(NoisePow, evaluate_binary(numpy.power))
+NoiseEvaluator.register_evaluator(NoiseExp, evaluate_unary(numpy.exp))
+NoiseEvaluator.register_evaluator(NoiseThreshold, evaluate_binary(lambda a, b: numpy.maximum(a - b, 0.0)))
+NoiseEvaluator.register_evaluator(NoiseClamp, evaluate_clamp)
+NoiseEvaluator.register_evaluator(NoiseMin, evaluate_binary(numpy.minimum))
+NoiseEvaluator.register_evaluator(NoiseMax, evaluate_binary(numpy.maximum))
+NoiseEvaluator.register_evaluator(NegNoise, evaluate_unary(numpy.negative))
+NoiseEvaluator.register_evaluator(AbsNoise, evaluate_unary(numpy.abs))
+NoiseEvaluator.register_evaluator(SquareNoise, evaluate_unary(lambda value: value * value))
+NoiseEvaluator.register_evaluator(CubeNoise, evaluate_unary(lambda value: value * value * value))
+NoiseEvaluator.register_evaluator(RidgedNoise, evaluate_ridged)
+NoiseEvaluator.register_evaluator(FbmNoise, evaluate_fbm)
+NoiseEvaluator.register_evaluator(SpiralNoise, evaluate_spiral)
+NoiseEvaluator.register_evaluator(NoiseWarp, evaluate_warp)
+NoiseEvaluator.register_evaluator(Noise1D, evaluate_1d)
+NoiseEvaluator.register_evaluator(NoiseRotate, evaluate_rotate)
+
+NoiseEvaluator.register_evaluator(GpuNoiseLibPerlin3D, lambda noise, points: gnl_perlin3d(points))
+NoiseEvaluator.register_evaluator(GpuNoiseLibCellular3D, lambda noise, points: numpy.sqrt(gnl_cellular3d(points)))
+NoiseEvaluator.register_evaluator(SteGuPerlin3D, lambda noise, points: stegu_snoise(points))
+NoiseEvaluator.register_evaluator(SteGuCellular3D, evaluate_stegu_cellular)
+NoiseEvaluator.register_evaluator(SteGuCellularDiff3D, evaluate_stegu_cellular_diff)
+NoiseEvaluator.register_evaluator(QuilezPerlin3D, lambda noise, points: quilez_perlin3d(points))
+NoiseEvaluator.register_evaluator(QuilezGradientNoise3D, lambda noise, points: quilez_gradient3d(points))
+NoiseEvaluator.register_evaluator(SinCosNoise, lambda noise, points: numpy.sin(points[1]) + numpy.cos(points[0]))
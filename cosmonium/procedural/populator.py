@@ -28,9 +28,7 @@ from ..shaders import OffsetScaleInstanceControl
 from .. import settings
 
 from random import random, uniform
-from array import array
-from itertools import chain
-import sys
+import numpy
 
 class TerrainObjectFactory(object):
     def __init__(self):
@@ -237,56 +235,139 @@ class CpuTerrainPopulator(PatchedTerrainPopulatorBase):
             instance.remove_node()
         patch.instances = []
 
+class InstanceBuffer(object):
+    min_capacity = 256
+
+    def __init__(self):
+        self.capacity = 0
+        self.data = numpy.zeros((0, 4), dtype=numpy.float32)
+        #Each owner has a contiguous range of slots in the buffer
+        self.ranges = {}
+        self.free_ranges = []
+        self.end = 0
+        self.dirty_ranges = []
+        self.resized = False
+        self.grow(0)
+
+    def invalidate(self):
+        self.resized = True
+
+    def grow(self, size):
+        capacity = max(self.capacity, self.min_capacity)
+        while capacity < size:
+            capacity *= 2
+        if capacity != self.capacity:
+            data = numpy.zeros((capacity, 4), dtype=numpy.float32)
+            data[:self.end] = self.data[:self.end]
+            self.data = data
+            self.capacity = capacity
+            self.resized = True
+
+    def find_free_range(self, count):
+        for (i, (start, size)) in enumerate(self.free_ranges):
+            if size >= count:
+                if size == count:
+                    del self.free_ranges[i]
+                else:
+                    self.free_ranges[i] = (start + count, size - count)
+                return start
+        start = self.end
+        self.grow(start + count)
+        self.end = start + count
+        return start
+
+    def add(self, owner, values):
+        self.remove(owner)
+        count = len(values)
+        if count == 0: return
+        start = self.find_free_range(count)
+        self.data[start:start + count] = values
+        self.ranges[owner] = (start, count)
+        self.dirty_ranges.append((start, count))
+
+    def remove(self, owner):
+        if owner not in self.ranges: return
+        (start, count) = self.ranges.pop(owner)
+        #A null scale hides the unused slots
+        self.data[start:start + count] = 0.0
+        self.dirty_ranges.append((start, count))
+        self.free_ranges.append((start, count))
+        self.free_ranges.sort()
+        merged = []
+        for (start, size) in self.free_ranges:
+            if len(merged) > 0 and merged[-1][0] + merged[-1][1] == start:
+                merged[-1] = (merged[-1][0], merged[-1][1] + size)
+            else:
+                merged.append((start, size))
+        if len(merged) > 0 and merged[-1][0] + merged[-1][1] == self.end:
+            self.end = merged.pop()[0]
+        self.free_ranges = merged
+
+    def is_dirty(self):
+        return self.resized or len(self.dirty_ranges) > 0
+
+    def get_dirty_ranges(self):
+        dirty_ranges = self.dirty_ranges
+        self.dirty_ranges = []
+        return dirty_ranges
+
 class GpuTerrainPopulator(PatchedTerrainPopulatorBase):
     def __init__(self, object_template, count, max_instances, placer, min_lod=0):
         PatchedTerrainPopulatorBase.__init__(self, object_template, count, placer, min_lod)
         self.max_instances = max_instances
         self.object_template.shader.set_instance_control(OffsetScaleInstanceControl(self.max_instances))
-        self.rebuild = False
+        self.instances = InstanceBuffer()
+        self.texture = None
 
     def configure_object_template(self):
         bounds = OmniBoundingVolume()
         self.object_template.instance.node().setBounds(bounds)
         self.object_template.instance.node().setFinal(1)
+        #The new instance needs the whole table
+        self.instances.invalidate()
 
     def create_object_instances(self, patch, terrain_patch):
-        self.rebuild = True
+        self.instances.add(terrain_patch, patch.data)
 
     def remove_object_instances(self, patch, terrain_patch):
-        self.rebuild = True
+        self.instances.remove(terrain_patch)
+
+    def create_texture(self):
+        self.texture = Texture()
+        self.texture.setup_buffer_texture(self.instances.capacity, Texture.T_float, Texture.F_rgba32, GeomEnums.UH_dynamic)
+        self.texture.set_ram_image(self.instances.data.tobytes())
+        self.instances.get_dirty_ranges()
+        self.object_template.appearance.offsets = self.texture
+        self.object_template.shader.apply(self.object_template.shape, self.object_template.appearance)
+
+    def update_texture(self):
+        #Only copy the modified ranges, the texture is uploaded again by Panda3D once modified
+        data = numpy.asarray(memoryview(self.texture.modify_ram_image())).view(numpy.float32).reshape(-1, 4)
+        for (start, count) in self.instances.get_dirty_ranges():
+            data[start:start + count] = self.instances.data[start:start + count]
 
     def generate_table(self):
-        data = []
-        for patch in self.visible_patches.values():
-            data += patch.data
-        offsets_nb = len(data)
+        offsets_nb = self.instances.end
         if settings.debug_lod_split_merge:
-            print("Populator regenerate", offsets_nb)
+            print("Populator update", offsets_nb, "capacity", self.instances.capacity)
         if settings.instancing_use_tex:
-            offsets = data
-        else:
-            offsets = PTAVecBase4f.emptyArray(offsets_nb)
-            for offset in data:
-                    offsets[offsets_nb] = offset
-        if settings.instancing_use_tex:
-            texture = Texture()
-            texture.setup_buffer_texture(len(offsets), Texture.T_float, Texture.F_rgba32, GeomEnums.UH_static)
-            flattened_data = list(chain.from_iterable(offsets))
-            data = array("f", flattened_data)
-            if sys.version_info[0] < 3:
-                texture.setRamImage(data.tostring())
+            if self.texture is None or self.instances.resized:
+                self.create_texture()
             else:
-                texture.setRamImage(data.tobytes())
-            self.object_template.appearance.offsets = texture
+                self.update_texture()
         else:
+            offsets = PTAVecBase4f.emptyArray(offsets_nb)
+            for (i, offset) in enumerate(self.instances.data[:offsets_nb]):
+                offsets[i] = Vec4F(*offset)
+            self.instances.get_dirty_ranges()
             self.object_template.appearance.offsets = offsets
+            self.object_template.shader.apply(self.object_template.shape, self.object_template.appearance)
+        self.instances.resized = False
         self.object_template.instance.set_instance_count(offsets_nb)
-        self.object_template.shader.apply(self.object_template.shape, self.object_template.appearance)
-        self.rebuild = False
 
     def update_instance(self, camera_pos, camera_rot):
         if self.object_template.instance is not None and self.object_template.instance_ready:
-            if self.rebuild:
+            if self.instances.is_dirty():
                 self.generate_table()
             self.object_template.update_instance(camera_pos, camera_rot)
 
@@ -24,11 +24,15 @@ from panda3d.core import Texture
 
 from .generator import RenderTarget, RenderStage, GeneratorChain, GeneratorPool
 from .shadernoise import NoiseShader, FloatTarget
+from .cpunoise import NoiseEvaluator
 
 from ..heightmap import TextureHeightmapBase, HeightmapPatch, PatchedHeightmapBase
 from ..textures import TexCoord
+from .. import workers
 from .. import settings
 
+import numpy
+
 class HeightmapGenerationStage(RenderStage):
     def __init__(self, coord, width, height, noise_source):
         RenderStage.__init__(self, "heightmap", (width, height))
@@ -144,6 +148,41 @@ class HeightmapPatchGenerator():
         data = result['heightmap'].get('heightmap')
         return data
 
+class CpuHeightmapPatchGenerator():
+    def __init__(self, width, height, function, coord_scale):
+        self.width = width
+        self.height = height
+        self.function = function
+        self.coord_scale = coord_scale
+        NoiseEvaluator.check(function)
+
+    def clear_all(self):
+        pass
+
+    def create_texture(self, data):
+        texture = Texture()
+        texture.setup_2d_texture(self.width, self.height, Texture.T_float, Texture.F_r32)
+        texture.set_wrap_u(Texture.WM_clamp)
+        texture.set_wrap_v(Texture.WM_clamp)
+        texture.set_anisotropic_degree(0)
+        texture.set_minfilter(Texture.FT_linear)
+        texture.set_magfilter(Texture.FT_linear)
+        texture.set_ram_image(data.astype(numpy.float32).tobytes())
+        return texture
+
+    def do_generate(self, coord, face, offset, scale):
+        data = NoiseEvaluator.evaluate_grid(self.function, coord, face, self.width, self.height, offset, scale, self.coord_scale)
+        return self.create_texture(data)
+
+    async def generate(self, tid, heightmap_patch):
+        patch = heightmap_patch.patch
+        offset = (heightmap_patch.r_x0, heightmap_patch.r_y0, 0.0)
+        scale = (heightmap_patch.r_x1 - heightmap_patch.r_x0, heightmap_patch.r_y1 - heightmap_patch.r_y0, 1.0)
+        if workers.asyncComputeLoader is not None:
+            return await workers.asyncComputeLoader.add_job(self.do_generate, [patch.coord, patch.face, offset, scale])
+        else:
+            return self.do_generate(patch.coord, patch.face, offset, scale)
+
 class ShaderPatchedHeightmap(PatchedHeightmapBase):
     def __init__(self, name, data_source, size, min_height, max_height, height_scale, height_offset, overlap, interpolator=None, filter=None, max_lod=100):
         PatchedHeightmapBase.__init__(self, name, size, min_height, max_height, height_scale, height_offset, overlap, interpolator, filter, max_lod)
@@ -164,5 +203,5 @@ class ShaderHeightmapPatch(HeightmapPatch):
         HeightmapPatch.apply(self, instance)
 
     async def load(self, tasks_tree, patch):
-        data = await self.parent.data_source.generate("hm - " + patch.str_id(), self)
+        data = await self.parent.data_source.generate(patch.key, self)
         self.configure_data(data)
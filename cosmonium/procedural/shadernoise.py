@@ -164,11 +164,8 @@ class GpuNoiseLibCellular3D(NoiseSource):
         code.append('        %s  = sqrt(Cellular3D(%s));' % (value, point))
 
 class GpuNoiseLibPolkaDot3D(NoiseSource):
-    def __init__(self, name=None):
+    def __init__(self, min_radius, max_radius, name=None):
         NoiseSource.__init__(self, name, 'gnl-polkadot3d')
-
-    def __init__(self, min_radius, max_radius):
-        NoiseSource.__init__(self)
         self.min_radius = min_radius
         self.max_radius = max_radius
 
@@ -1110,6 +1107,36 @@ class NoiseFragmentShader(ShaderProgram):
         if self.version < 130:
             code.append('gl_FragColor = frag_output;')
 
+def get_rot_for_face(face):
+    if face == 0:
+        return LMatrix3(0.0, 0.0, 1.0,
+                        0.0, 1.0, 0.0,
+                        -1.0, 0.0, 0.0)
+    elif face == 1:
+        return LMatrix3(0.0, 0.0, -1.0,
+                        0.0, 1.0, 0.0,
+                        1.0, 0.0, 0.0)
+    elif face == 2:
+        return LMatrix3(1.0, 0.0, 0.0,
+                        0.0, 0.0, -1.0,
+                        0.0, 1.0, 0.0)
+    elif face == 3:
+        return LMatrix3(1.0, 0.0, 0.0,
+                        0.0, 0.0, 1.0,
+                        0.0, -1.0, 0.0)
+    elif face == 4:
+        return LMatrix3(-1.0, 0.0, 0.0,
+                        0.0, -1.0, 0.0,
+                        0.0, 0.0, 1.0)
+    elif face == 5:
+        return LMatrix3(-1.0, 0.0, 0.0,
+                        0.0, 1.0, 0.0,
+                        0.0, 0.0, -1.0)
+    else:
+        return LMatrix3(1.0, 0.0, 0.0,
+                        0.0, 1.0, 0.0,
+                        0.0, 0.0, 1.0)
+
 class NoiseShader(StructuredShader):
     coord_map = {TexCoord.Cylindrical: 'cyl',
                  TexCoord.Flat: 'flat',
@@ -1139,34 +1166,7 @@ class NoiseShader(StructuredShader):
         return name
 
     def get_rot_for_face(self, face):
-        if face == 0:
-            return LMatrix3(0.0, 0.0, 1.0,
-                            0.0, 1.0, 0.0,
-                            -1.0, 0.0, 0.0)
-        elif face == 1:
-            return LMatrix3(0.0, 0.0, -1.0,
-                            0.0, 1.0, 0.0,
-                            1.0, 0.0, 0.0)
-        elif face == 2:
-            return LMatrix3(1.0, 0.0, 0.0,
-                            0.0, 0.0, -1.0,
-                            0.0, 1.0, 0.0)
-        elif face == 3:
-            return LMatrix3(1.0, 0.0, 0.0,
-                            0.0, 0.0, 1.0,
-                            0.0, -1.0, 0.0)
-        elif face == 4:
-            return LMatrix3(-1.0, 0.0, 0.0,
-                            0.0, -1.0, 0.0,
-                            0.0, 0.0, 1.0)
-        elif face == 5:
-            return LMatrix3(-1.0, 0.0, 0.0,
-                            0.0, 1.0, 0.0,
-                            0.0, 0.0, -1.0)
-        else:
-            return LMatrix3(1.0, 0.0, 0.0,
-                            0.0, 1.0, 0.0,
-                            0.0, 0.0, 1.0)
+        return get_rot_for_face(face)
 
     def update(self, instance, face=0, offset=LVector3(0, 0, 0), scale=LVector3(1, 1, 1), global_coord_scale=1.0, global_coord_offset=LVector3(0, 0, 0), global_scale=1.0, lod=None):
         instance.set_shader_input('noiseOffset', offset)
@@ -0,0 +1,87 @@
+#
+#This file is part of Cosmonium.
+#
+#Copyright (C) 2018-2019 Laurent Deru.
+#
+#Cosmonium is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+#
+#Cosmonium is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License
+#along with Cosmonium.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os
+import sys
+
+# Add third-party/ directory to import path to be able to load the external libraries
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), '..', '..', 'third-party'))
+
+import numpy
+import pytest
+
+reference_points = [(0.1, 0.2, 0.3), (1.7, -2.3, 0.55), (-3.25, 4.5, -1.125), (12.3, 7.9, -5.6),
+                    (-0.45, -0.95, 2.05), (33.3, -17.1, 8.8), (0.999, 1.001, -0.001), (-70.25, 65.5, 140.75)]
+#The hash of the Quilez noises amplifies the error of sin(), whose precision is left to the GLSL implementation,
+#their reference points are limited to the cells next to the origin where the arguments of sin() are small
+hash_reference_points = [(0.1, 0.2, 0.3), (0.999, 1.001, -0.001), (0.75, 0.25, 0.5), (0.5, 0.9, 0.05),
+                         (0.3, 0.6, 0.8), (1.25, 0.4, 0.7)]
+
+#Values of the GLSL functions at the reference points, generated with tools/noise_reference.py
+#Each entry holds the two components of the result, the second one is only used by the cellular noises
+reference_values = {
+    'gnl-perlin3d': [(-0.31239599, 0), (-0.015892847, 0), (0.29947054, 0), (-0.14105533, 0), (-0.18367831, 0), (0.27286154, 0), (0.0010081157, 0), (0.31106833, 0)],
+    'gnl-cell3d': [(0.33982447, 0), (0.61612529, 0), (0.59837502, 0), (0.35125723, 0), (0.2694675, 0), (0.49867818, 0), (0.2074201, 0), (0.51916891, 0)],
+    'stegu-perlin3d': [(-0.47550189, 0), (0.48595169, 0), (0.10629969, 0), (0.70655781, 0), (0.21507773, 0), (0.2032609, 0), (-0.65372205, 0), (0.585841, 0)],
+    'stegu-cellular3d': [(0.42976683, 0.76094037), (0.38086304, 0.74134392), (0.47786143, 0.52936065), (0.60294658, 0.65538388), (0.58784926, 0.61967903), (0.64312655, 0.83503503), (0.48643112, 0.62692803), (0.287938, 0.45191139)],
+    'stegu-cellular3d-fast': [(0.28372324, 0.72502947), (0.5717904, 0.57333499), (0.2927435, 0.51285744), (0.30765042, 0.40957871), (0.19522336, 0.45382667), (0.46797749, 0.56371772), (0.42000145, 1.0445596), (0.37830815, 0.69624227)],
+    'quilez-perlin3d': [(-0.56386364, 0), (-0.0008052481, 0), (0.19599138, 0), (-0.036404982, 0), (-0.017391475, 0), (-0.044721596, 0)],
+    'quilez-gradientnoise3d': [(-0.51459056, 0), (-0.00080657005, 0), (0.1281316, 0), (-0.053903181, 0), (-0.030409902, 0), (-0.025614306, 0)],
+}
+
+def evaluate(noise, points):
+    from cosmonium.procedural.cpunoise import NoiseEvaluator
+    return NoiseEvaluator.evaluate(noise, numpy.array(points, dtype=numpy.float32).T)
+
+def check(name, noise, points, component=0, tolerance=1e-5):
+    expected = numpy.array(reference_values[name])[:, component]
+    values = evaluate(noise, points)
+    assert numpy.allclose(values, expected, rtol=0, atol=tolerance), (name, values, expected)
+
+def test_gpu_noise_lib():
+    from cosmonium.procedural.shadernoise import GpuNoiseLibPerlin3D, GpuNoiseLibCellular3D
+    check('gnl-perlin3d', GpuNoiseLibPerlin3D(), reference_points)
+    check('gnl-cell3d', GpuNoiseLibCellular3D(), reference_points)
+
+def test_stegu():
+    from cosmonium.procedural.shadernoise import SteGuPerlin3D, SteGuCellular3D
+    check('stegu-perlin3d', SteGuPerlin3D(), reference_points)
+    check('stegu-cellular3d', SteGuCellular3D(fast=False), reference_points)
+    check('stegu-cellular3d-fast', SteGuCellular3D(fast=True), reference_points)
+
+def test_stegu_f2():
+    from cosmonium.procedural.shadernoise import SteGuCellularDiff3D
+    for (name, fast) in (('stegu-cellular3d', False), ('stegu-cellular3d-fast', True)):
+        expected = numpy.array(reference_values[name])
+        values = evaluate(SteGuCellularDiff3D(fast=fast), reference_points)
+        assert numpy.allclose(values, expected[:, 1] - expected[:, 0], rtol=0, atol=1e-5), (name, values)
+
+def test_quilez():
+    from cosmonium.procedural.shadernoise import QuilezPerlin3D, QuilezGradientNoise3D
+    check('quilez-perlin3d', QuilezPerlin3D(), hash_reference_points, tolerance=1e-3)
+    check('quilez-gradientnoise3d', QuilezGradientNoise3D(), hash_reference_points, tolerance=1e-3)
+
+def test_unsupported():
+    from cosmonium.procedural.shadernoise import GpuNoiseLibPolkaDot3D
+    from cosmonium.procedural.cpunoise import NoiseEvaluator
+    with pytest.raises(NotImplementedError):
+        NoiseEvaluator.check(GpuNoiseLibPolkaDot3D(0.1, 0.5))
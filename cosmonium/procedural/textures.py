@@ -26,6 +26,7 @@ from .generator import RenderTarget, RenderStage, GeneratorChain, GeneratorPool
 from .shaders import DeferredDetailMapShader, TextureDictionaryDataSource
 from .shadernoise import NoiseShader
 from ..textures import TextureSource
+from ..patchkey import parent_patch_key
 from .. import settings
 
 class TextureGenerationStage(RenderStage):
@@ -180,7 +181,7 @@ class DetailMapTextureGenerator():
                 await tasks_tree.named_tasks[source_name]
         self.texture_stage.configure_data(shader_data, shape, patch)
         #print("GEN", patch.str_id())
-        result = await self.tex_generator.generate("tex - " + patch.str_id(), shader_data)
+        result = await self.tex_generator.generate(patch.key, shader_data)
         texture = result[self.texture_stage.name]['texture']
         return texture
 
@@ -228,18 +229,18 @@ class PatchedProceduralVirtualTextureSource(TextureSource):
     async def load(self, tasks_tree, patch, color_space):
         #print("LOAD", patch.str_id())
         texture_info = None
-        if not patch.str_id() in self.map_patch:
+        if not patch.key in self.map_patch:
             texture = await self.tex_generator.generate(tasks_tree, patch.owner, patch)
             #print("READY", patch.str_id())
             texture_info = (texture, self.texture_size, patch.lod)
-            self.map_patch[patch.str_id()] = texture_info
+            self.map_patch[patch.key] = texture_info
         else:
-            texture_info = self.map_patch[patch.str_id()]
+            texture_info = self.map_patch[patch.key]
         return texture_info
 
     def clear_patch(self, patch):
         try:
-            del self.map_patch[patch.str_id()]
+            del self.map_patch[patch.key]
         except KeyError:
             pass
 
@@ -248,15 +249,15 @@ class PatchedProceduralVirtualTextureSource(TextureSource):
         self.tex_generator.clear_all()
 
     def get_texture(self, patch, strict=False):
-        if patch.str_id() in self.map_patch:
-            return self.map_patch[patch.str_id()]
+        if patch.key in self.map_patch:
+            return self.map_patch[patch.key]
         elif not strict:
-            parent_patch = patch.parent
-            while parent_patch is not None and parent_patch.str_id() not in self.map_patch:
-                parent_patch = parent_patch.parent
-            if parent_patch is not None:
-                #print(globalClock.getFrameCount(), "USE PARENT", patch.str_id(), parent_patch.str_id())
-                return self.map_patch[parent_patch.str_id()]
+            parent_key = parent_patch_key(patch.key)
+            while parent_key is not None and parent_key not in self.map_patch:
+                parent_key = parent_patch_key(parent_key)
+            if parent_key is not None:
+                #print(globalClock.getFrameCount(), "USE PARENT", patch.str_id(), parent_key)
+                return self.map_patch[parent_key]
             else:
                 #print(globalClock.getFrameCount(), "NONE")
                 return (None, self.texture_size, patch.lod)
@@ -22,6 +22,8 @@ from __future__ import absolute_import
 
 from panda3d.core import LPlaned
 
+import numpy
+
 class InfiniteFrustum(object):
     def __init__(self, frustum, view_mat, view_position):
         self.planes = []
@@ -34,6 +36,7 @@ class InfiniteFrustum(object):
             new_plane[2] = plane[2]
             new_plane[3] = plane[3] - new_plane.get_normal().dot(view_position)
             self.planes.append(new_plane)
+        self.packed_planes = numpy.array([tuple(plane) for plane in self.planes])
 
     def is_sphere_in(self, center, radius):
         for plane in self.planes:
@@ -41,5 +44,9 @@ class InfiniteFrustum(object):
             if dist > radius: return False
         return True
 
+    def are_spheres_in(self, centers, radii):
+        dists = centers.dot(self.packed_planes[:, :3].T) + self.packed_planes[:, 3]
+        return numpy.all(dists <= radii[:, numpy.newaxis], axis=1)
+
     def get_position(self):
         return self.position
@@ -23,8 +23,10 @@ from __future__ import absolute_import
 from panda3d.core import LPoint3d
 
 from ..astro.astro import abs_to_app_mag, app_to_abs_mag
+from ..astro import units
 
 from math import sqrt
+import numpy
 
 def OctreeLeaf(ref_object, *args):
     return ref_object
@@ -45,6 +47,7 @@ class OctreeNode(object):
         self.has_children = False
         self.children = [None, None, None, None, None, None, None, None]
         self.leaves = []
+        self.packed_leaves = None
         self.max_magnitude = 99.0
         OctreeNode.nb_cells += 1
 
@@ -76,6 +79,20 @@ class OctreeNode(object):
     def get_leaves(self):
         return self.leaves
 
+    def get_packed_leaves(self):
+        #Positions, magnitudes and extends of the leaves packed in arrays for the traversers
+        if self.packed_leaves is None:
+            nb_leaves = len(self.leaves)
+            positions = numpy.empty((nb_leaves, 3))
+            magnitudes = numpy.empty(nb_leaves)
+            extends = numpy.empty(nb_leaves)
+            for (i, leaf) in enumerate(self.leaves):
+                positions[i] = leaf.get_global_position()
+                magnitudes[i] = leaf.get_abs_magnitude()
+                extends[i] = leaf._extend
+            self.packed_leaves = (positions, magnitudes, extends)
+        return self.packed_leaves
+
     def _add_in_child(self, obj, position, magnitude):
         index = 0
         if position.x >= self.center.x: index |= 1
@@ -106,6 +123,7 @@ class OctreeNode(object):
             self.max_magnitude = magnitude
         if not self.has_children or magnitude < self.threshold:
             self.leaves.append(obj)
+            self.packed_leaves = None
         else:
             self._add_in_child(obj, position, magnitude)
         if self.level < self.max_level and len(self.leaves) >= self.max_leaves and not self.has_children:
@@ -121,6 +139,7 @@ class OctreeNode(object):
             else:
                 self._add_in_child(leaf, position, leaf.get_abs_magnitude())
         self.leaves = new_leaves
+        self.packed_leaves = None
         self.has_children = True
 
     def dump_octree_summary(self):
@@ -170,6 +189,7 @@ class VisibleObjectsTraverser(object):
         return self.frustum.is_sphere_in(octree.center, octree.radius)
 
     def traverse(self, octree, leaves):
+        if len(leaves) == 0: return
         frustum = self.frustum
         frustum_position = frustum.get_position()
         distance = (octree.center - frustum_position).length() - octree.radius
@@ -177,18 +197,213 @@ class VisibleObjectsTraverser(object):
             faintest = app_to_abs_mag(self.limit, distance)
         else:
             faintest = 99.0
-        for leaf in leaves:
-            abs_magnitude = leaf.get_abs_magnitude()
-            add = False
-            if abs_magnitude < faintest:
-                direction = leaf._global_position - frustum_position
-                distance = direction.length()
-                if distance > 0.0:
-                    app_magnitude = abs_to_app_mag(abs_magnitude, distance)
-                    if app_magnitude < self.limit:
-                        add = self.frustum.is_sphere_in(leaf._global_position, leaf._extend)
-                else:
-                    add = True
-            if add:
-                self.collected_leaves.append(leaf)
-                leaf.update_id = self.update_id
+        positions, magnitudes, extends = octree.get_packed_leaves()
+        #Test all the leaves of the cell at once, the faint leaves are discarded first
+        candidates = numpy.flatnonzero(magnitudes < faintest)
+        if len(candidates) == 0: return
+        positions = positions[candidates]
+        directions = positions - numpy.array(frustum_position)
+        distances = numpy.sqrt(numpy.einsum('ij,ij->i', directions, directions))
+        inside = distances <= 0.0
+        with numpy.errstate(divide='ignore'):
+            app_magnitudes = magnitudes[candidates] + 5 * (numpy.log10(distances / units.KmPerParsec) - 1)
+        add = app_magnitudes < self.limit
+        add[inside] = False
+        if add.any():
+            add[add] = frustum.are_spheres_in(positions[add], extends[candidates[add]])
+        add |= inside
+        for index in candidates[add].tolist():
+            leaf = leaves[index]
+            self.collected_leaves.append(leaf)
+            leaf.update_id = self.update_id
+
+class TraversalView(object):
+    #Observer position and frustum planes used to test the cells, relative to the observer position
+    def __init__(self, frustum):
+        self.position = LPoint3d(frustum.get_position())
+        self.packed_position = numpy.array(self.position)
+        self.normals = frustum.packed_planes[:, :3]
+        self.offsets = frustum.packed_planes[:, 3]
+
+    def get_bounds(self, ref):
+        #Bounds on the change of the distance and plane tests of a point between ref and this view
+        #A plane test varies by at most normal_bound * distance + offset_bound
+        delta = (self.position - ref.position).length()
+        normal_bound = numpy.sqrt(((self.normals - ref.normals) ** 2).sum(axis=1)).max()
+        old_offsets = ref.offsets + ref.normals.dot(ref.packed_position)
+        new_offsets = self.offsets + self.normals.dot(ref.packed_position)
+        offset_bound = numpy.abs(new_offsets - old_offsets).max()
+        return (delta, float(normal_bound), float(offset_bound))
+
+class CellState(object):
+    __slots__ = ('entered', 'view', 'distance_slack', 'plane_slack', 'angle_slack', 'packed', 'nb_leaves', 'visible')
+    def __init__(self):
+        self.entered = False
+        self.view = None
+        self.distance_slack = 0.0
+        self.plane_slack = 0.0
+        self.angle_slack = 0.0
+        self.packed = None
+        self.nb_leaves = 0
+        self.visible = []
+
+class CoherentVisibleObjectsTraverser(object):
+    """Visible objects traverser that keeps the result of each cell between frames.
+
+    Each cell remembers how far its entry test and the tests of its leaves were from
+    changing. When the view moves, only the cells whose margin is smaller than the
+    movement of the view are tested again, the others reuse their previous result.
+    The leaves that became visible or invisible are reported in entered and exited."""
+    def __init__(self):
+        self.cells = {}
+        self.valid = False
+        self.frustum = None
+        self.limit = None
+        self.view = None
+        self.bounds = {}
+        self.collected_leaves = []
+        self.entered = []
+        self.exited = []
+        self.nb_tested = 0
+
+    def reset(self):
+        #The previous results can not be reused, the next traversal will test all the cells again
+        self.valid = False
+
+    def get_leaves(self):
+        return self.collected_leaves
+
+    def get_entered(self):
+        return self.entered
+
+    def get_exited(self):
+        return self.exited
+
+    def traverse_octree(self, octree, frustum, limit):
+        previous_leaves = None
+        if not self.valid or limit != self.limit:
+            previous_leaves = self.collected_leaves
+            self.cells = {}
+            self.valid = True
+        self.frustum = frustum
+        self.limit = limit
+        self.view = TraversalView(frustum)
+        self.bounds = {}
+        self.collected_leaves = []
+        self.entered = []
+        self.exited = []
+        self.nb_tested = 0
+        self.visit(octree, True)
+        if previous_leaves is not None:
+            #All the cells were tested again, the deltas are computed from the previous visible leaves
+            previous_set = set(previous_leaves)
+            visible_set = set(self.collected_leaves)
+            self.entered = [leaf for leaf in self.collected_leaves if leaf not in previous_set]
+            self.exited = [leaf for leaf in previous_leaves if leaf not in visible_set]
+
+    def is_stable(self, cell, state):
+        if state.packed is not cell.packed_leaves or state.nb_leaves != len(cell.leaves):
+            return False
+        bounds = self.bounds.get(state.view)
+        if bounds is None:
+            bounds = self.view.get_bounds(state.view)
+            self.bounds[state.view] = bounds
+        (delta, normal_bound, offset_bound) = bounds
+        return delta < state.distance_slack and 2 * offset_bound < state.plane_slack and 2 * normal_bound < state.angle_slack
+
+    def visit(self, cell, is_root):
+        state = self.cells.get(cell)
+        if state is None or not self.is_stable(cell, state):
+            state = self.test(cell, state, is_root)
+        if not state.entered: return
+        self.collected_leaves += state.visible
+        for child in cell.children:
+            if child is not None:
+                self.visit(child, False)
+
+    def drop_children(self, cell):
+        for child in cell.children:
+            if child is None: continue
+            state = self.cells.pop(child, None)
+            if state is not None:
+                self.exited += state.visible
+                self.drop_children(child)
+
+    def test(self, cell, state, is_root):
+        self.nb_tested += 1
+        if state is None:
+            state = CellState()
+            self.cells[cell] = state
+            old_visible = []
+            was_entered = False
+        else:
+            old_visible = state.visible
+            was_entered = state.entered
+        if is_root:
+            (entered, distance_slack, plane_slack, angle_slack) = (True, float('inf'), float('inf'), float('inf'))
+        else:
+            (entered, distance_slack, plane_slack, angle_slack) = self.test_cell(cell)
+        if entered and len(cell.leaves) > 0:
+            (visible, leaves_distance_slack, leaves_plane_slack, leaves_angle_slack) = self.test_leaves(cell)
+            distance_slack = min(distance_slack, leaves_distance_slack)
+            plane_slack = min(plane_slack, leaves_plane_slack)
+            angle_slack = min(angle_slack, leaves_angle_slack)
+        else:
+            visible = []
+        if len(old_visible) == 0:
+            self.entered += visible
+        else:
+            old_set = set(old_visible)
+            new_set = set(visible)
+            self.entered += [leaf for leaf in visible if leaf not in old_set]
+            self.exited += [leaf for leaf in old_visible if leaf not in new_set]
+        if was_entered and not entered:
+            self.drop_children(cell)
+        state.entered = entered
+        state.view = self.view
+        state.distance_slack = distance_slack
+        state.plane_slack = plane_slack
+        state.angle_slack = angle_slack
+        state.packed = cell.packed_leaves
+        state.nb_leaves = len(cell.leaves)
+        state.visible = visible
+        return state
+
+    def test_cell(self, cell):
+        #Same tests as VisibleObjectsTraverser.enter(), with the margin of each decision
+        center_distance = (cell.center - self.view.position).length()
+        distance = center_distance - cell.radius
+        if distance <= 0.0:
+            return (True, -distance, float('inf'), float('inf'))
+        limit_distance = units.KmPerParsec * 10 ** ((self.limit - cell.max_magnitude) / 5.0 + 1)
+        distance_slack = min(distance, abs(limit_distance - distance))
+        if distance >= limit_distance:
+            return (False, distance_slack, float('inf'), float('inf'))
+        excess = max(plane.dist_to_plane(cell.center) for plane in self.frustum.planes) - cell.radius
+        plane_slack = abs(excess)
+        return (excess <= 0.0, distance_slack, plane_slack, plane_slack / center_distance)
+
+    def test_leaves(self, cell):
+        #Same tests as VisibleObjectsTraverser.traverse(), with the margin of each decision
+        positions, magnitudes, extends = cell.get_packed_leaves()
+        view = self.view
+        directions = positions - view.packed_position
+        distances = numpy.sqrt(numpy.einsum('ij,ij->i', directions, directions))
+        limit_distances = units.KmPerParsec * 10 ** ((self.limit - magnitudes) / 5.0 + 1)
+        inside = distances <= 0.0
+        distance_slacks = numpy.abs(limit_distances - distances)
+        distance_slacks[inside] = 0.0
+        add = distances < limit_distances
+        add[inside] = False
+        plane_slack = float('inf')
+        angle_slack = float('inf')
+        if add.any():
+            excess = (positions[add].dot(view.normals.T) + view.offsets).max(axis=1) - extends[add]
+            plane_slacks = numpy.abs(excess)
+            plane_slack = float(plane_slacks.min())
+            angle_slack = float((plane_slacks / distances[add]).min())
+            add[add] = excess <= 0.0
+        add |= inside
+        leaves = cell.leaves
+        visible = [leaves[index] for index in numpy.flatnonzero(add).tolist()]
+        return (visible, float(distance_slacks.min()), plane_slack, angle_slack)
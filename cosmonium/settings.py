@@ -34,6 +34,8 @@ app_name = 'cosmonium'
 
 use_double = LPoint3 == LPoint3d
 cache_yaml = True
+cache_celestia = True
+parsed_cache_max_size = 64 * 1024 * 1024
 prc_file = 'config.prc'
 
 panda11 = PandaSystem.getMajorVersion() >= 1 and PandaSystem.getMinorVersion() >= 11
@@ -71,6 +73,14 @@ deferred=False
 deferred_split=False
 deferred_load=True
 patch_pool_size = 4
+#Generator of the procedural heightmaps, 'gpu' or 'cpu'
+heightmap_generator = 'gpu'
+#Number of threads decoding the textures
+texture_loader_threads = 2
+#Maximum number of patches loaded at the same time
+max_patch_jobs = 16
+#Memory budget of the tiles of the virtual textures
+virtual_texture_cache_size = 256 * 1024 * 1024
 
 mouse_over = False
 use_color_picking = True
@@ -81,6 +91,7 @@ damped_nav = True
 global_ambient = 0.0
 corrected_global_ambient = global_ambient
 max_sprite_size = 800
+galaxy_template_cache_size = 64 * 1024 * 1024
 
 patch_max_vertex_size = 64
 patch_min_density = 32
@@ -95,6 +106,8 @@ patch_parameters_data_store = True
 
 use_patch_adaptation = True
 use_patch_skirts = True
+#Project the cube sphere patches in the vertex shader, all the patches then share the same vertices
+shader_cube_projection = True
 
 render_points = True
 render_sprite_points = True
@@ -102,6 +115,12 @@ show_halo = True
 disable_tint = False
 software_instancing = False
 
+#Only test again the octree cells whose visibility could have changed with the view
+octree_temporal_coherence = True
+#Replace the analytical series by piecewise Chebyshev polynomials
+cache_func_orbits = True
+func_orbits_cache_accuracy = 1 * units.m
+
 allow_shadows = True
 shadow_size = 1024
 shadows_slope_scale_bias = True
@@ -275,6 +294,7 @@ appdirs = AppDirs(app_name)
 cache_dir = appdirs.user_cache_dir
 config_dir = appdirs.user_config_dir
 data_dir = appdirs.user_data_dir
+ephemeris_dir = os.path.join(data_dir, 'ephemeris')
 config_file = os.path.join(config_dir, 'config.yaml')
 
 #Debug flags
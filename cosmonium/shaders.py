@@ -85,6 +85,9 @@ class ShaderBase(object):
         shape.instance.set_shader_inputs(**self.inputs)
         self.inputs = None
 
+    def set_vertex_input(self, vertex_input):
+        return False
+
     def clear_patch(self, shape, patch):
         pass
 
@@ -464,6 +467,7 @@ class VertexShader(ShaderProgram):
             code.append("uniform mat4 p3d_ModelMatrixInverseTranspose;")
         code.append("uniform mat4 p3d_ViewMatrix;")
         code.append("uniform mat4 p3d_ModelViewMatrix;")
+        self.vertex_source.vertex_uniforms(code)
         self.vertex_control.vertex_uniforms(code)
         self.point_control.vertex_uniforms(code)
         self.instance_control.vertex_uniforms(code)
@@ -887,6 +891,7 @@ class BasicShader(StructuredShader):
         self.appearance.data = self.data_source
         self.lighting_model.appearance = self.appearance
         self.vertex_oids = vertex_oids
+        self.vertex_source = vertex_source
         if tessellation_control is not None:
             self.tessellation_control = tessellation_control
             self.tessellation_control.shader = self
@@ -951,6 +956,18 @@ class BasicShader(StructuredShader):
         #TODO: wrong if there is tessellation
         self.vertex_shader.instance_control = instance_control
 
+    def set_vertex_input(self, vertex_input):
+        #The vertex input can only be replaced when there is no tessellation
+        if self.tessellation_eval_shader is not None:
+            return False
+        if vertex_input is None:
+            vertex_input = DirectVertexInput(self)
+        else:
+            vertex_input.config = self
+        self.vertex_source = vertex_input
+        self.vertex_shader.vertex_source = vertex_input
+        return True
+
     def set_scattering(self, scattering):
         self.scattering = scattering
         self.scattering.shader = self
@@ -1121,6 +1138,9 @@ class BasicShader(StructuredShader):
         vc_id = self.vertex_control.get_id()
         if vc_id:
             name += "-" + vc_id
+        vs_id = self.vertex_source.get_id()
+        if vs_id:
+            name += "-" + vs_id
         pc_id = self.point_control.get_id()
         if pc_id:
             name += "-" + pc_id
@@ -1441,7 +1461,7 @@ class TextureAppearance(ShaderAppearance):
             code.append("perceptual_roughness = %s;" % self.data.get_source_for('roughness'))
 
 class VertexInput(ShaderComponent):
-    def __init__(self, config):
+    def __init__(self, config=None):
         ShaderComponent.__init__(self)
         self.config = config
 
@@ -1471,13 +1491,97 @@ class DirectVertexInput(VertexInput):
             for i in range(self.config.nb_textures_coord):
                 code.append("model_texcoord%i = p3d_MultiTexCoord%i;" % (i, i))
         else:
-            #TODO: Should be done here ?
-            code.append("vec3 tmp = model_vertex4.xyz / model_vertex4.w;")
-            code.append("float tmp_len = length(tmp);")
-            code.append("float u = atan(tmp.y, tmp.x) / pi / 2 + 0.5;")
-            code.append("float v = asin(tmp.z / tmp_len) / pi + 0.5;")
-            code.append("model_texcoord0 = vec4(fract(u), v, 0, 1);")
-            code.append("model_texcoord0p = vec4(fract(u + 0.5) - 0.5, v, 0, 1);")
+            self.generate_texcoord(code)
+
+    def generate_texcoord(self, code):
+        #TODO: Should be done here ?
+        code.append("vec3 tmp = model_vertex4.xyz / model_vertex4.w;")
+        code.append("float tmp_len = length(tmp);")
+        code.append("float u = atan(tmp.y, tmp.x) / pi / 2 + 0.5;")
+        code.append("float v = asin(tmp.z / tmp_len) / pi + 0.5;")
+        code.append("model_texcoord0 = vec4(fract(u), v, 0, 1);")
+        code.append("model_texcoord0p = vec4(fract(u + 0.5) - 0.5, v, 0, 1);")
+
+class CubePatchVertexInput(DirectVertexInput):
+    #The vertices are the shared grid created by geometry.SquarePatchTemplate(), with the u, v coordinates
+    #in the patch and the skirt flag. They are projected on the sphere using the patch_xy and patch_height inputs.
+    #To keep the precision on small patches, the position is computed relative to the centre of the patch.
+
+    def vertex_uniforms(self, code):
+        code.append("uniform vec4 patch_xy;")
+        code.append("uniform vec3 patch_height;")
+
+    def vertex_inputs(self, code):
+        code.append("in vec4 p3d_Vertex;")
+
+    def vertex_shader(self, code):
+        code.append("vec3 patch_normal;")
+        code.append("vec3 patch_position;")
+        code.append("vec3 patch_tangent;")
+        code.append("vec3 patch_binormal;")
+        code.append("vec3 patch_centre_normal;")
+        code.append("cube_patch_project(patch_xy.xy + patch_xy.zw - 1.0, (2.0 * p3d_Vertex.xy - 1.0) * (patch_xy.zw - patch_xy.xy),")
+        code.append("                   patch_normal, patch_position, patch_tangent, patch_binormal, patch_centre_normal);")
+        code.append("model_vertex4 = vec4(patch_position * patch_height.x + patch_centre_normal * (patch_height.y - p3d_Vertex.z * patch_height.z), 1.0);")
+        if self.config.use_normal or self.config.vertex_control.use_normal:
+            code.append("model_normal4 = vec4(patch_normal, 0.0);")
+        if self.config.use_tangent:
+            code.append("model_tangent4 = vec4(normalize(patch_tangent), 0.0);")
+            code.append("model_binormal4 = vec4(normalize(patch_binormal), 0.0);")
+        if self.config.use_model_texcoord:
+            for i in range(self.config.nb_textures_coord):
+                code.append("model_texcoord%i = vec4(p3d_Vertex.xy, 0.0, 1.0);" % i)
+        else:
+            self.generate_texcoord(code)
+
+class NormalizedCubePatchVertexInput(CubePatchVertexInput):
+    def get_id(self):
+        return "normcube"
+
+    def vertex_extra(self, code):
+        code += ['''
+void cube_patch_project(in vec2 centre, in vec2 delta,
+                        out vec3 normal, out vec3 position, out vec3 tangent, out vec3 binormal, out vec3 centre_normal)
+{
+    vec3 centre3 = vec3(centre, 1.0);
+    vec3 point = vec3(centre + delta, 1.0);
+    float centre_length = length(centre3);
+    float point_length = length(point);
+    float delta_inv_length = -(2.0 * dot(centre, delta) + dot(delta, delta)) / (centre_length * point_length * (centre_length + point_length));
+    normal = point / point_length;
+    centre_normal = centre3 / centre_length;
+    position = vec3(delta, 0.0) / point_length + centre3 * delta_inv_length;
+    tangent = vec3(1.0 + point.y * point.y, -point.x * point.y, -point.x);
+    binormal = vec3(point.x * point.y, 1.0 + point.x * point.x, -point.y);
+}
+''']
+
+class SquaredDistanceCubePatchVertexInput(CubePatchVertexInput):
+    def get_id(self):
+        return "sqrtcube"
+
+    def vertex_extra(self, code):
+        code += ['''
+void cube_patch_project(in vec2 centre, in vec2 delta,
+                        out vec3 normal, out vec3 position, out vec3 tangent, out vec3 binormal, out vec3 centre_normal)
+{
+    vec2 point = centre + delta;
+    vec2 centre2 = centre * centre;
+    vec2 point2 = point * point;
+    vec2 delta2 = delta * (point + centre);
+    vec2 centre_scale = sqrt(0.5 - centre2.yx / 6.0);
+    vec2 point_scale = sqrt(0.5 - point2.yx / 6.0);
+    float centre_z = sqrt(1.0 - centre2.x * 0.5 - centre2.y * 0.5 + centre2.x * centre2.y / 3.0);
+    float point_z = sqrt(1.0 - point2.x * 0.5 - point2.y * 0.5 + point2.x * point2.y / 3.0);
+    vec2 delta_scale = -delta2.yx / 6.0 / (point_scale + centre_scale);
+    float delta_z2 = -delta2.x * 0.5 - delta2.y * 0.5 + (delta2.x * point2.y + centre2.x * delta2.y) / 3.0;
+    normal = vec3(point * point_scale, point_z);
+    centre_normal = vec3(centre * centre_scale, centre_z);
+    position = vec3(delta * point_scale + centre * delta_scale, delta_z2 / (point_z + centre_z));
+    tangent = vec3(1.0, point.x * point.y * (1.0 / 3.0 - 0.5), point.x * (point2.y / 3.0 - 0.5));
+    binormal = vec3(point.x * point.y * (1.0 / 3.0 - 0.5), 1.0, point.y * (point2.x / 3.0 - 0.5));
+}
+''']
 
 class QuadTessellationVertexInput(VertexInput):
     def __init__(self, invert_v=False, shader=None):
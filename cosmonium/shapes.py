@@ -33,6 +33,7 @@ from .shaders import AutoShader
 from .dircontext import defaultDirContext
 from .mesh import load_model, load_panda_model
 from .shadows import MultiShadows
+from .patchscheduler import patchLoadScheduler
 from .parameters import ParametersGroup, AutoUserParameter, UserParameter
 
 from . import geometry
@@ -68,6 +69,8 @@ class Shape:
     offset = False
     use_collision_solid = False
     deferred_instance = False
+    #True when the vertices of the shape are created by the vertex input of the shader
+    shader_vertex_input = False
 
     def __init__(self):
         self.instance = None
@@ -97,6 +100,9 @@ class Shape:
     def get_data_source(self):
         return None
 
+    def get_vertex_input(self):
+        return None
+
     def task_done(self, task):
         self.task = None
 
@@ -256,11 +262,13 @@ class ShapeObject(VisibleObject):
         VisibleObject.__init__(self, name)
         self.sources = []
         self.shape = None
+        self.shader = None
         self.set_shape(shape)
         self.appearance = appearance
         if shader is None:
             shader = AutoShader()
         self.shader = shader
+        self.configure_vertex_input()
         self.clickable = clickable
         self.sources.append(self.appearance)
         self.instance_ready = False
@@ -304,6 +312,13 @@ class ShapeObject(VisibleObject):
             data_source = self.shape.get_data_source()
             if data_source is not None:
                 self.sources.append(data_source)
+            self.configure_vertex_input()
+
+    def configure_vertex_input(self):
+        if self.shape is None or self.shader is None: return
+        vertex_input = self.shape.get_vertex_input()
+        accepted = self.shader.set_vertex_input(vertex_input)
+        self.shape.shader_vertex_input = vertex_input is not None and accepted
 
     def set_owner(self, owner):
         self.owner = owner
@@ -318,6 +333,7 @@ class ShapeObject(VisibleObject):
 
     def set_shader(self, shader):
         self.shader = shader
+        self.configure_vertex_input()
 
     def add_after_effect(self, after_effect):
         if self.shader is not None:
@@ -445,11 +461,11 @@ class ShapeObject(VisibleObject):
     def schedule_jobs(self):
         if self.shape.patchable:
             for patch in self.shape.patches:
-                if not patch.instance_ready and patch.task is None:
+                if not patch.instance_ready and patch.task is None and not patchLoadScheduler.is_scheduled(patch):
                     # Patch generation is ongoing, use parent data to display the patch in the meantime
                     self.early_apply_patch(patch)
                     #print("SCHEDULE", patch.str_id())
-                    patch.task = taskMgr.add(self.patch_task(patch), uponDeath=patch.task_done)
+                    patchLoadScheduler.schedule(self, patch)
         if not self.shape.instance_ready and self.shape.task is None:
             self.shape.task = taskMgr.add(self.shape_task(self.shape), uponDeath=self.shape.task_done)
 
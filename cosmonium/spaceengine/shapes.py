@@ -85,6 +85,10 @@ class SpaceEnginePatchedSquareShape(NormalizedSquareShape):
         NormalizedSquareShape.__init__(self, *args, **kwargs)
         self.face_unique = True
 
+    def get_vertex_input(self):
+        #The patches use inverted and swapped texture coordinates, they are created on the CPU
+        return None
+
     def create_patch(self, parent, lod, face, x, y):
         density = self.lod_control.get_density_for(lod)
         (min_radius, max_radius, mean_radius) = self.get_patch_limits(parent)
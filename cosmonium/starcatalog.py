@@ -0,0 +1,374 @@
+#
+#This file is part of Cosmonium.
+#
+#Copyright (C) 2018-2019 Laurent Deru.
+#
+#Cosmonium is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+#
+#Cosmonium is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License
+#along with Cosmonium.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+from __future__ import print_function
+from __future__ import absolute_import
+
+from panda3d.core import LPoint3d
+
+from .bodies import Star
+from .bodyclass import bodyClasses
+from .catalogs import objectsDB, NamesIndex
+from .astro.orbits import FixedPosition
+from .astro.rotations import UnknownRotation
+from .astro.frame import j2000BarycentricEclipticReferenceFrame
+from .astro.spectraltype import spectralTypeIntDecoder
+from .astro.blackbody import temp_to_RGB
+from .astro import units
+from .utils import srgb_to_linear
+from . import settings
+
+import numpy
+
+class CatalogStar(object):
+    #Lightweight octree leaf standing for an entry of a StarCatalog
+    __slots__ = ('catalog', 'index', 'update_id')
+
+    def __init__(self, catalog, index):
+        self.catalog = catalog
+        self.index = index
+        self.update_id = 0
+
+    def get_name(self):
+        return self.catalog.get_names(self.index)[0]
+
+    @property
+    def abs_magnitude(self):
+        return float(self.catalog.abs_magnitudes[self.index])
+
+    def get_abs_magnitude(self):
+        return float(self.catalog.abs_magnitudes[self.index])
+
+    @property
+    def _global_position(self):
+        return LPoint3d(*self.catalog.positions[self.index])
+
+    def get_global_position(self):
+        return LPoint3d(*self.catalog.positions[self.index])
+
+    @property
+    def _extend(self):
+        return float(self.catalog.extends[self.index])
+
+    def get_extend(self):
+        return float(self.catalog.extends[self.index])
+
+    def get_star(self):
+        return self.catalog.stars.get(self.index)
+
+    def remove_instance(self):
+        star = self.catalog.stars.get(self.index)
+        if star is not None:
+            star.remove_instance()
+
+class StarCatalog(object):
+    context = None
+    body_class = 'star'
+    #Maximum number of generated designations returned for each number of extra digits
+    max_designations = 10
+
+    def __init__(self, cat_no, positions, abs_magnitudes, spectral_types, names=None, surface_factory=None):
+        self.cat_no = cat_no
+        self.positions = positions
+        self.abs_magnitudes = abs_magnitudes
+        self.spectral_types = spectral_types
+        if names is None:
+            names = {}
+        if isinstance(names, dict):
+            names = NamesIndex.from_dict(names)
+        self.names = names
+        self.surface_factory = surface_factory
+        self.size = len(cat_no)
+        self.parent = None
+        self.base_oid = None
+        #Star objects are only created when needed
+        self.stars = {}
+        self.materialized = numpy.zeros(self.size, dtype=bool)
+        self.removed = numpy.zeros(self.size, dtype=bool)
+        self.cat_no_order = None
+        self.calc_spectral_params()
+        #Per frame state of the visible entries that are only rendered as points
+        self.time = 0.0
+        self.observer = None
+        self.visible_list = []
+        self.visible_stars = []
+        self.promoted = []
+        self.reset_points(numpy.zeros(0, dtype=numpy.intp))
+        objectsDB.add_catalog(self)
+
+    def calc_spectral_params(self):
+        spectral_types, self.type_index = numpy.unique(self.spectral_types, return_inverse=True)
+        self.type_index = self.type_index.reshape(-1)
+        nb_types = len(spectral_types)
+        temperatures = numpy.empty(nb_types)
+        white_dwarfs = numpy.empty(nb_types, dtype=bool)
+        self.type_colors = numpy.empty((nb_types, 4), dtype=numpy.float32)
+        for (i, value) in enumerate(spectral_types):
+            spectral_type = spectralTypeIntDecoder.decode(int(value))
+            temperatures[i] = spectral_type.temperature
+            white_dwarfs[i] = spectral_type.white_dwarf
+            self.type_colors[i] = srgb_to_linear(temp_to_RGB(spectral_type.temperature))
+        #Same relation as temp_to_radius()
+        temperature_ratios = units.sun_temperature / temperatures[self.type_index]
+        luminosity_ratios = numpy.power(10.0, 0.4 * (units.sun_abs_magnitude - self.abs_magnitudes))
+        self.extends = temperature_ratios * temperature_ratios * numpy.sqrt(luminosity_ratios) * units.sun_radius
+        #TODO: Find radius-luminosity relationship or use mass
+        self.extends[white_dwarfs[self.type_index]] = 7000.0
+
+    def set_parent(self, parent):
+        self.parent = parent
+
+    def get_names(self, index):
+        cat_no = int(self.cat_no[index])
+        names = self.names.get_names(cat_no)
+        #The catalogue designation is generated only when needed
+        if names is None:
+            names = []
+        names.append("HIP %d" % cat_no)
+        return names
+
+    def get_sorted_cat_no(self):
+        if self.cat_no_order is None:
+            self.cat_no_order = numpy.argsort(self.cat_no, kind='stable')
+        return self.cat_no[self.cat_no_order]
+
+    def find_index(self, cat_no):
+        position = numpy.searchsorted(self.get_sorted_cat_no(), cat_no)
+        if position < self.size:
+            index = int(self.cat_no_order[position])
+            if self.cat_no[index] == cat_no:
+                return index
+        return None
+
+    def find_by_name(self, name_up):
+        cat_no = self.names.find(name_up)
+        if cat_no is None and name_up.startswith('HIP '):
+            try:
+                cat_no = int(name_up[4:])
+            except ValueError:
+                pass
+        if cat_no is None:
+            return None
+        index = self.find_index(cat_no)
+        if index is None:
+            return None
+        return self.get_star(index)
+
+    def find_indexes(self, cat_nos):
+        #Vectorized find_index(), the unknown catalogue numbers get the index -1
+        cat_nos = numpy.asarray(cat_nos, dtype=self.cat_no.dtype)
+        if self.size == 0:
+            return numpy.full(len(cat_nos), -1, dtype=numpy.intp)
+        sorted_cat_no = self.get_sorted_cat_no()
+        positions = numpy.minimum(numpy.searchsorted(sorted_cat_no, cat_nos), self.size - 1)
+        indexes = self.cat_no_order[positions].astype(numpy.intp)
+        indexes[sorted_cat_no[positions] != cat_nos] = -1
+        return indexes
+
+    def filter_available(self, indexes):
+        #Instanciated stars are already known by the objects database
+        available = indexes >= 0
+        found = indexes[available]
+        available[available] = ~(self.materialized[found] | self.removed[found])
+        return available
+
+    def find_designations(self, digits):
+        #The catalogue numbers starting with the given digits are in one range per number of extra digits,
+        #only the first max_designations of each range are returned
+        sorted_cat_no = self.get_sorted_cat_no()
+        prefix = int(digits)
+        result = []
+        for extra in range(10 - len(digits) + 1):
+            start = numpy.searchsorted(sorted_cat_no, prefix * 10 ** extra, 'left')
+            end = numpy.searchsorted(sorted_cat_no, (prefix + 1) * 10 ** extra, 'left')
+            result.append(self.cat_no_order[start:min(end, start + self.max_designations)])
+        return numpy.concatenate(result)
+
+    def startswith(self, text):
+        #The stars are only instanciated when selected, the objects database will resolve them by name
+        matches = self.names.startswith(text)
+        result = []
+        if len(matches) > 0:
+            available = self.filter_available(self.find_indexes([cat_no for (name, cat_no) in matches]))
+            result = [(name, None) for ((name, cat_no), keep) in zip(matches, available.tolist()) if keep]
+        digits = text[4:]
+        if text.startswith('HIP ') and digits.isdigit() and digits[0] != '0':
+            indexes = self.find_designations(digits)
+            indexes = indexes[self.filter_available(indexes)]
+            result += [("HIP %d" % cat_no, None) for cat_no in self.cat_no[indexes].tolist()]
+        return result
+
+    def get_leaves(self):
+        return [CatalogStar(self, index) for index in numpy.flatnonzero(~self.removed).tolist()]
+
+    def get_star(self, index):
+        star = self.stars.get(index)
+        if star is None and not self.removed[index]:
+            star = self.create_star(index)
+            self.stars[index] = star
+            self.materialized[index] = True
+        return star
+
+    def create_star(self, index):
+        orbit = FixedPosition(position=LPoint3d(*self.positions[index]), frame=j2000BarycentricEclipticReferenceFrame)
+        star = Star(self.get_names(index), source_names=[],
+                    surface_factory=self.surface_factory,
+                    spectral_type=spectralTypeIntDecoder.decode(int(self.spectral_types[index])),
+                    abs_magnitude=float(self.abs_magnitudes[index]),
+                    orbit=orbit,
+                    rotation=UnknownRotation())
+        objectsDB.set_oid(star, self.base_oid + index)
+        star.set_parent(self.parent)
+        return star
+
+    def remove_star(self, star):
+        if star.oid is None: return False
+        index = star.oid - self.base_oid
+        if index < 0 or index >= self.size or self.stars.get(index) is not star: return False
+        del self.stars[index]
+        self.materialized[index] = False
+        self.removed[index] = True
+        star.set_parent(None)
+        return True
+
+    def start_update(self):
+        self.visible_list = []
+
+    def add_visible(self, index):
+        self.visible_list.append(index)
+
+    def end_update(self):
+        indices = numpy.array(self.visible_list, dtype=numpy.intp)
+        indices = indices[~self.removed[indices]]
+        materialized = self.materialized[indices]
+        self.visible_stars = [self.stars[index] for index in indices[materialized].tolist()]
+        self.reset_points(indices[~materialized])
+
+    def reset_points(self, points):
+        self.points = points
+        self.rel_positions = numpy.zeros((len(points), 3))
+        self.distances = numpy.zeros(len(points))
+        self.visible_sizes = numpy.zeros(len(points))
+        self.app_magnitudes = numpy.zeros(len(points))
+        self.promoted = []
+
+    def keep_points(self, keep):
+        self.points = self.points[keep]
+        self.rel_positions = self.rel_positions[keep]
+        self.distances = self.distances[keep]
+        self.visible_sizes = self.visible_sizes[keep]
+        self.app_magnitudes = self.app_magnitudes[keep]
+
+    def promote(self, index):
+        star = self.get_star(index)
+        star.update(self.time, 0)
+        star.update_obs(self.observer)
+        self.promoted.append(star)
+        return star
+
+    def update(self, time, dt):
+        #Catalog stars have a fixed position, there is nothing to update
+        self.time = time
+
+    def update_obs(self, observer):
+        self.observer = observer
+        if len(self.points) == 0: return
+        camera_global_pos = numpy.array(observer.camera_global_pos)
+        camera_local_pos = numpy.array(observer._position)
+        self.rel_positions = self.positions[self.points] - camera_global_pos - camera_local_pos
+        self.distances = numpy.sqrt(numpy.einsum('ij,ij->i', self.rel_positions, self.rel_positions))
+
+    def promote_nearest(self, nearest):
+        if len(self.points) == 0: return None
+        i = numpy.argmin(self.distances)
+        if nearest is not None and self.distances[i] >= nearest.distance_to_obs: return None
+        star = self.promote(int(self.points[i]))
+        keep = numpy.ones(len(self.points), dtype=bool)
+        keep[i] = False
+        self.keep_points(keep)
+        return star
+
+    def check_visibility(self, pixel_size):
+        if len(self.points) == 0: return []
+        distances = numpy.maximum(self.distances, 1e-6)
+        self.visible_sizes = self.extends[self.points] / (distances * pixel_size)
+        self.app_magnitudes = self.abs_magnitudes[self.points] + 5 * (numpy.log10(distances / units.KmPerParsec) - 1)
+        #Resolved and labelled stars need the full Star object
+        promote = self.visible_sizes > settings.min_body_size
+        if bodyClasses.get_show_label(self.body_class):
+            promote |= self.app_magnitudes < settings.label_lowest_app_magnitude
+        promoted = []
+        if promote.any():
+            for index in self.points[promote].tolist():
+                star = self.promote(index)
+                star.check_visibility(pixel_size)
+                promoted.append(star)
+            self.keep_points(~promote)
+        return promoted
+
+    def calc_scene_positions(self):
+        if settings.camera_at_origin:
+            obj_positions = self.rel_positions
+        else:
+            obj_positions = self.positions[self.points]
+        midPlane = self.observer.midPlane
+        distances = self.distances / settings.scale
+        positions = obj_positions / settings.scale
+        if settings.use_depth_scaling:
+            far = distances > midPlane
+            if settings.use_inv_scaling:
+                scaled_distances = midPlane * (1 - midPlane / distances[far])
+            else:
+                scaled_distances = midPlane * (1 - numpy.log2(midPlane / distances[far] + 1))
+            directions = self.rel_positions[far] / self.distances[far, numpy.newaxis]
+            positions[far] = directions * (midPlane + scaled_distances)[:, numpy.newaxis]
+        return positions
+
+    def calc_oid_colors(self):
+        oids = self.points + self.base_oid
+        oid_colors = numpy.empty((len(oids), 4), dtype=numpy.float32)
+        oid_colors[:, 0] = (oids & 0xFF) / 255.0
+        oid_colors[:, 1] = ((oids >> 8) & 0xFF) / 255.0
+        oid_colors[:, 2] = ((oids >> 16) & 0xFF) / 255.0
+        oid_colors[:, 3] = 1.0
+        return oid_colors
+
+    def check_and_update_instance(self, camera_pos, camera_rot, pointset):
+        if len(self.points) == 0 or not bodyClasses.get_show(self.body_class): return
+        app_magnitudes = self.app_magnitudes
+        #Same as mag_to_scale()
+        scales = settings.min_mag_scale + (1 - settings.min_mag_scale) * (settings.lowest_app_magnitude - app_magnitudes) / (settings.lowest_app_magnitude - settings.max_app_magnitude)
+        scales[app_magnitudes < settings.max_app_magnitude] = 1.0
+        scales[app_magnitudes > settings.lowest_app_magnitude] = 0.0
+        shown = scales > 0
+        if not shown.any(): return
+        self.keep_points(shown)
+        scales = scales[shown]
+        point_colors = self.type_colors[self.type_index[self.points]]
+        colors = point_colors * scales[:, numpy.newaxis]
+        sizes = numpy.maximum(settings.min_point_size, settings.min_point_size + scales * settings.mag_pixel_scale)
+        positions = self.calc_scene_positions()
+        oid_colors = self.calc_oid_colors()
+        pointset.add_points(positions, colors, sizes, oid_colors)
+        if settings.show_halo:
+            halos = self.app_magnitudes < settings.smallest_glare_mag
+            if halos.any():
+                coefs = settings.smallest_glare_mag - self.app_magnitudes[halos] + 6.0
+                halo_sizes = numpy.maximum(self.visible_sizes[halos], 1.0) * coefs * 2.0
+                self.context.haloset.add_points(positions[halos], point_colors[halos], halo_sizes, oid_colors[halos])
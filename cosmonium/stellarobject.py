@@ -103,6 +103,8 @@ class StellarObject(LabelledObject):
     virtual_object = False
     support_offset_body_center = True
     background = False
+    #Incremented when the body moves, used by the frames to know when their cached values are outdated
+    update_id = 0
     nb_update = 0
     nb_obs = 0
     nb_visibility = 0
@@ -456,6 +458,7 @@ class StellarObject(LabelledObject):
         self._local_position = self.orbit.get_position_at(time)
         self._global_position = self.parent._global_position + self.orbit.get_global_position_at(time)
         self._position = self._global_position + self._local_position
+        self.update_id += 1
         if self.star is not None:
             (self.vector_to_star, self.distance_to_star) = self.calc_local_distance_to(self.star.get_local_position())
         CompositeObject.update(self, time, dt)
@@ -27,6 +27,8 @@ from .shaders import ShaderSphereSelfShadow
 from math import floor, ceil
 from panda3d.core import LVector3
 
+import numpy
+
 class SurfaceCategory(object):
     def __init__(self, name):
         self.name = name
@@ -257,11 +259,8 @@ class HeightmapSurface(EllipsoidSurface):
         dy = v * heightmap.height - y0
         if y1 != y0:
             dy /= y1 - y0
-        h_00 = heightmap.get_height(x0, y0)
-        h_01 = heightmap.get_height(x0, y1)
-        h_10 = heightmap.get_height(x1, y0)
-        h_11 = heightmap.get_height(x1, y1)
-        return h_00 + (h_10 - h_00) * dx + (h_01 - h_00) * dy + (h_00 + h_11 - h_01 - h_10) * dx * dy
+        (h_00, h_01, h_10, h_11) = heightmap.get_heights(numpy.array([x0, x0, x1, x1]), numpy.array([y0, y1, y0, y1]))
+        return float(h_00 + (h_10 - h_00) * dx + (h_01 - h_00) * dy + (h_00 + h_11 - h_01 - h_10) * dx * dy)
 
     def get_height_patch(self, patch, u, v, strict=False):
         patch_data = self.heightmap.get_patch_data(patch)
@@ -338,11 +337,8 @@ class HeightmapFlatSurface(FlatSurface):
         dy = v * heightmap.height - y0
         if y1 != y0:
             dy /= y1 - y0
-        h_00 = heightmap.get_height(x0, y0)
-        h_01 = heightmap.get_height(x0, y1)
-        h_10 = heightmap.get_height(x1, y0)
-        h_11 = heightmap.get_height(x1, y1)
-        return h_00 + (h_10 - h_00) * dx + (h_01 - h_00) * dy + (h_00 + h_11 - h_01 - h_10) * dx * dy
+        (h_00, h_01, h_10, h_11) = heightmap.get_heights(numpy.array([x0, x0, x1, x1]), numpy.array([y0, y1, y0, y1]))
+        return float(h_00 + (h_10 - h_00) * dx + (h_01 - h_00) * dy + (h_00 + h_11 - h_01 - h_10) * dx * dy)
 
     def get_height_patch(self, patch, u, v, strict=False):
         patch_data = self.heightmap.get_patch_data(patch)
@@ -23,11 +23,14 @@ from __future__ import absolute_import
 
 from panda3d.core import TextureStage, Texture, LColor, PNMImage, CS_linear, CS_sRGB
 
-from .dircontext import defaultDirContext
+from .dircontext import defaultDirContext, directoryIndex
 from .utils import TransparencyBlend
+from .patchkey import parent_patch_key
 from . import workers
 from . import settings
 
+from collections import OrderedDict
+from weakref import WeakKeyDictionary, finalize
 import os
 
 class TexCoord(object):
@@ -274,7 +277,7 @@ class TextureFileSource(TextureSource):
                 if settings.sync_texture_load:
                     texture = workers.syncTextureLoader.load_texture(filename)
                 else:
-                    texture = await workers.asyncTextureLoader.load_texture(filename, None)
+                    texture = await workers.asyncTextureLoader.load_texture(filename, None, workers.AsyncLoader.PRIORITY_HIGH)
                 if texture is not None:
                     self.texture = texture
                     self.loaded = True
@@ -589,11 +592,130 @@ class HeightMapTexture(DataTexture):
     def get_default_color(self):
         return (0, 0, 0, 0)
 
+class TileCache(object):
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self.tiles = OrderedDict()
+        #Number of cached descendants of each tile, the ancestors of a cached tile are its fallback
+        #in find_parent() and are not evicted while it is cached
+        self.descendants = {}
+        #The sources are not kept alive by the cache, their tiles are removed when they are deleted
+        self.sources = WeakKeyDictionary()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_source_key(self, source, create=False):
+        source_key = self.sources.get(source)
+        if source_key is None and create:
+            source_key = object()
+            self.sources[source] = source_key
+            finalize(source, self.remove_source_key, source_key)
+        return source_key
+
+    def get(self, source, patch):
+        key = (self.get_source_key(source), patch.key)
+        entry = self.tiles.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if entry[2] is not patch:
+            #The patch has been recreated since the tile was loaded
+            entry = (entry[0], entry[1], patch)
+            self.tiles[key] = entry
+        self.tiles.move_to_end(key)
+        return entry[0]
+
+    def contains(self, source, patch):
+        return (self.get_source_key(source), patch.key) in self.tiles
+
+    def peek(self, source, patch):
+        entry = self.tiles.get((self.get_source_key(source), patch.key))
+        if entry is not None:
+            return entry[0]
+
+    def find_parent(self, source, patch):
+        #The keys of the parents are derived from the key of the patch, there is no need to walk the patches
+        source_key = self.get_source_key(source)
+        if source_key is None: return None
+        key = parent_patch_key(patch.key)
+        while key is not None:
+            entry = self.tiles.get((source_key, key))
+            if entry is not None:
+                self.tiles.move_to_end((source_key, key))
+                return entry[0]
+            key = parent_patch_key(key)
+        return None
+
+    def add(self, source, patch, texture_info):
+        key = (self.get_source_key(source, create=True), patch.key)
+        self.remove_key(key)
+        size = texture_info[0].estimate_texture_memory()
+        self.tiles[key] = (texture_info, size, patch)
+        self.size += size
+        self.update_descendants(key, 1)
+        self.evict()
+
+    def update_descendants(self, key, delta):
+        (source_key, patch_key) = key
+        parent_key = parent_patch_key(patch_key)
+        while parent_key is not None:
+            ancestor = (source_key, parent_key)
+            count = self.descendants.get(ancestor, 0) + delta
+            if count > 0:
+                self.descendants[ancestor] = count
+            else:
+                del self.descendants[ancestor]
+            parent_key = parent_patch_key(parent_key)
+
+    def remove_key(self, key):
+        entry = self.tiles.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+            self.update_descendants(key, -1)
+
+    def remove(self, source, patch):
+        self.remove_key((self.get_source_key(source), patch.key))
+
+    def remove_source(self, source):
+        source_key = self.sources.pop(source, None)
+        if source_key is not None:
+            self.remove_source_key(source_key)
+
+    def remove_source_key(self, source_key):
+        for key in [key for key in self.tiles if key[0] is source_key]:
+            self.remove_key(key)
+
+    def evict(self):
+        #The least recently used tiles are at the front of the cache
+        nb_tiles = len(self.tiles)
+        while self.size > self.max_size and nb_tiles > 0:
+            nb_tiles -= 1
+            (key, entry) = self.tiles.popitem(last=False)
+            if entry[2].instance is not None or key in self.descendants:
+                #The tiles of the patches still instanciated, or used as fallback by cached tiles, can not be evicted
+                self.tiles[key] = entry
+                continue
+            self.size -= entry[1]
+            self.update_descendants(key, -1)
+            self.evictions += 1
+
+    def get_stats(self):
+        return {'tiles': len(self.tiles),
+                'size': self.size,
+                'max-size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions}
+
+tileCache = TileCache(settings.virtual_texture_cache_size)
+
 class VirtualTextureSource(TextureSource):
     cached = False
     def __init__(self, root, ext, size, attribution=None, context=defaultDirContext):
         TextureSource.__init__(self, attribution)
-        self.map_patch = {}
         self.root = root
         self.ext = ext
         self.texture_size = size
@@ -613,19 +735,16 @@ class VirtualTextureSource(TextureSource):
 
     def can_split(self, patch):
         tex_name = self.child_texture_name(patch)
-        exists = os.path.isfile(tex_name)
+        #The directory listings are cached, this avoids a stat() on each LOD check
+        exists = directoryIndex.find(tex_name) is not None
         return exists
 
     def find_parent_texture_for(self, patch):
-        parent_patch = patch.parent
-        while parent_patch is not None and parent_patch.str_id() not in self.map_patch:
-            parent_patch = parent_patch.parent
-        if parent_patch is not None:
-            return self.map_patch[parent_patch.str_id()]
+        return tileCache.find_parent(self, patch)
 
     async def load(self, tasks_tree, patch, color_space=None):
-        texture_info = None
-        if not patch.str_id() in self.map_patch:
+        texture_info = tileCache.get(self, patch)
+        if texture_info is None:
             tex_name = self.texture_name(patch)
             filename = self.context.find_texture(tex_name)
             alpha_tex_name = self.alpha_texture_name(patch)
@@ -634,36 +753,34 @@ class VirtualTextureSource(TextureSource):
                 if settings.sync_texture_load:
                     texture = workers.syncTextureLoader.load_texture(filename, alpha_filename)
                 else:
-                    texture = await workers.asyncTextureLoader.load_texture(filename, alpha_filename)
+                    #Load the visible and nearest patches first
+                    node = patch.quadtree_node
+                    priority = workers.AsyncLoader.PRIORITY_NORMAL if node.patch_in_view else workers.AsyncLoader.PRIORITY_LOW
+                    texture = await workers.asyncTextureLoader.load_texture(filename, alpha_filename, priority, node.distance)
                 if texture is not None:
                     texture_info = (texture, self.texture_size, patch.lod)
-                    self.map_patch[patch.str_id()] = texture_info
+                    tileCache.add(self, patch, texture_info)
             else:
                 print("File", tex_name, "not found")
             if texture_info is None:
                 texture_info = self.find_parent_texture_for(patch)
-        else:
-            texture_info = self.map_patch[patch.str_id()]
         return texture_info
 
     def clear_patch(self, patch):
-        try:
-            del self.map_patch[patch.str_id()]
-        except KeyError:
-            pass
+        #The tile is kept until the cache is over budget, the patch might be created again soon
+        tileCache.evict()
 
     def clear_all(self):
-        self.map_patch = {}
+        tileCache.remove_source(self)
 
     def get_texture(self, patch, strict=False):
-        if patch.str_id() in self.map_patch:
-            return self.map_patch[patch.str_id()]
+        texture_info = tileCache.peek(self, patch)
+        if texture_info is not None:
+            return texture_info
         elif not strict:
-            parent_patch = patch.parent
-            while parent_patch is not None and parent_patch.str_id() not in self.map_patch:
-                parent_patch = parent_patch.parent
-            if parent_patch is not None:
-                return self.map_patch[parent_patch.str_id()]
+            texture_info = tileCache.find_parent(self, patch)
+            if texture_info is not None:
+                return texture_info
             else:
                 return (None, self.texture_size, patch.lod)
         else:
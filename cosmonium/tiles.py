@@ -25,6 +25,7 @@ from panda3d.core import NodePath
 
 from .patchedshapes import CullingFrustum, QuadTreeNode, PatchBase, PatchedShapeBase, BoundingBoxShape, PatchLayer
 from .textures import TexCoord
+from .patchkey import make_patch_key
 from . import geometry
 from . import settings
 
@@ -39,6 +40,7 @@ class Tile(PatchBase):
         self.face = -1
         self.size = 1.0 / (1 << lod)
         self.half_size = self.size / 2.0
+        self.key = make_patch_key(self.face, lod, int(round(x / self.size)), int(round(y / self.size)))
 
         self.x0 = x
         self.y0 = y
@@ -93,8 +95,8 @@ class GpuPatchTerrainLayer(PatchLayer):
 class MeshTerrainLayer(PatchLayer):
     template = {}
     def create_instance(self, patch):
-        tile_id = str(patch.size) + '-' + str(patch.tessellation_inner_level) + '-' + '-'.join(map(str, patch.tessellation_outer_level))
-        #print(tile_id)
+        tile_id = (patch.size, patch.tessellation_inner_level, tuple(patch.tessellation_outer_level),
+                   settings.use_patch_adaptation, settings.use_patch_skirts)
         if tile_id not in self.template:
             self.template[tile_id] = geometry.Tile(1.0,
                                                    geometry.TesselationInfo(patch.tessellation_inner_level, patch.tessellation_outer_level),
@@ -49,7 +49,10 @@ class Query:
         body = None
         if self.current_selection is not None:
             if self.current_selection < len(self.current_list):
-                body = self.current_list[self.current_selection][1]
+                (name, body) = self.current_list[self.current_selection]
+                if body is None:
+                    #Catalogue entries are only resolved when selected
+                    body = self.owner.get_object(name)
         else:
             text = self.query.get()
             body = self.owner.get_object(text)
@@ -20,18 +20,20 @@
 from __future__ import print_function
 from __future__ import absolute_import
 
-from panda3d.core import LPoint3d, LVector3d, LQuaterniond
+from panda3d.core import LPoint3d, LVector3d, LQuaterniond, LMatrix4
 
-from .astro.orbits import FixedOrbit
+from .astro.orbits import FixedOrbit, EllipticalOrbit, update_elliptical_orbits
 from .astro.rotations import FixedRotation
 from .astro.astro import app_to_abs_mag
-from .astro.frame import AbsoluteReferenceFrame
+from .astro.frame import AbsoluteReferenceFrame, FramesCache
 from .astro import units
 
 from .foundation import CompositeObject
 from .systems import StellarSystem
-from .octree import OctreeNode, OctreeLeaf, InfiniteFrustum, VisibleObjectsTraverser, hasOctreeLeaf
+from .octree import OctreeNode, OctreeLeaf, InfiniteFrustum, VisibleObjectsTraverser, CoherentVisibleObjectsTraverser, hasOctreeLeaf
+from .starcatalog import CatalogStar
 from .pstats import pstat
+from . import settings
 
 from math import sqrt
 from time import time
@@ -50,9 +52,16 @@ class Universe(StellarSystem):
                              LPoint3d(10 * units.Ly, 10 * units.Ly, 10 * units.Ly),
                              self.octree_width,
                              abs_mag)
+        self.star_catalogs = []
         self.update_id = 0
-        self.previous_leaves = []
+        self.octree_view = None
+        self.octree_traverser = None
         self.to_update_leaves = []
+        self.visibles = []
+        self.visible_objects = []
+        self.visible_set = set()
+        self.entered = []
+        self.exited = []
         self.to_update = []
         self.to_update_extra = []
         self.to_remove = []
@@ -79,35 +88,83 @@ class Universe(StellarSystem):
     def dumpOctreeStats(self):
         self.dump_octree_stats = not self.dump_octree_stats
 
+    def add_star_catalog(self, catalog):
+        catalog.set_parent(self)
+        self.star_catalogs.append(catalog)
+
+    def remove_child_fast(self, child):
+        for catalog in self.star_catalogs:
+            if catalog.remove_star(child):
+                return
+        StellarSystem.remove_child_fast(self, child)
+
     def create_octree(self):
         print("Creating octree...")
         start = time()
         for child in self.children:
             self.octree.add(OctreeLeaf(child, child.get_global_position(), child.get_abs_magnitude(), child.get_extend()))
+        for catalog in self.star_catalogs:
+            for leaf in catalog.get_leaves():
+                self.octree.add(OctreeLeaf(leaf, leaf.get_global_position(), leaf.get_abs_magnitude(), leaf.get_extend()))
         end = time()
         print("Creation time:", end - start)
+        self.octree_view = None
+        if self.octree_traverser is not None:
+            self.octree_traverser.reset()
 
     def build_octree_cells_list(self, limit):
-        self.update_id += 1
-        self.previous_leaves = self.to_update_leaves
         pos = self.context.observer.get_position()
         mat = self.context.camera.getMat()
-        bh = self.context.observer.realCamLens.make_bounds()
-        f = InfiniteFrustum(bh, mat, pos)
-        t = VisibleObjectsTraverser(f, limit, self.update_id)
-        self.octree.traverse(t)
-        self.to_update_leaves = t.get_leaves()
-        self.to_remove = []
-        if hasOctreeLeaf:
-            self.to_update = list(map(lambda x: x.get_object(), self.to_update_leaves))
-            for old in self.previous_leaves:
-                if old.get_update_id() != self.update_id:
-                    self.to_remove.append(old.get_object())
+        lens = self.context.observer.realCamLens
+        view = (LPoint3d(pos), LMatrix4(mat), LMatrix4(lens.get_projection_mat()), limit)
+        if settings.octree_temporal_coherence and view == self.octree_view:
+            #The visible set can not have changed, only the instanciated catalog entries must be refreshed
+            self.entered = []
+            self.exited = []
+            self.to_remove = []
         else:
-            self.to_update = self.to_update_leaves
-            for old in self.previous_leaves:
-                if old.update_id != self.update_id:
-                    self.to_remove.append(old)
+            previous_view = self.octree_view
+            self.octree_view = view
+            self.update_id += 1
+            bh = lens.make_bounds()
+            f = InfiniteFrustum(bh, mat, pos)
+            if settings.octree_temporal_coherence and CoherentVisibleObjectsTraverser is not None:
+                #Only the cells whose visibility could have changed with the view are tested again
+                if self.octree_traverser is None:
+                    self.octree_traverser = CoherentVisibleObjectsTraverser()
+                if previous_view is None or previous_view[2] != view[2]:
+                    self.octree_traverser.reset()
+                self.octree_traverser.traverse_octree(self.octree, f, limit)
+                self.to_update_leaves = self.octree_traverser.get_leaves()
+                self.visibles = self.to_update_leaves
+                self.entered = self.octree_traverser.get_entered()
+                self.exited = self.octree_traverser.get_exited()
+                self.visible_set = None
+                self.to_remove = self.exited
+            else:
+                if self.visible_set is None:
+                    self.visible_set = set(self.visibles)
+                self.octree_traverser = None
+                t = VisibleObjectsTraverser(f, limit, self.update_id)
+                self.octree.traverse(t)
+                self.to_update_leaves = t.get_leaves()
+                if hasOctreeLeaf:
+                    self.visibles = list(map(lambda x: x.get_object(), self.to_update_leaves))
+                else:
+                    self.visibles = self.to_update_leaves
+                self.diff_visibles()
+            self.visible_objects = []
+            for catalog in self.star_catalogs:
+                catalog.start_update()
+            for visible in self.visibles:
+                if visible.__class__ is CatalogStar:
+                    visible.catalog.add_visible(visible.index)
+                else:
+                    self.visible_objects.append(visible)
+        self.to_update = list(self.visible_objects)
+        for catalog in self.star_catalogs:
+            catalog.end_update()
+            self.to_update += catalog.visible_stars
         self.octree_cells_to_clean = []
         self.to_update_extra = []
 #         cells = pstats.levelpstat('cells')
@@ -123,6 +180,13 @@ class Universe(StellarSystem):
 #         in_cells.set_level(self.in_cells)
 #         in_view.set_level(self.in_view)
 
+    def diff_visibles(self):
+        visible_set = set(self.visibles)
+        self.entered = [visible for visible in self.visibles if visible not in self.visible_set]
+        self.exited = [visible for visible in self.visible_set if visible not in visible_set]
+        self.visible_set = visible_set
+        self.to_remove = self.exited
+
     def first_update(self):
         CompositeObject.update(self, self.context.time.time_full, 0)
         for child in self.children:
@@ -138,7 +202,22 @@ class Universe(StellarSystem):
             if extra is not None and extra not in self.to_update_extra:
                 self.to_update_extra.append(extra)
 
+    def collect_elliptical_orbits(self, body, orbits):
+        if isinstance(body.orbit, EllipticalOrbit):
+            orbits.append(body.orbit)
+        #Children of a system are only updated when it is visible and resolved, see StellarSystem.update()
+        if isinstance(body, StellarSystem) and body.visible and body.resolved:
+            for child in body.children:
+                self.collect_elliptical_orbits(child, orbits)
+
     def update(self, time, dt):
+        FramesCache.invalidate()
+        orbits = []
+        for leaf in self.to_update:
+            self.collect_elliptical_orbits(leaf, orbits)
+        for extra in self.to_update_extra:
+            self.collect_elliptical_orbits(extra, orbits)
+        update_elliptical_orbits(orbits, time)
         for leaf in self.to_update:
             if isinstance(leaf, StellarSystem):
                 #print("Update system", leaf.get_name())
@@ -149,6 +228,8 @@ class Universe(StellarSystem):
         for extra in self.to_update_extra:
             #print("Update", extra.get_name())
             extra.update(time, dt)
+        for catalog in self.star_catalogs:
+            catalog.update(time, dt)
         CompositeObject.update(self, time, dt)
 
     def update_obs(self, observer):
@@ -158,6 +239,12 @@ class Universe(StellarSystem):
             leaf.update_obs(observer)
             if self.nearest_system is None or leaf.distance_to_obs < self.nearest_system.distance_to_obs:
                 self.nearest_system = leaf
+        for catalog in self.star_catalogs:
+            catalog.update_obs(observer)
+            nearest = catalog.promote_nearest(self.nearest_system)
+            if nearest is not None:
+                self.nearest_system = nearest
+                self.to_update.append(nearest)
         for extra in self.to_update_extra:
             extra.update_obs(observer)
 
@@ -165,6 +252,8 @@ class Universe(StellarSystem):
         CompositeObject.check_visibility(self, pixel_size)
         for leaf in self.to_update:
             leaf.check_visibility(pixel_size)
+        for catalog in self.star_catalogs:
+            self.to_update += catalog.check_visibility(pixel_size)
         for extra in self.to_update_extra:
             pass#extra.check_visibility(pixel_size)
 
@@ -181,6 +270,8 @@ class Universe(StellarSystem):
         CompositeObject.check_and_update_instance(self, camera_pos, camera_rot, pointset)
         for leaf in self.to_update:
             leaf.check_and_update_instance(camera_pos, camera_rot, pointset)
+        for catalog in self.star_catalogs:
+            catalog.check_and_update_instance(camera_pos, camera_rot, pointset)
         for leaf in self.to_remove:
             leaf.remove_instance()
 
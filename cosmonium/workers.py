@@ -27,12 +27,14 @@ try:
 except ImportError:
     import Queue as queue
 import traceback
+from itertools import count
 
 from . import settings
 
 # These will be initialized in cosmonium base class
 asyncTextureLoader = None
 syncTextureLoader = None
+asyncComputeLoader = None
 
 class AsyncMethod():
     def __init__(self, name, base, method, callback):
@@ -69,44 +71,75 @@ class AsyncMethod():
             return task.done
 
 class AsyncLoader():
-    def __init__(self, base, name):
+    #Priority lanes, the jobs of a lane are processed before the ones of the next lanes
+    PRIORITY_UI = 0
+    PRIORITY_HIGH = 1
+    PRIORITY_NORMAL = 2
+    PRIORITY_LOW = 3
+
+    def __init__(self, base, name, nb_threads=1):
         self.base = base
-        self.in_queue = queue.Queue()
+        self.in_queue = queue.PriorityQueue()
         self.cb_queue = queue.Queue()
+        self.sequence = count()
+        #Identical requests share the same job
+        self.pending = {}
         self.base.taskMgr.setupTaskChain(name,
-                                         numThreads = 1,
+                                         numThreads = nb_threads,
                                          tickClock = False,
                                          threadPriority = None,
                                          frameBudget = -1,
                                          frameSync = False,
                                          timeslicePriority = True)
 
-        self.process_task = self.base.taskMgr.add(self.processTask, name + 'ProcessTask', taskChain=name)
+        self.process_tasks = []
+        for i in range(nb_threads):
+            self.process_tasks.append(self.base.taskMgr.add(self.processTask, name + 'ProcessTask', taskChain=name))
         self.callback_task = self.base.taskMgr.add(self.callbackTask, name + 'CallbackTask')
 
     def remove(self):
-        self.base.taskMgr.remove(self.process_task)
-        self.process_task = None
+        for process_task in self.process_tasks:
+            self.base.taskMgr.remove(process_task)
+        self.process_tasks = []
         self.base.taskMgr.remove(self.callback_task)
         self.callback_task = None
 
-    def add_job(self, func, fargs):
+    def add_job(self, func, fargs, priority=PRIORITY_NORMAL, order=0.0, key=None):
+        #Each caller has its own future, so that a cancelled caller does not cancel the job for the others
         future = AsyncFuture()
-        job = [func, fargs, future]
-        self.in_queue.put(job)
+        job = self.pending.get(key) if key is not None else None
+        if job is None:
+            job = AsyncJob(func, fargs, priority, order, key)
+            if key is not None:
+                self.pending[key] = job
+            self.queue_job(job)
+        elif not job.started and (priority, order) < (job.priority, job.order):
+            #The job is queued again with the higher priority, the previous entry will be skipped
+            job.priority = priority
+            job.order = order
+            self.queue_job(job)
+        job.futures.append(future)
         return future
 
+    def queue_job(self, job):
+        #The sequence number keeps the jobs with the same priority in FIFO order
+        self.in_queue.put((job.priority, job.order, next(self.sequence), job))
+
     def processTask(self, task):
         try:
-            #A small but not null timeout is required to avoid draining CPU resources
-            job = self.in_queue.get(timeout=0.001)
-            (func, fargs, future) = job
-            if not settings.panda11 or not future.cancelled():
-                result = func(*fargs)
-                self.cb_queue.put([future, result])
+            #Block until a job is available, the timeout only allows the task chain to be stopped
+            (priority, order, sequence, job) = self.in_queue.get(timeout=0.1)
+            if job.started:
+                #The job has been queued again with a higher priority
+                return Task.cont
+            job.started = True
+            if not settings.panda11 or not job.is_cancelled():
+                job.result = job.func(*job.fargs)
+                job.executed = True
             else:
                 #print("job cancelled")
                 pass
+            self.cb_queue.put(job)
         except queue.Empty:
             pass
         return Task.cont
@@ -115,25 +148,58 @@ class AsyncLoader():
         try:
             while True:
                 job = self.cb_queue.get_nowait()
-                (future, result) = job
-                if not settings.panda11 or not future.cancelled():
-                    future.set_result(result)
-                else:
-                    #print("Result cancelled")
-                    pass
+                if job.key is not None and self.pending.get(job.key) is job:
+                    del self.pending[job.key]
+                if not job.executed:
+                    if settings.panda11 and not job.is_cancelled():
+                        #A new caller joined the job after it was skipped
+                        job.started = False
+                        if job.key is not None:
+                            self.pending[job.key] = job
+                        self.queue_job(job)
+                    continue
+                for future in job.futures:
+                    if not settings.panda11 or not future.cancelled():
+                        future.set_result(job.result)
+                    else:
+                        #print("Result cancelled")
+                        pass
         except queue.Empty:
             pass
         return Task.cont
 
+class AsyncJob(object):
+    __slots__ = ('func', 'fargs', 'priority', 'order', 'key', 'futures', 'started', 'executed', 'result')
+    def __init__(self, func, fargs, priority, order, key):
+        self.func = func
+        self.fargs = fargs
+        self.priority = priority
+        self.order = order
+        self.key = key
+        self.futures = []
+        self.started = False
+        self.executed = False
+        self.result = None
+
+    def is_cancelled(self):
+        for future in self.futures:
+            if not future.cancelled():
+                return False
+        return True
+
+class AsyncComputeLoader(AsyncLoader):
+    def __init__(self, base):
+        AsyncLoader.__init__(self, base, 'ComputeLoader')
+
 class AsyncTextureLoader(AsyncLoader):
     def __init__(self, base):
-        AsyncLoader.__init__(self, base, 'TextureLoader')
+        AsyncLoader.__init__(self, base, 'TextureLoader', settings.texture_loader_threads)
 
-    async def load_texture(self, filename, alpha_filename):
-        return await self.add_job(self.do_load_texture, [filename, alpha_filename])
+    async def load_texture(self, filename, alpha_filename, priority=AsyncLoader.PRIORITY_NORMAL, order=0.0):
+        return await self.add_job(self.do_load_texture, [filename, alpha_filename], priority, order, key=(filename, alpha_filename))
 
-    async def load_texture_array(self, textures):
-        return await self.add_job(self.do_load_texture_array, [textures])
+    async def load_texture_array(self, textures, priority=AsyncLoader.PRIORITY_NORMAL):
+        return await self.add_job(self.do_load_texture_array, [textures], priority)
 
     def do_load_texture(self, filename, alpha_filename):
         tex = Texture()
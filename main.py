@@ -53,9 +53,11 @@ from cosmonium.spaceengine import textures
 from cosmonium import settings
 
 #import orbits and rotations elements to add them to the DB
-from cosmonium.astro.tables import uniform, vsop87, wgccre, lieske_e5, elp82, meeus, gust86, dourneau, rckin, htc20
+from cosmonium.astro.tables import uniform, vsop87, wgccre, lieske_e5, elp82, meeus, gust86, dourneau, rckin, htc20, ephemeris
 
 import argparse
+import random
+import numpy
 import os
 
 class CosmoniumConfig(object):
@@ -85,6 +87,10 @@ class CosmoniumConfig(object):
         self.celestia_start_script = 'start.cel'
         self.prc_file = 'config.prc'
         self.test_start = False
+        self.benchmark = None
+        self.benchmark_urls = None
+        self.benchmark_frames = 100
+        self.benchmark_frame_rate = 60.0
 
     def update_from_args(self, args):
         #TODO: add input checking here
@@ -109,6 +115,13 @@ class CosmoniumConfig(object):
         if self.celestia and self.script is None and self.default_target is None:
             self.script = self.celestia_start_script
         self.test_start = args.test_start
+        if args.benchmark is not None:
+            #The benchmark runs without window, like the start up test
+            self.test_start = True
+            self.benchmark = args.benchmark
+            self.benchmark_urls = args.benchmark_urls
+            self.benchmark_frames = args.benchmark_frames
+            self.benchmark_frame_rate = args.benchmark_frame_rate
 
 class CosmoniumConfigParser(YamlParser):
     def __init__(self, config_file):
@@ -287,10 +300,30 @@ parser.add_argument("--test-start",
                     help=argparse.SUPPRESS,
                     action='store_true',
                     default=False)
+parser.add_argument("--benchmark",
+                    help="Run without window and save the frame timings as JSON in the given file",
+                    default=None)
+parser.add_argument("--benchmark-urls",
+                    help="cel:// urls of the states to replay in the benchmark, instead of the start up script",
+                    nargs='+',
+                    default=None)
+parser.add_argument("--benchmark-frames",
+                    help="Number of frames to run for each benchmark state",
+                    type=int,
+                    default=100)
+parser.add_argument("--benchmark-frame-rate",
+                    help="Simulated frame rate of the benchmark",
+                    type=float,
+                    default=60.0)
 if sys.platform == "darwin":
     #Ignore -psn_<app_id> from MacOS
     parser.add_argument('-p', help=argparse.SUPPRESS)
 args = parser.parse_args()
 
+if args.benchmark is not None:
+    #Use the same random objects in each benchmark run
+    random.seed(0)
+    numpy.random.seed(0)
+
 app = CosmoniumApp(args)
 app.run()
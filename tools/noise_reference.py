@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+#
+#This file is part of Cosmonium.
+#
+#Copyright (C) 2018-2019 Laurent Deru.
+#
+#Cosmonium is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+#
+#Cosmonium is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License
+#along with Cosmonium.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+#Evaluate the GLSL noise functions used by the shaders on the GPU and print the reference table
+#used by cosmonium/procedural/test_cpunoise.py to check the CPU implementation.
+#A GPU, or a software OpenGL implementation, supporting compute shaders is required.
+
+from __future__ import print_function
+
+from panda3d.core import loadPrcFileData, Shader, Texture, NodePath, ShaderAttrib, LVector3
+
+import os
+import sys
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), '..', 'third-party'))
+
+from cosmonium.procedural.test_cpunoise import reference_points, hash_reference_points
+
+shaders_dir = os.path.join(os.path.dirname(__file__), '..', 'shaders')
+
+#Name, included files, GLSL expression giving a vec2 from the point p, points
+noise_functions = [
+    ('gnl-perlin3d', ['gpu-noise-lib/FAST32_hash.glsl', 'gpu-noise-lib/Interpolation.glsl', 'gpu-noise-lib/Perlin3D.glsl'], 'vec2(Perlin3D(p), 0.0)', reference_points),
+    ('gnl-cell3d', ['gpu-noise-lib/FAST32_hash.glsl', 'gpu-noise-lib/Cellular.glsl'], 'vec2(sqrt(Cellular3D(p)), 0.0)', reference_points),
+    ('stegu-perlin3d', ['stegu/common.glsl', 'stegu/noise3D.glsl'], 'vec2(snoise(p), 0.0)', reference_points),
+    ('stegu-cellular3d', ['stegu/common.glsl', 'stegu/cellular3D.glsl'], 'cellular(p)', reference_points),
+    ('stegu-cellular3d-fast', ['stegu/common.glsl', 'stegu/cellular2x2x2.glsl'], 'cellular2x2x2(p)', reference_points),
+    ('quilez-perlin3d', ['quilez/GradientNoise3D.glsl'], 'vec2(noise(p), 0.0)', hash_reference_points),
+    ('quilez-gradientnoise3d', ['quilez/GradientNoise.glsl'], 'vec2(noise(p), 0.0)', hash_reference_points),
+]
+
+def make_shader(includes, expression, nb_points):
+    code = ['#version 430', 'layout (local_size_x = 1) in;', 'layout(rgba32f) uniform writeonly image2D result;',
+            'uniform vec3 points[%d];' % nb_points]
+    for include in includes:
+        code.append(open(os.path.join(shaders_dir, include)).read())
+    code += ['void main() {',
+             '    int i = int(gl_GlobalInvocationID.x);',
+             '    vec3 p = points[i];',
+             '    imageStore(result, ivec2(i, 0), vec4(%s, 0.0, 0.0));' % expression,
+             '}']
+    return Shader.make_compute(Shader.SL_GLSL, '\n'.join(code))
+
+def evaluate(base, includes, expression, points):
+    texture = Texture()
+    texture.setup_2d_texture(len(points), 1, Texture.T_float, Texture.F_rgba32)
+    node = NodePath('noise')
+    node.set_shader(make_shader(includes, expression, len(points)))
+    node.set_shader_input('points', [LVector3(*point) for point in points])
+    node.set_shader_input('result', texture)
+    attrib = node.get_attrib(ShaderAttrib)
+    base.graphicsEngine.dispatch_compute((len(points), 1, 1), attrib, base.win.get_gsg())
+    base.graphicsEngine.extract_texture_data(texture, base.win.get_gsg())
+    data = memoryview(texture.get_ram_image()).cast('f')
+    #The texture is stored as BGRA
+    return [(data[i * 4 + 2], data[i * 4 + 1]) for i in range(len(points))]
+
+if __name__ == '__main__':
+    loadPrcFileData('', 'window-type offscreen\naudio-library-name null')
+    from direct.showbase.ShowBase import ShowBase
+    base = ShowBase()
+    print('reference_values = {')
+    for (name, includes, expression, points) in noise_functions:
+        values = evaluate(base, includes, expression, points)
+        print("    '%s': [%s]," % (name, ', '.join('(%.8g, %.8g)' % (x, y) for (x, y) in values)))
+    print('}')